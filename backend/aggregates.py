@@ -0,0 +1,111 @@
+# backend/aggregates.py
+"""
+monthly_category_totals: a materialized (month, category_id) -> sum/count table.
+SQLite triggers on expenses keep it current for every write, whichever code
+path (or process) makes it, so month-aligned reports never touch expenses.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+
+from .database import transaction
+
+
+def create_monthly_totals(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS monthly_category_totals (
+            month TEXT NOT NULL,                 -- YYYY-MM
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            total_cents INTEGER NOT NULL,
+            expense_count INTEGER NOT NULL,
+            PRIMARY KEY (month, category_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_monthly_totals_category
+        ON monthly_category_totals (category_id, month, total_cents)
+    """)
+
+    add_new = """
+        INSERT INTO monthly_category_totals (month, category_id, total_cents, expense_count)
+        VALUES (substr(NEW.date, 1, 7), NEW.category_id, NEW.value_cents, 1)
+        ON CONFLICT (month, category_id) DO UPDATE SET
+            total_cents = total_cents + excluded.total_cents,
+            expense_count = expense_count + 1;
+    """
+    remove_old = """
+        UPDATE monthly_category_totals
+        SET total_cents = total_cents - OLD.value_cents,
+            expense_count = expense_count - 1
+        WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id;
+        DELETE FROM monthly_category_totals
+        WHERE month = substr(OLD.date, 1, 7) AND category_id = OLD.category_id AND expense_count = 0;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_insert AFTER INSERT ON expenses
+        BEGIN {add_new} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_delete AFTER DELETE ON expenses
+        BEGIN {remove_old} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_update
+        AFTER UPDATE OF category_id, date, value_cents ON expenses
+        BEGIN {remove_old} {add_new} END
+    """)
+
+
+def rebuild_monthly_totals():
+    """Regenerate monthly_category_totals from expenses. Returns the number of cells."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM monthly_category_totals")
+        conn.execute("""
+            INSERT INTO monthly_category_totals (month, category_id, total_cents, expense_count)
+            SELECT substr(date, 1, 7), category_id, SUM(value_cents), COUNT(*)
+            FROM expenses
+            GROUP BY 1, 2
+        """)
+        return conn.execute("SELECT COUNT(*) FROM monthly_category_totals").fetchone()[0]
+
+
+def split_by_month(start=None, end=None):
+    """
+    Split an inclusive [start, end] date range (ISO strings, None = unbounded)
+    into the whole months that can be read from monthly_category_totals and the
+    partial edges that still have to be summed from expenses.
+
+    Returns (months, edges): months is a (first, last) pair of YYYY-MM strings
+    (either may be None for unbounded) or None if no whole month is covered;
+    edges is a list of (start, end) date ranges. Returns None if a bound is not
+    a valid ISO date, so callers can fall back to plain SQL.
+    """
+    try:
+        first = date.fromisoformat(start) if start else None
+        last = date.fromisoformat(end) if end else None
+    except (TypeError, ValueError):
+        return None
+
+    if first is None or first.day == 1:
+        months_from = first
+    else:
+        months_from = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    if last is None or last.day == monthrange(last.year, last.month)[1]:
+        months_to = last
+    else:
+        months_to = last.replace(day=1) - timedelta(days=1)
+
+    if months_from and months_to and months_from > months_to:
+        return None, [(start, end)]
+
+    edges = []
+    if first and first != months_from:
+        edges.append((start, (months_from - timedelta(days=1)).isoformat()))
+    if last and last != months_to:
+        edges.append((last.replace(day=1).isoformat(), end))
+
+    months = (
+        months_from.strftime("%Y-%m") if months_from else None,
+        months_to.strftime("%Y-%m") if months_to else None,
+    )
+    return months, edges
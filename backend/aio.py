@@ -0,0 +1,156 @@
+# backend/aio.py
+"""
+asyncio front end for backend.crud and backend.reports.
+
+The backend is synchronous, so every call here runs on a worker thread:
+
+- reads go to a small pool of threads whose connections are read-only
+  (WAL lets them run alongside a write)
+- writes go to a single writer thread, so they never contend for the lock
+
+    total = await aio.get_total_filtered("Daily Expenses", timeout=2)
+    new_id = await aio.add_expense("Daily Expenses", "Groceries", "Food", "2024-05-01", 12.5)
+
+Every function takes an optional timeout (seconds). When the awaiting task
+is cancelled or times out, a call that has not started yet is dropped and a
+running SQLite statement is interrupted; an interrupted write rolls back.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import crud, database, exporter, reports
+from .storage import get_backend
+
+DEFAULT_READERS = 4
+
+_executors = {"read": None, "write": None}
+_executors_lock = threading.Lock()
+_readers = DEFAULT_READERS
+
+
+def configure(readers=DEFAULT_READERS):
+    """Set the read pool size; takes effect the next time the pool starts."""
+    global _readers
+    if readers < 1:
+        raise ValueError("readers must be at least 1.")
+    _readers = readers
+
+
+def _executor(kind):
+    with _executors_lock:
+        if _executors[kind] is None:
+            if kind == "read":
+                _executors[kind] = ThreadPoolExecutor(
+                    _readers, thread_name_prefix="expenses-read", initializer=database.set_read_only
+                )
+            else:
+                _executors[kind] = ThreadPoolExecutor(1, thread_name_prefix="expenses-write")
+        return _executors[kind]
+
+
+def shutdown(wait=True):
+    """
+    Stop the worker threads (they restart on the next call). Their
+    connections stay open until database.close_all_connections().
+    """
+    with _executors_lock:
+        executors = [e for e in _executors.values() if e is not None]
+        _executors.update(read=None, write=None)
+    for executor in executors:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class _Call:
+    """One backend call on a worker thread, which the awaiting task can cancel."""
+
+    def __init__(self, func, args, kwargs):
+        self.func, self.args, self.kwargs = func, args, kwargs
+        self._lock = threading.Lock()
+        self._conn = None
+        self._running = False
+        self._cancelled = False
+
+    def run(self):
+        with self._lock:
+            if self._cancelled:
+                return None
+            if get_backend().name == "sqlite":
+                self._conn = database.get_connection()
+            self._running = True
+        try:
+            return self.func(*self.args, **self.kwargs)
+        finally:
+            with self._lock:
+                self._running = False
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            # Only interrupt while our statement runs, never the thread's next call
+            if self._running and self._conn is not None:
+                self._conn.interrupt()
+
+
+async def _submit(kind, func, args, kwargs, timeout):
+    call = _Call(func, args, kwargs)
+    future = asyncio.get_running_loop().run_in_executor(_executor(kind), call.run)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        call.cancel()
+        raise
+
+
+async def read(func, *args, timeout=None, **kwargs):
+    """Run a read-only backend function on the read pool."""
+    return await _submit("read", func, args, kwargs, timeout)
+
+
+async def write(func, *args, timeout=None, **kwargs):
+    """Run a backend function that writes on the writer thread."""
+    return await _submit("write", func, args, kwargs, timeout)
+
+
+def _reader(func):
+    @functools.wraps(func)
+    async def wrapper(*args, timeout=None, **kwargs):
+        return await read(func, *args, timeout=timeout, **kwargs)
+    return wrapper
+
+
+def _writer(func):
+    @functools.wraps(func)
+    async def wrapper(*args, timeout=None, **kwargs):
+        return await write(func, *args, timeout=timeout, **kwargs)
+    return wrapper
+
+
+# --- crud ---
+add_expense = _writer(crud.add_expense)
+update_expense = _writer(crud.update_expense)
+delete_expense = _writer(crud.delete_expense)
+add_expenses_bulk = _writer(crud.add_expenses_bulk)
+update_expenses_bulk = _writer(crud.update_expenses_bulk)
+delete_expenses_bulk = _writer(crud.delete_expenses_bulk)
+get_expenses = _reader(crud.get_expenses)
+get_expenses_page = _reader(crud.get_expenses_page)
+count_expenses = _reader(crud.count_expenses)
+get_available_years = _reader(crud.get_available_years)
+
+# --- reports ---
+list_all_categories = _reader(reports.list_all_categories)
+get_total_by_category = _reader(reports.get_total_by_category)
+get_total_by_date_range = _reader(reports.get_total_by_date_range)
+get_monthly_summary = _reader(reports.get_monthly_summary)
+get_totals_grouped = _reader(reports.get_totals_grouped)
+get_total_filtered = _reader(reports.get_total_filtered)
+get_expenses_filtered = _reader(reports.get_expenses_filtered)
+get_expenses_by_date_range = _reader(reports.get_expenses_by_date_range)
+get_category_tree = _reader(reports.get_category_tree)
+get_time_series = _reader(reports.get_time_series)
+forecast_period = _reader(reports.forecast_period)
+
+# --- export ---
+export = _reader(exporter.export)
@@ -0,0 +1,132 @@
+# backend/anomalies.py
+"""
+Flag unusual expenses: outliers within their category and likely duplicate
+charges. Both run on a columnar.Snapshot with whole-array NumPy operations,
+so the cost is a couple of sorts over the ledger rather than per-row Python
+or pairwise comparisons.
+
+- Outliers: each category's typical amount is the median of log(cents) and
+  its spread the median absolute deviation (MAD). A row whose robust z-score
+  (log(value) - median) / (1.4826 * MAD) exceeds the threshold is flagged.
+  Logs keep one big grocery run from hiding the next. A category charged the
+  same amount most of the time (rent) has a MAD of 0, and falls back to the
+  mean absolute deviation scaled to match (1.2533 * mean). Rows of zero or
+  less have no log and are never judged.
+- Duplicates: rows sorted by (category, cents, day) put candidates next to
+  each other, so one comparison with the previous row finds every charge
+  repeated within `duplicate_days` days.
+
+Pass ids (e.g. the rows an import just added) to only report those, still
+judged against the whole history:
+
+    flags = anomalies.find_anomalies(snapshot, ids=new_ids)
+    # [(17, "outlier: 950.00 vs typical 42.10 for this category"),
+    #  (18, "possible duplicate of #12")]
+"""
+import numpy as np
+
+from . import columnar
+from .money import from_cents
+
+DEFAULT_THRESHOLD = 3.5   # robust z-score above which a value is an outlier
+MIN_SAMPLES = 8           # categories with fewer rows have no reliable "typical"
+DUPLICATE_DAYS = 3        # same category and amount within this many days
+
+
+def _group_medians(codes, values):
+    """
+    Median of values per code, as an array indexed by code. Sorting by
+    (code, value) lines each group up in order, so the median is read at the
+    middle offset of every group at once.
+    """
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    lo = starts[present] + (counts[present] - 1) // 2
+    hi = starts[present] + counts[present] // 2
+    medians = np.zeros(len(counts))
+    medians[present] = (sorted_values[lo] + sorted_values[hi]) / 2
+    return medians, counts
+
+
+def find_outliers(snapshot, ids=None, threshold=DEFAULT_THRESHOLD, min_samples=MIN_SAMPLES):
+    """[(id, reason)] for values far above or below their category's typical amount."""
+    snapshot.refresh()
+    positive = snapshot.cents > 0
+    codes = snapshot.codes[positive].astype(np.int64)
+    if not len(codes):
+        return []
+    cents, row_ids = snapshot.cents[positive], snapshot.ids[positive]
+    logs = np.log(cents.astype(np.float64))
+    medians, counts = _group_medians(codes, logs)
+    deviations = np.abs(logs - medians[codes])
+    mads, _ = _group_medians(codes, deviations)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_deviations = np.bincount(codes, weights=deviations, minlength=len(counts)) / counts
+
+    spread = np.where(mads > 0, 1.4826 * mads, 1.2533 * mean_deviations)[codes]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(spread > 0, (logs - medians[codes]) / spread, 0.0)
+    flagged = (np.abs(scores) > threshold) & (counts[codes] >= min_samples)
+    if ids is not None:
+        flagged &= np.isin(row_ids, np.asarray(list(ids), dtype=np.int64))
+
+    typical = np.exp(medians)
+    return [
+        (int(row_ids[i]),
+         f"outlier: {from_cents(int(cents[i])):.2f} vs typical "
+         f"{from_cents(round(typical[codes[i]])):.2f} for this category")
+        for i in np.nonzero(flagged)[0]
+    ]
+
+
+def find_duplicates(snapshot, ids=None, duplicate_days=DUPLICATE_DAYS):
+    """[(id, reason)] for charges repeating an earlier one's category and amount within duplicate_days."""
+    snapshot.refresh()
+    if len(snapshot) < 2:
+        return []
+    order = np.lexsort((snapshot.ids, snapshot.days, snapshot.cents, snapshot.codes))
+    codes, cents, days, row_ids = (
+        snapshot.codes[order], snapshot.cents[order], snapshot.days[order], snapshot.ids[order]
+    )
+    repeat = np.zeros(len(order), dtype=bool)
+    repeat[1:] = (
+        (codes[1:] == codes[:-1])
+        & (cents[1:] == cents[:-1])
+        & (days[1:] - days[:-1] <= duplicate_days)
+    )
+    later = np.nonzero(repeat)[0]
+    earlier = later - 1
+    if ids is not None:
+        # Report a new row that repeats history, and history repeated by a new row
+        wanted = np.asarray(list(ids), dtype=np.int64)
+        new_later = np.isin(row_ids[later], wanted)
+        new_earlier = np.isin(row_ids[earlier], wanted) & ~np.isin(row_ids[later], wanted)
+        pairs = [(row_ids[later[new_later]], row_ids[earlier[new_later]]),
+                 (row_ids[earlier[new_earlier]], row_ids[later[new_earlier]])]
+    else:
+        pairs = [(row_ids[later], row_ids[earlier])]
+    return [
+        (int(flagged), f"possible duplicate of #{int(other)}")
+        for flagged_ids, other_ids in pairs
+        for flagged, other in zip(flagged_ids, other_ids)
+    ]
+
+
+def find_anomalies(snapshot=None, ids=None, threshold=DEFAULT_THRESHOLD,
+                   min_samples=MIN_SAMPLES, duplicate_days=DUPLICATE_DAYS):
+    """
+    Outliers and duplicates together as [(id, reason)] sorted by id. Loads a
+    columnar.Snapshot of the active backend when none is given.
+    """
+    own = snapshot is None
+    snapshot = snapshot or columnar.Snapshot()
+    try:
+        flags = find_outliers(snapshot, ids, threshold, min_samples)
+        flags += find_duplicates(snapshot, ids, duplicate_days)
+    finally:
+        if own:
+            snapshot.close()
+    return sorted(flags)
@@ -0,0 +1,219 @@
+# backend/backup.py
+"""
+Online backups of the SQLite ledger with sqlite3's backup API, which is
+safe while the app keeps writing (copying expenses.db is not: the file and
+its -wal can be caught mid-commit).
+
+- backup() copies `pages` pages per step and sleeps between steps, so no
+  lock is held for long. A commit by another connection between steps makes
+  SQLite restart the copy; after `max_restarts` of those the rest is copied
+  in one step. Under WAL that single step only holds a read snapshot, which
+  does not block writers either.
+- the copy is written beside its destination, checked with
+  PRAGMA integrity_check, switched to a rollback journal (so the backup is
+  one self-contained file with no -wal) and only then renamed into place.
+- keep=N keeps the newest N backups in the directory; BackupScheduler makes
+  one every `interval` seconds on a background thread.
+- restore() verifies a backup, backs up the current ledger first, and then
+  copies the backup over the live database through the same API.
+
+    result = backup.backup(keep=7)
+    # {"path": "backups/expenses-20240501-120000-000000.db", "pages": 2048,
+    #  "bytes": 8388608, "seconds": 0.21, "mb_per_s": 38.1, "restarts": 0}
+
+This works on the database file, whichever storage backend is active.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from . import budgets, cache, categories, crud, database
+
+DEFAULT_PAGES = 1024        # pages copied per step (4 MiB with 4 KiB pages)
+DEFAULT_SLEEP = 0.005       # seconds between steps, for writers to get in
+DEFAULT_KEEP = 10
+MAX_RESTARTS = 3
+BACKUP_DIR = "backups"      # next to the database file
+
+
+class _Restarted(Exception):
+    pass
+
+
+def default_directory():
+    return os.path.join(os.path.dirname(os.path.abspath(database.DB_NAME)), BACKUP_DIR)
+
+
+def _prefix():
+    return os.path.splitext(os.path.basename(database.DB_NAME))[0] + "-"
+
+
+def list_backups(directory=None):
+    """Backup files in the directory, oldest first."""
+    directory = directory or default_directory()
+    if not os.path.isdir(directory):
+        return []
+    prefix = _prefix()
+    names = sorted(n for n in os.listdir(directory) if n.startswith(prefix) and n.endswith(".db"))
+    return [os.path.join(directory, name) for name in names]
+
+
+def rotate(directory=None, keep=DEFAULT_KEEP):
+    """Delete all but the newest `keep` backups; returns the deleted paths."""
+    old = list_backups(directory)[:-keep] if keep > 0 else list_backups(directory)
+    for path in old:
+        os.remove(path)
+    return old
+
+
+def verify(path):
+    """PRAGMA integrity_check problems of a database file ([] if it is sound)."""
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        return [str(e)]
+    finally:
+        conn.close()
+    return [] if rows == ["ok"] else rows
+
+
+def _copy(source, target, pages, sleep, progress, max_restarts):
+    """Copy source into target in steps; returns the number of restarts."""
+    state = {"remaining": None, "restarts": 0}
+
+    def step(status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise _Restarted
+        state["remaining"] = remaining
+        if progress:
+            progress(total - remaining, total)
+
+    try:
+        source.backup(target, pages=pages, progress=step, sleep=sleep)
+    except _Restarted:
+        source.backup(target, pages=-1)
+    return state["restarts"]
+
+
+def backup(path=None, directory=None, keep=None, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP,
+           progress=None, max_restarts=MAX_RESTARTS):
+    """
+    Back up the ledger to path (default: a timestamped file in directory,
+    default backups/ beside the database) and return its throughput report.
+    progress(pages_copied, pages_total) is called after every step.
+    Raises RuntimeError, keeping nothing, if the copy fails integrity_check.
+    """
+    if path is None:
+        directory = directory or default_directory()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{_prefix()}{datetime.now():%Y%m%d-%H%M%S-%f}.db")
+    partial = f"{path}.part"
+
+    start = time.perf_counter()
+    source = database.connect()
+    try:
+        target = sqlite3.connect(partial, isolation_level=None)
+        try:
+            restarts = _copy(source, target, pages, sleep, progress, max_restarts)
+            target.execute("PRAGMA journal_mode=DELETE")
+            page_count = target.execute("PRAGMA page_count").fetchone()[0]
+            page_size = target.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            target.close()
+    except BaseException:
+        for leftover in (partial, f"{partial}-journal"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    finally:
+        source.close()
+    seconds = time.perf_counter() - start
+
+    problems = verify(partial)
+    if problems:
+        os.remove(partial)
+        raise RuntimeError(f"Backup failed its integrity check: {'; '.join(problems[:5])}")
+    os.replace(partial, path)
+    if keep:
+        rotate(os.path.dirname(os.path.abspath(path)), keep)
+
+    size = page_count * page_size
+    return {
+        "path": path,
+        "pages": page_count,
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "mb_per_s": round(size / 2**20 / seconds, 1) if seconds else None,
+        "restarts": restarts,
+    }
+
+
+def restore(path, directory=None):
+    """
+    Replace the ledger with a backup. The backup is checked first and the
+    current ledger is backed up to directory (see backup()) before it is
+    overwritten; returns that safety backup's report. Schema migrations are
+    applied afterwards, so older backups can be restored.
+
+    Every pooled connection is closed first, and everything derived from the
+    old ledger (cached reports, category ids, budget totals, snapshots,
+    indexes and models built on crud.DerivedView) is reset afterwards.
+    """
+    problems = verify(path)
+    if problems:
+        raise RuntimeError(f"{path} failed its integrity check: {'; '.join(problems[:5])}")
+    saved = backup(directory=directory)
+
+    database.close_all_connections()
+    source = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    target = database.connect()
+    try:
+        # One step: the copy holds the write lock until the ledger is whole again
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    database.migrate()
+    categories.clear_cache()
+    cache.invalidate()
+    crud.reset_derived_views()
+    budgets.recompute()
+    return saved
+
+
+class BackupScheduler:
+    """Back up every `interval` seconds on a daemon thread, keeping the newest `keep`."""
+
+    def __init__(self, interval, directory=None, keep=DEFAULT_KEEP):
+        self.interval = interval
+        self.directory = directory
+        self.keep = keep
+        self.last_result = self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = backup(directory=self.directory, keep=self.keep)
+                self.last_error = None
+            except Exception as e:   # keep the schedule going; the caller can inspect last_error
+                self.last_error = e
@@ -0,0 +1,231 @@
+# backend/budgets.py
+"""
+Spending limits per category path and period (week, month or year).
+
+A budget names a main category and optionally a mid and sub category; the
+parts left out match anything, so ("Daily Expenses", None, None, "month")
+caps all daily spending per calendar month. Weeks start on Monday.
+
+Checking a new expense against its budgets must not re-sum the table, so the
+spend of every budget in its current period is kept in memory:
+
+- crud writes adjust the running totals through a write listener, touching
+  only the budgets that cover the written category
+- big batches (imports), a new period, a budget change or a commit made
+  outside crud trigger a recompute instead: one per-category, per-day
+  grouping over the widest period in use, split into periods here
+
+    budgets.set_budget("Daily Expenses", "Groceries", period="month", limit=400)
+    budgets.over_budget("Daily Expenses", "Groceries", "Food")   # after an insert
+    budgets.budget_status()                                     # every budget, from the running totals
+"""
+import threading
+from datetime import date, timedelta
+
+from . import cache, crud, storage
+from .categories import category_ids
+from .money import from_cents
+from .query import ExpenseQuery
+from .validators import normalize_date, validate_cents
+
+PERIODS = ("week", "month", "year")
+
+# Writes touching more rows than this recompute every budget with one query
+BULK_ROWS = 1000
+
+_lock = threading.RLock()
+_running = {
+    "backend": None,     # the backend the totals were computed on
+    "outside": None,     # cache.outside_generation() they are valid for
+    "bounds": None,      # period -> (start, end) of the current periods
+    "budgets": {},       # budget id -> (main, mid, sub, period, limit_cents)
+    "by_category": {},   # category id -> [budget ids covering it]
+    "spent": {},         # budget id -> cents spent in the current period
+    "dirty": True,
+}
+
+
+def create_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS budgets (
+            id INTEGER PRIMARY KEY,
+            main_category TEXT NOT NULL,
+            mid_category TEXT,
+            sub_category TEXT,
+            period TEXT NOT NULL CHECK (period IN ('week', 'month', 'year')),
+            limit_cents INTEGER NOT NULL CHECK (limit_cents > 0)
+        )
+    """)
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_budgets_path
+        ON budgets (main_category, ifnull(mid_category, ''), ifnull(sub_category, ''), period)
+    """)
+
+
+def period_bounds(period, day=None):
+    """Inclusive (start, end) ISO dates of the week, month or year containing day (default today)."""
+    day = date.fromisoformat(day) if isinstance(day, str) else (day or date.today())
+    if period == "week":
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=6)
+    elif period == "month":
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    elif period == "year":
+        start, end = day.replace(month=1, day=1), day.replace(month=12, day=31)
+    else:
+        raise ValueError(f"Invalid period '{period}'. Use one of {', '.join(PERIODS)}.")
+    return start.isoformat(), end.isoformat()
+
+
+def _current_bounds(day=None):
+    return {period: period_bounds(period, day) for period in PERIODS}
+
+
+# --- definitions ---
+def set_budget(main_cat, mid_cat=None, sub_cat=None, period="month", limit=None):
+    """Create or replace the budget for a category path and period. Returns its id."""
+    if period not in PERIODS:
+        raise ValueError(f"Invalid period '{period}'. Use one of {', '.join(PERIODS)}.")
+    if not main_cat or not category_ids(main_cat, mid_cat, sub_cat):
+        raise ValueError(f"Unknown category: {main_cat} > {mid_cat} > {sub_cat}")
+    limit_cents = validate_cents(limit)
+    budget_id = storage.get_backend().set_budget((main_cat, mid_cat or None, sub_cat or None), period, limit_cents)
+    _mark_dirty()
+    return budget_id
+
+
+def delete_budget(budget_id):
+    if not storage.get_backend().delete_budget(budget_id):
+        raise LookupError(f"Budget {budget_id} not found.")
+    _mark_dirty()
+
+
+def list_budgets():
+    """Returns [(id, main, mid, sub, period, limit)] sorted by path and period."""
+    return [(*row[:5], from_cents(row[5])) for row in storage.get_backend().budgets()]
+
+
+# --- running totals ---
+def _mark_dirty():
+    with _lock:
+        _running["dirty"] = True
+
+
+def _spend(backend, bounds):
+    """
+    ({budget id: (main, mid, sub, period, limit_cents)}, {budget id: spent
+    cents in bounds[period]}) from one per-category, per-day grouping over
+    the union of the periods in use.
+    """
+    budgets = {row[0]: row[1:] for row in backend.budgets()}
+    by_period = {period: {} for period in {budget[3] for budget in budgets.values()}}
+    if by_period:
+        windows = [bounds[period] for period in by_period]
+        spec = ExpenseQuery(
+            start=min(start for start, _ in windows), end=max(end for _, end in windows),
+            group_by=("category", "day"),
+        )
+        for category_id, day, cents, _ in backend.select(spec):
+            for period, totals in by_period.items():
+                start, end = bounds[period]
+                if start <= day <= end:
+                    totals[category_id] = totals.get(category_id, 0) + cents
+    spent = {
+        budget_id: sum(by_period[period].get(category_id, 0) for category_id in category_ids(main, mid, sub))
+        for budget_id, (main, mid, sub, period, _) in budgets.items()
+    }
+    return budgets, spent
+
+
+def recompute(day=None):
+    """Recompute the current-period spend of every budget."""
+    backend = storage.get_backend()
+    with _lock:
+        outside = cache.outside_generation()
+        bounds = _current_bounds(day)
+        budgets, spent = _spend(backend, bounds)
+        by_category = {}
+        for budget_id, (main, mid, sub, _, _) in budgets.items():
+            for category_id in category_ids(main, mid, sub):
+                by_category.setdefault(category_id, []).append(budget_id)
+        _running.update(
+            backend=backend, outside=outside, bounds=bounds, budgets=budgets,
+            by_category=by_category, spent=spent, dirty=False,
+        )
+
+
+def _ensure_current():
+    """Recompute if anything the running totals can't follow has happened."""
+    with _lock:
+        if (
+            _running["dirty"]
+            or _running["backend"] is not storage.get_backend()
+            or _running["bounds"] != _current_bounds()
+            or _running["outside"] != cache.outside_generation()
+        ):
+            recompute()
+
+
+def _on_write(kind, old_rows, new_rows):
+    with _lock:
+        if _running["dirty"] or _running["backend"] is not storage.get_backend():
+            return
+        if len(old_rows) + len(new_rows) > BULK_ROWS:
+            _running["dirty"] = True
+            return
+        budgets, bounds, spent = _running["budgets"], _running["bounds"], _running["spent"]
+        for rows, sign in ((old_rows, -1), (new_rows, 1)):
+            for _, category_id, day, cents, _ in rows:
+                for budget_id in _running["by_category"].get(category_id, ()):
+                    start, end = bounds[budgets[budget_id][3]]
+                    if start <= day <= end:
+                        spent[budget_id] = spent.get(budget_id, 0) + sign * cents
+
+
+crud.add_write_listener(_on_write)
+
+
+# --- checks and reports ---
+def over_budget(main_cat, mid_cat, sub_cat, day=None):
+    """
+    Budgets covering a category path that are over their limit in the current
+    period, if it contains day (default today): [(main, mid, sub, period, limit, spent)].
+    Uses the running totals, so it costs a dict lookup per budget.
+    """
+    day = normalize_date(day) if day else date.today().isoformat()
+    with _lock:
+        _ensure_current()
+        covering = dict.fromkeys(
+            budget_id
+            for category_id in category_ids(main_cat, mid_cat, sub_cat)
+            for budget_id in _running["by_category"].get(category_id, ())
+        )
+        over = []
+        for budget_id in covering:
+            main, mid, sub, period, limit_cents = _running["budgets"][budget_id]
+            start, end = _running["bounds"][period]
+            spent = _running["spent"].get(budget_id, 0)
+            if start <= day <= end and spent > limit_cents:
+                over.append((main, mid, sub, period, from_cents(limit_cents), from_cents(spent)))
+    return over
+
+
+def budget_status(day=None):
+    """
+    Every budget with its spend in the period containing day (default today):
+    [(id, main, mid, sub, period, limit, spent, remaining)]. The current
+    periods are served from the running totals.
+    """
+    bounds = _current_bounds(day)
+    with _lock:
+        if bounds == _current_bounds():
+            _ensure_current()
+            budgets, spent = _running["budgets"], _running["spent"]
+        else:
+            budgets, spent = _spend(storage.get_backend(), bounds)
+        rows = [(budget_id, *budget, spent.get(budget_id, 0)) for budget_id, budget in budgets.items()]
+    return [
+        (budget_id, main, mid, sub, period, from_cents(limit), from_cents(cents), from_cents(limit - cents))
+        for budget_id, main, mid, sub, period, limit, cents in rows
+    ]
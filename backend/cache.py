@@ -0,0 +1,231 @@
+# backend/cache.py
+"""
+Memoization for report functions, invalidated by writes.
+
+Every crud write bumps a generation counter, and cached results from an
+older generation are never served. Writes made outside this process (or on
+another connection) are noticed through SQLite's PRAGMA data_version, which
+changes for a connection whenever someone else commits. Switching database
+file or storage backend also starts a new generation.
+
+Entries are kept in an LRU bounded by count and by (estimated) bytes, and
+expire after a TTL:
+
+    @cached
+    def get_monthly_summary(): ...
+
+    cache.cache_info()  # {"hits": 12, "misses": 3, ...}
+"""
+import copy
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+
+from . import database
+from .storage import get_backend
+
+DEFAULT_MAXSIZE = 256
+DEFAULT_MAXBYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 300.0  # seconds
+
+_clock = time.monotonic
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> (generation, expires_at, value, size)
+_settings = {"maxsize": DEFAULT_MAXSIZE, "maxbytes": DEFAULT_MAXBYTES, "ttl": DEFAULT_TTL, "enabled": True}
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+_state = {"generation": 0, "outside": 0, "commits": 0, "bytes": 0, "backend": None, "db_name": None}
+_local = threading.local()  # per-thread (connection, data_version, commits) last seen
+
+
+def configure(maxsize=None, maxbytes=None, ttl=None, enabled=None):
+    """Change the cache limits; ttl=0 disables expiry."""
+    with _lock:
+        if maxsize is not None:
+            _settings["maxsize"] = maxsize
+        if maxbytes is not None:
+            _settings["maxbytes"] = maxbytes
+        if ttl is not None:
+            _settings["ttl"] = ttl
+        if enabled is not None:
+            _settings["enabled"] = enabled
+        _evict()
+
+
+def _evict():
+    while _entries and (len(_entries) > _settings["maxsize"] or _state["bytes"] > _settings["maxbytes"]):
+        _state["bytes"] -= _entries.popitem(last=False)[1][3]
+        _stats["evictions"] += 1
+
+
+def invalidate():
+    """Start a new generation so every cached result is recomputed. crud calls this on writes."""
+    with _lock:
+        _bump()
+
+
+def committed():
+    """
+    crud calls this after its outermost commit. Besides a new generation (a
+    reader on another thread may have cached the pre-commit rows meanwhile),
+    it marks the data_version change the other connections are about to see
+    as this process's own, so they don't take it for an outside commit.
+    """
+    with _lock:
+        _state["commits"] += 1
+        _bump()
+
+
+def _bump(outside=False):
+    _state["generation"] += 1
+    _state["outside"] += outside
+    _stats["invalidations"] += 1
+    _entries.clear()
+    _state["bytes"] = 0
+
+
+def clear():
+    """Drop every entry and reset the statistics."""
+    with _lock:
+        _entries.clear()
+        _state["bytes"] = 0
+        for name in _stats:
+            _stats[name] = 0
+
+
+def cache_info():
+    with _lock:
+        return {
+            **_stats,
+            "size": len(_entries),
+            "bytes": _state["bytes"],
+            "generation": _state["generation"],
+            **_settings,
+        }
+
+
+def current_generation():
+    """
+    The generation results must match, after noting any backend or database
+    switch and any commit made through another connection.
+
+    A thread's first look at a connection only records its data_version.
+    After that, a change counts as an outside commit unless crud reported a
+    commit of its own (committed()) since the thread last looked; an outside
+    commit landing in the same interval as one of ours is not told apart,
+    as crud's own bump already dropped the cached results.
+    """
+    backend = get_backend()
+    with _lock:
+        if backend is not _state["backend"] or database.DB_NAME != _state["db_name"]:
+            _state["backend"], _state["db_name"] = backend, database.DB_NAME
+            _bump(outside=True)
+    if backend.name == "sqlite":
+        conn = database.get_connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        seen = getattr(_local, "seen", None)
+        with _lock:
+            commits = _state["commits"]
+            if seen is not None and seen[0] is conn and seen[1] != version and seen[2] == commits:
+                _bump(outside=True)
+        if seen is None or seen[0] is not conn or seen[1] != version or seen[2] != commits:
+            _local.seen = (conn, version, commits)
+    return _state["generation"]
+
+
+def outside_generation():
+    """
+    A counter that moves only for changes crud did not make and announce: a
+    commit through another connection or a backend or database switch.
+    Derived views (crud.DerivedView) compare it to know their incremental
+    updates may have missed something.
+    """
+    current_generation()
+    return _state["outside"]
+
+
+def _freeze(value):
+    """A hashable stand-in for an argument value (dicts and lists included)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+_IMMUTABLE = (type(None), bool, int, float, str, bytes, Decimal, date)
+
+
+def _frozen(value):
+    """True if value (a scalar, or tuples of them) can't be changed by a caller."""
+    if isinstance(value, _IMMUTABLE):
+        return True
+    return isinstance(value, (tuple, frozenset)) and all(_frozen(v) for v in value)
+
+
+def _copy(value):
+    """What a caller gets: the value itself if immutable, a new list of immutable rows, else a deep copy."""
+    if _frozen(value):
+        return value
+    if type(value) is list and all(_frozen(v) for v in value):
+        return list(value)
+    return copy.deepcopy(value)
+
+
+def _sizeof(value):
+    """Rough bytes held by value: containers are walked, the rest is sys.getsizeof."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(v) for v in value)
+    return size
+
+
+def cached(func):
+    """Cache func's results per normalized arguments until the next write or the TTL."""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _settings["enabled"]:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__module__, func.__qualname__, _freeze(tuple(bound.arguments.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return func(*args, **kwargs)
+
+        generation = current_generation()
+        now = _clock()
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None and entry[0] == generation and (entry[1] is None or entry[1] > now):
+                _entries.move_to_end(key)
+                _stats["hits"] += 1
+                return _copy(entry[2])
+            _stats["misses"] += 1
+
+        value = func(*args, **kwargs)
+        size = _sizeof(value)
+
+        with _lock:
+            # A write during the call moved the generation on; don't keep the
+            # result, nor one that would push out everything else on its own
+            if generation == _state["generation"] and size <= _settings["maxbytes"]:
+                ttl = _settings["ttl"]
+                old = _entries.pop(key, None)
+                if old is not None:
+                    _state["bytes"] -= old[3]
+                _entries[key] = (generation, now + ttl if ttl else None, value, size)
+                _state["bytes"] += size
+                _evict()
+        return _copy(value)
+
+    return wrapper
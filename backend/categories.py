@@ -0,0 +1,115 @@
+# backend/categories.py
+"""
+The categories dimension table: one row per (main, mid, sub) path, seeded from
+validation.CATEGORIES. Expenses reference it by integer category_id so that
+filters and GROUP BYs compare small integers instead of strings.
+"""
+import threading
+
+from . import storage
+from .validation import CATEGORIES
+
+_cache = {"ids": {}, "paths": None}
+_cache_lock = threading.Lock()
+
+
+def taxonomy_paths():
+    """Yield every valid (main, mid, sub) path in CATEGORIES, in menu order."""
+    for main, mids in CATEGORIES.items():
+        for mid, subs in mids.items():
+            if subs is None:
+                yield main, mid, None
+            else:
+                for sub in subs:
+                    yield main, mid, sub
+
+
+def create_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY,
+            main_category TEXT NOT NULL,
+            mid_category TEXT,
+            sub_category TEXT
+        )
+    """)
+    # NULLs are distinct in a plain UNIQUE constraint, so index the path with them folded to ''
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_categories_path
+        ON categories (main_category, ifnull(mid_category, ''), ifnull(sub_category, ''))
+    """)
+
+
+def seed(conn, paths=None):
+    """Insert any missing category paths (defaults to the CATEGORIES taxonomy)."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO categories (main_category, mid_category, sub_category) VALUES (?, ?, ?)",
+        list(paths if paths is not None else taxonomy_paths()),
+    )
+    clear_cache()
+
+
+def clear_cache():
+    from .storage.sqlite import clear_category_cache
+
+    clear_category_cache()
+
+
+def _load():
+    """Return (path -> id, id -> path) for the active storage backend."""
+    paths = storage.get_backend().category_paths()
+    with _cache_lock:
+        # Backends hand back the same dict until their categories change
+        if _cache["paths"] is not paths:
+            _cache["ids"] = {path: cid for cid, path in paths.items()}
+            _cache["paths"] = paths
+        return _cache["ids"], paths
+
+
+def get_category_id(main_cat, mid_cat, sub_cat):
+    """Return the id of a category path, adding the path if it is not stored yet."""
+    ids, _ = _load()
+    cid = ids.get((main_cat, mid_cat, sub_cat))
+    if cid is None:
+        storage.get_backend().add_categories([(main_cat, mid_cat, sub_cat)])
+        ids, _ = _load()
+        cid = ids[(main_cat, mid_cat, sub_cat)]
+    return cid
+
+
+def get_category_paths():
+    """Return {category_id: (main, mid, sub)}."""
+    return _load()[1]
+
+
+def category_ids(main_cat=None, mid_cat=None, sub_cat=None):
+    """
+    Return the ids of all paths matching the given parts; empty or None parts
+    match anything (so category_ids("Daily Expenses") is every Daily Expenses path).
+    """
+    wanted = [(i, part) for i, part in enumerate((main_cat, mid_cat, sub_cat)) if part]
+    return sorted(
+        cid for cid, path in get_category_paths().items()
+        if all(path[i] == part for i, part in wanted)
+    )
+
+
+def rollup(totals_by_id, level):
+    """
+    Fold {category_id: total} up to a category level and return sorted rows:
+    - "main": (main, total)
+    - "mid": (main, mid, total)
+    - "sub": (main, mid, sub, total)
+    """
+    width = {"main": 1, "mid": 2, "sub": 3}.get(level)
+    if width is None:
+        raise ValueError("Invalid grouping level. Use 'main', 'mid', or 'sub'.")
+
+    paths = get_category_paths()
+    grouped = {}
+    for cid, total in totals_by_id.items():
+        key = paths[cid][:width]
+        grouped[key] = grouped.get(key, 0) + total
+
+    keys = sorted(grouped, key=lambda k: tuple(part or "" for part in k))
+    return [(*key, grouped[key]) for key in keys]
@@ -0,0 +1,236 @@
+# backend/columnar.py
+"""
+A NumPy snapshot of the expenses table for vectorized analytics.
+
+Each column is one array, kept in id order:
+
+- ids    int64   expense id
+- days   int32   days since 1970-01-01
+- codes  uint16  category id
+- cents  int64   value in cents
+
+Filters become boolean masks and group-bys become np.bincount over small
+integer keys, so a full-history aggregate is a few passes over flat memory
+instead of millions of Python tuples.
+
+The snapshot follows crud writes through a write listener and applies them
+on the next read (see crud.DerivedView). A commit from anywhere else, such
+as another process, triggers a full reload, as does a backlog of more than
+PENDING_LIMIT written rows.
+
+    snapshot = Snapshot()
+    snapshot.range_sum("2024-01-01", "2024-06-30")      # (cents, count)
+    reports.use_snapshot(snapshot)                       # reports aggregate on it
+"""
+from itertools import islice
+
+import numpy as np
+
+from . import crud
+from .query import ExpenseQuery
+
+LOAD_CHUNK = 100_000
+PENDING_LIMIT = 100_000     # queued written rows before a reload is cheaper than replaying them
+GROUP_KEYS = ("category", "month", "day")
+
+
+def to_days(iso_dates):
+    """ISO date string(s) -> int32 days since 1970-01-01."""
+    return np.asarray(iso_dates, dtype="datetime64[D]").astype(np.int32)
+
+
+def days_to_iso(days):
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype(str)
+
+
+def days_to_months(days):
+    """int32 days -> months since 1970-01 (0 = 1970-01)."""
+    return np.asarray(days).astype("datetime64[D]").astype("datetime64[M]").astype(np.int32)
+
+
+def months_to_iso(months):
+    return np.asarray(months, dtype=np.int64).astype("datetime64[M]").astype(str)
+
+
+def _columns(rows):
+    """StoredRows -> (ids, days, codes, cents) arrays."""
+    if not rows:
+        return (np.empty(0, np.int64), np.empty(0, np.int32), np.empty(0, np.uint16), np.empty(0, np.int64))
+    ids, codes, dates, cents, _ = zip(*rows)
+    return (
+        np.array(ids, dtype=np.int64),
+        to_days(dates),
+        np.array(codes, dtype=np.uint16),
+        np.array(cents, dtype=np.int64),
+    )
+
+
+class Snapshot(crud.DerivedView):
+    def __init__(self, backend=None):
+        self._pending = []
+        self._pending_rows = 0
+        super().__init__(backend)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- loading and keeping up ---
+    def _load(self):
+        parts = []
+        rows = self.backend.query(chunk_size=LOAD_CHUNK)
+        while True:
+            batch = list(islice(rows, LOAD_CHUNK))
+            if not batch:
+                break
+            parts.append(_columns(batch))
+        columns = [np.concatenate(column) for column in zip(*parts)] if parts else _columns([])
+        order = np.argsort(columns[0], kind="stable")
+        self.ids, self.days, self.codes, self.cents = (column[order] for column in columns)
+        self._months = None
+        self._pending.clear()
+        self._pending_rows = 0
+
+    def _apply(self, kind, old_rows, new_rows):
+        # Queued until the next read; past PENDING_LIMIT rows a reload is cheaper
+        self._pending.append((kind, old_rows, new_rows))
+        self._pending_rows += len(old_rows) + len(new_rows)
+        if self._pending_rows > PENDING_LIMIT:
+            self._pending.clear()
+            self._pending_rows = 0
+            self._stale = True
+
+    def _replay(self, kind, old_rows, new_rows):
+        self._months = None
+        if kind == "insert":
+            ids, days, codes, cents = _columns(new_rows)
+            self.ids = np.concatenate([self.ids, ids])
+            self.days = np.concatenate([self.days, days])
+            self.codes = np.concatenate([self.codes, codes])
+            self.cents = np.concatenate([self.cents, cents])
+            if len(ids) and len(self.ids) > len(ids) and ids.min() < self.ids[-len(ids) - 1]:
+                order = np.argsort(self.ids, kind="stable")
+                self.ids, self.days, self.codes, self.cents = (
+                    column[order] for column in (self.ids, self.days, self.codes, self.cents)
+                )
+        elif kind == "update":
+            ids, days, codes, cents = _columns(new_rows)
+            at = np.searchsorted(self.ids, ids)
+            found = at < len(self.ids)
+            found[found] = self.ids[at[found]] == ids[found]
+            if not found.all():
+                # A row the snapshot does not hold: it has fallen behind
+                self._stale = True
+                return
+            self.days[at], self.codes[at], self.cents[at] = days, codes, cents
+        elif kind == "delete":
+            ids = np.array([row[0] for row in old_rows], dtype=np.int64)
+            keep = ~np.isin(self.ids, ids)
+            self.ids, self.days, self.codes, self.cents = (
+                column[keep] for column in (self.ids, self.days, self.codes, self.cents)
+            )
+
+    def refresh(self):
+        """Apply writes made since the last read; reload after outside commits."""
+        with self._lock:
+            super().refresh()
+            pending, self._pending = self._pending, []
+            self._pending_rows = 0
+            for change in pending:
+                if self._stale:
+                    break
+                self._replay(*change)
+            if self._stale:
+                self.rebuild()
+            return True
+
+    @property
+    def months(self):
+        """Months since 1970-01 per row, derived from days and kept until the next change."""
+        if self._months is None:
+            self._months = days_to_months(self.days)
+        return self._months
+
+    # --- primitives ---
+    def mask(self, category_ids=None, start=None, end=None, min_cents=None, max_cents=None):
+        """Boolean mask of the rows matching every given filter (dates inclusive)."""
+        self.refresh()
+        keep = np.ones(len(self.ids), dtype=bool)
+        if category_ids is not None:
+            wanted = np.zeros(max([0, *category_ids, int(self.codes.max(initial=0))]) + 1, dtype=bool)
+            wanted[list(category_ids)] = True
+            keep &= wanted[self.codes]
+        if start:
+            keep &= self.days >= to_days(start)
+        if end:
+            keep &= self.days <= to_days(end)
+        if min_cents is not None:
+            keep &= self.cents >= min_cents
+        if max_cents is not None:
+            keep &= self.cents <= max_cents
+        return keep
+
+    def range_sum(self, start=None, end=None, category_ids=None):
+        """(total_cents, count) over an inclusive date range."""
+        keep = self.mask(category_ids, start, end)
+        return int(self.cents[keep].sum()), int(keep.sum())
+
+    def filter(self, keep):
+        """The (ids, days, codes, cents) columns of the rows in a mask."""
+        return self.ids[keep], self.days[keep], self.codes[keep], self.cents[keep]
+
+    def group_by(self, key, keep=None):
+        """
+        Totals per key ("category", "month" or "day") over the masked rows.
+        Returns (keys, total_cents, counts) arrays for the non-empty keys, in
+        key order; months and days are numbered from 1970-01 / 1970-01-01.
+        """
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Invalid grouping '{key}'. Use one of {', '.join(GROUP_KEYS)}.")
+        if keep is None:
+            keep = self.mask()
+        cents = self.cents[keep]
+        values = {
+            "category": lambda: self.codes[keep].astype(np.int64),
+            "month": lambda: self.months[keep].astype(np.int64),
+            "day": lambda: self.days[keep].astype(np.int64),
+        }[key]()
+        if not len(values):
+            return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int64)
+
+        # Keys span a small range (categories, months or days of history), so
+        # bincount over the offsets beats sorting. float64 weights sum cents
+        # exactly up to 2**53.
+        low = values.min()
+        offsets = values - low
+        counts = np.bincount(offsets)
+        totals = np.rint(np.bincount(offsets, weights=cents)).astype(np.int64)
+        present = np.nonzero(counts)[0]
+        return present + low, totals[present], counts[present]
+
+    # --- ExpenseQuery ---
+    @staticmethod
+    def can_answer(spec):
+        """Totals and single-key groupings without a notes filter; row listings stay with the backend."""
+        return (spec.totals or (len(spec.group_keys) == 1 and spec.group_keys[0] in GROUP_KEYS)) and not spec.notes
+
+    def select(self, spec):
+        """Answer a totals or group_by ExpenseQuery in the same shape as StorageBackend.select."""
+        if not self.can_answer(spec):
+            raise ValueError("The columnar snapshot only answers totals and single-key groupings without a notes filter.")
+        min_cents, max_cents = spec.value_bounds()
+        with self._lock:
+            keep = self.mask(spec.category_ids(), spec.start, spec.end, min_cents, max_cents)
+            if spec.totals:
+                return iter([(int(self.cents[keep].sum()), int(keep.sum()))])
+            keys, totals, counts = self.group_by(spec.group_keys[0], keep)
+
+        if spec.group_keys == ("month",):
+            keys = months_to_iso(keys)
+        elif spec.group_keys == ("day",):
+            keys = days_to_iso(keys)
+        order = np.argsort(keys if spec.order == "key" else totals, kind="stable")
+        if spec.descending:
+            order = order[::-1]
+        if spec.limit is not None:
+            order = order[:spec.limit]
+        return iter([(keys[i].item(), int(totals[i]), int(counts[i])) for i in order])
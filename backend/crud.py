@@ -1,84 +1,424 @@
-from .database import get_connection
-from .validation import validate_category, CATEGORIES
-from .validators import validate_date, validate_value
+import base64
+import threading
+from calendar import monthrange
+from contextlib import contextmanager
+from itertools import islice
 
-def add_expense(main_cat, mid_cat, sub_cat, date, value, notes=""):
-    # Validate category/subcategory first (will raise if invalid)
+from . import cache
+from .categories import get_category_id
+from .database import FETCH_SIZE
+from .query import ExpenseQuery
+from .storage import expense_tuples, get_backend
+from .validation import validate_category
+from .validators import normalize_date, validate_cents
+
+# Rows validated and written per executemany() call by the bulk functions.
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _chunks(iterable, size):
+    """Yield lists of up to `size` (index, item) pairs from iterable."""
+    it = enumerate(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def check_row(main_cat, mid_cat, sub_cat, date, value, notes="", _seen_dates=None):
+    """
+    The checks on an expense row that need no database, so they can run in
+    another process: returns (main, mid, sub, iso_date, value_cents, notes).
+    """
     main_cat, mid_cat, sub_cat = validate_category(main_cat, mid_cat, sub_cat)
 
-    # Validate date & value
-    validate_date(date)
-    value = validate_value(value)
-
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO expenses (main_category, mid_category, sub_category, date, value, notes) VALUES (?, ?, ?, ?, ?, ?)",
-        (main_cat, mid_cat, sub_cat, date, value, notes)
-    )
-    exp_id = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return exp_id
+    # Statements repeat the same dates a lot, so only parse each one once per batch
+    if _seen_dates is None:
+        date = normalize_date(date)
+    elif date in _seen_dates:
+        date = _seen_dates[date]
+    else:
+        date = _seen_dates[date] = normalize_date(date)
+
+    value_cents = validate_cents(value)
+    return main_cat, mid_cat, sub_cat, date, value_cents, notes
+
+
+def _validate_row(main_cat, mid_cat, sub_cat, date, value, notes="", _seen_dates=None):
+    """Validate one expense row and return it as (category_id, date, value_cents, notes)."""
+    return _stored_fields(*check_row(main_cat, mid_cat, sub_cat, date, value, notes, _seen_dates))
+
+
+def _stored_fields(main_cat, mid_cat, sub_cat, date, value_cents, notes):
+    """A row from check_row() as (category_id, date, value_cents, notes)."""
+    return get_category_id(main_cat, mid_cat, sub_cat), date, value_cents, notes
+
+
+# Callbacks told about every write once it is committed: callback(kind, old_rows, new_rows),
+# kind "insert", "update" or "delete", rows as (id, category_id, date, value_cents, notes)
+_write_listeners = []
+_local = threading.local()  # per-thread transaction() depth and the writes it holds back
+_views = set()              # open DerivedViews, for reset_derived_views()
+
+
+def add_write_listener(callback):
+    """Subscribe to writes, e.g. to keep a derived index or snapshot up to date."""
+    _write_listeners.append(callback)
+
+
+def remove_write_listener(callback):
+    _write_listeners.remove(callback)
+
+
+@contextmanager
+def transaction():
+    """
+    Group crud writes into one transaction on the active backend:
+
+        with crud.transaction():
+            crud.add_expense(...)
+            crud.delete_expense(...)
+
+    Write listeners hear about the writes once the outermost block commits,
+    and not at all if it rolls back. Nested use joins the outer transaction.
+    """
+    depth = getattr(_local, "depth", 0)
+    if not depth:
+        _local.queued = []
+    _local.depth = depth + 1
+    try:
+        with get_backend().transaction():
+            yield
+    except BaseException:
+        if not depth:
+            queued, _local.queued = _local.queued, []
+            if queued:
+                # Results cached inside the block may include the rolled-back rows
+                cache.invalidate()
+        raise
+    finally:
+        _local.depth = depth
+    if not depth:
+        queued, _local.queued = _local.queued, []
+        if queued:
+            cache.committed()
+        for change in queued:
+            for callback in list(_write_listeners):
+                callback(*change)
+
+
+def _notify(kind, old_rows, new_rows, count):
+    """
+    Record a write of count rows: cached reports are dropped now, listeners
+    are told when transaction() commits. Writes of nothing are ignored.
+    """
+    if count:
+        cache.invalidate()
+        _local.queued.append((kind, old_rows, new_rows))
+
+
+class DerivedView:
+    """
+    Base for in-memory structures derived from the expenses (a snapshot, an
+    index, sketches) that follow crud writes instead of re-reading the table.
+
+    Subclasses implement _load(), which reads everything from the backend, and
+    _apply(kind, old_rows, new_rows), which folds in one write. A commit crud
+    did not make (another connection or process, a restore) shows up in
+    cache.outside_generation() and marks the view stale, and refresh() then
+    rebuilds it. Views whose callers can fall back to SQL set
+    REBUILD_WHEN_QUIET: refresh() returns False on the read that notices and
+    rebuilds on the next one, if no further outside commit came in between.
+    """
+
+    REBUILD_WHEN_QUIET = False
+
+    def __init__(self, backend=None):
+        self.backend = backend or get_backend()
+        self.rebuilds = 0
+        self._lock = threading.RLock()
+        self.rebuild()
+        add_write_listener(self._on_write)
+        _views.add(self)
+
+    def close(self):
+        """Stop following writes."""
+        remove_write_listener(self._on_write)
+        _views.discard(self)
+
+    def rebuild(self):
+        """Read everything from the backend again."""
+        with self._lock:
+            self._seen_outside = cache.outside_generation()
+            self._load()
+            self._stale = False
+            self.rebuilds += 1
+
+    def mark_stale(self):
+        """Rebuild on the next refresh()."""
+        with self._lock:
+            self._stale = True
+
+    @property
+    def stale(self):
+        return self._stale
+
+    def _on_write(self, kind, old_rows, new_rows):
+        if get_backend() is not self.backend:
+            return
+        with self._lock:
+            if not self._stale:
+                try:
+                    self._apply(kind, old_rows, new_rows)
+                except Exception:
+                    # The write is committed already; a half-applied view is
+                    # rebuilt on the next refresh() rather than failing the writer
+                    self._stale = True
+
+    def refresh(self):
+        """Catch up with outside commits; returns False while the view is stale."""
+        with self._lock:
+            outside = cache.outside_generation()
+            noticed = outside != self._seen_outside
+            if noticed:
+                self._stale, self._seen_outside = True, outside
+            if self._stale:
+                if noticed and self.REBUILD_WHEN_QUIET:
+                    return False
+                self.rebuild()
+            return True
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _apply(self, kind, old_rows, new_rows):
+        raise NotImplementedError
+
+
+def reset_derived_views():
+    """Mark every open DerivedView stale, e.g. after the database file was replaced."""
+    for view in list(_views):
+        view.mark_stale()
+
+
+def _missing_ids(backend, ids):
+    """Return the subset of ids that are not stored."""
+    found = backend.existing_ids(set(ids))
+    return {i for i in ids if i not in found}
+
+
+def add_expenses_bulk(rows, chunk_size=DEFAULT_CHUNK_SIZE, before_commit=None, checked=False):
+    """
+    Insert many expenses in a single transaction.
+    rows: iterable of (main_cat, mid_cat, sub_cat, date, value[, notes]), or
+    with checked=True, rows check_row() already returned (e.g. in worker
+    processes), which are stored without validating them again.
+    Returns (ids, errors): the new ids of the inserted rows in input order, and
+    a list of (row_index, exception) for rows that failed validation and were skipped.
+    before_commit(ids, errors), if given, runs inside the transaction, e.g. to
+    record import progress atomically with the rows.
+    """
+    ids, errors = [], []
+    seen_dates = {}
+    inserted = []
+
+    backend = get_backend()
+    with transaction():
+        for chunk in _chunks(rows, chunk_size):
+            valid = []
+            for index, row in chunk:
+                try:
+                    valid.append(_stored_fields(*row) if checked else _validate_row(*row, _seen_dates=seen_dates))
+                except (ValueError, TypeError) as e:
+                    errors.append((index, e))
+            if valid:
+                new_ids = backend.insert(valid)
+                ids.extend(new_ids)
+                if _write_listeners:
+                    inserted.extend((i, *fields) for i, fields in zip(new_ids, valid))
+        if before_commit is not None:
+            before_commit(ids, errors)
+        _notify("insert", [], inserted, len(ids))
+    return ids, errors
+
+
+def update_expenses_bulk(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Update many expenses in a single transaction.
+    rows: iterable of (expense_id, main_cat, mid_cat, sub_cat, date, value[, notes]).
+    Returns (ids, errors): the updated ids, and (row_index, exception) for rows
+    that failed validation or whose id does not exist.
+    """
+    ids, errors = [], []
+    seen_dates = {}
+    old_rows, new_rows = [], []
+
+    backend = get_backend()
+    with transaction():
+        for chunk in _chunks(rows, chunk_size):
+            valid = []
+            for index, row in chunk:
+                try:
+                    expense_id, *fields = row
+                    valid.append((index, expense_id, _validate_row(*fields, _seen_dates=seen_dates)))
+                except (ValueError, TypeError) as e:
+                    errors.append((index, e))
+            if not valid:
+                continue
+
+            missing = _missing_ids(backend, [expense_id for _, expense_id, _ in valid])
+            stored = []
+            for index, expense_id, fields in valid:
+                if expense_id in missing:
+                    errors.append((index, LookupError(f"❌ No expense found with ID {expense_id}")))
+                    continue
+                stored.append((expense_id, *fields))
+                ids.append(expense_id)
+
+            if _write_listeners:
+                # An id updated twice in a chunk ends up with its last row
+                final = {row[0]: row for row in stored}
+                old_rows.extend(backend.fetch(final))
+                new_rows.extend(final[i] for i in sorted(final))
+            backend.update(stored)
+        _notify("update", old_rows, new_rows, len(ids))
+
+    errors.sort(key=lambda e: e[0])
+    return ids, errors
+
+
+def delete_expenses_bulk(expense_ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Delete many expenses in a single transaction.
+    Returns (ids, errors): the deleted ids, each once however often it was
+    given, and (index, LookupError) for ids that do not exist.
+    """
+    ids, errors = [], []
+    old_rows = []
+    deleted = set()
+
+    backend = get_backend()
+    with transaction():
+        for chunk in _chunks(expense_ids, chunk_size):
+            missing = _missing_ids(backend, [expense_id for _, expense_id in chunk])
+            found = []
+            for index, expense_id in chunk:
+                if expense_id in deleted:
+                    continue
+                if expense_id in missing:
+                    errors.append((index, LookupError(f"❌ No expense found with ID {expense_id}")))
+                    continue
+                deleted.add(expense_id)
+                found.append(expense_id)
+                ids.append(expense_id)
+
+            if _write_listeners:
+                old_rows.extend(backend.fetch(found))
+            backend.delete(found)
+        _notify("delete", old_rows, [], len(ids))
+    return ids, errors
+
+
+def add_expense(main_cat, mid_cat, sub_cat, date, value, notes=""):
+    ids, errors = add_expenses_bulk([(main_cat, mid_cat, sub_cat, date, value, notes)])
+    if errors:
+        raise errors[0][1]
+    return ids[0]
 
 def update_expense(expense_id, main_cat, mid_cat, sub_cat, date, value, notes=""):
-    main_cat, mid_cat, sub_cat = validate_category(main_cat, mid_cat, sub_cat)
-    validate_date(date)
-    value = validate_value(value)
-
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE expenses
-        SET main_category = ?, mid_category = ?, sub_category = ?, date = ?, value = ?, notes = ?
-        WHERE id = ?
-    """, (main_cat, mid_cat, sub_cat, date, value, notes, expense_id))
-
-    if cur.rowcount == 0:
-        conn.close()
-        raise LookupError(f"❌ No expense found with ID {expense_id}")
-    conn.commit()
-    conn.close()
+    _, errors = update_expenses_bulk([(expense_id, main_cat, mid_cat, sub_cat, date, value, notes)])
+    if errors:
+        raise errors[0][1]
+
+def _month_range(year=None, month=None):
+    """Inclusive (first, last) ISO date bounds for a year or a single month, or (None, None)."""
+    if not year:
+        return None, None
+    year = int(year)
+    if month:
+        month = int(month)
+        return f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-{monthrange(year, month)[1]:02d}"
+    return f"{year:04d}-01-01", f"{year:04d}-12-31"
+
+def iter_expenses(year: int = None, month: int = None, chunk_size=FETCH_SIZE):
+    """Stream (id, main, mid, sub, date, value, notes) rows ordered by date."""
+    start, end = _month_range(year, month)
+    return expense_tuples(get_backend().query(start=start, end=end, chunk_size=chunk_size))
 
 def get_expenses(year: int = None, month: int = None):
-    conn = get_connection()
-    cur = conn.cursor()
+    return list(iter_expenses(year, month))
+
+def _encode_cursor(row):
+    """Opaque page cursor for an expense row: its (date, id) sort key."""
+    return base64.urlsafe_b64encode(f"{row[4]}|{row[0]}".encode()).decode()
 
-    query = """
-        SELECT id, main_category, mid_category, sub_category, date, value, notes
-        FROM expenses
+def _decode_cursor(cursor):
+    try:
+        date, expense_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date, int(expense_id)
+    except (ValueError, UnicodeError, AttributeError):
+        raise ValueError("Invalid page cursor.")
+
+def get_expenses_page(year: int = None, month: int = None, page_size=50, after=None, before=None,
+                      newest_first=False, with_total=False):
+    """
+    Return one page of expenses ordered by (date, id), using keyset cursors
+    instead of OFFSET so every page costs the same however deep it is.
+    - after: cursor from a previous page's "next" (rows following it)
+    - before: cursor from a previous page's "prev" (rows preceding it)
+    - newest_first: order by date descending
+    - with_total: also count all matching rows
+    Returns {"rows": [...], "next": cursor|None, "prev": cursor|None, "total": int|None}.
     """
-    params = []
+    if after and before:
+        raise ValueError("Pass either 'after' or 'before', not both.")
 
-    if year and month:
-        query += " WHERE strftime('%Y', date)=? AND strftime('%m', date)=?"
-        params.extend([str(year), f"{month:02d}"])
-    elif year:
-        query += " WHERE strftime('%Y', date)=?"
-        params.append(str(year))
+    start, end = _month_range(year, month)
 
-    query += " ORDER BY date ASC"
+    # Paging backwards walks the index in the opposite direction, then flips the page
+    backwards = bool(before)
+    descending = newest_first != backwards
+    cursor = before or after
+    rows = list(expense_tuples(get_backend().query(
+        start=start, end=end, after=_decode_cursor(cursor) if cursor else None,
+        descending=descending, limit=page_size + 1,
+    )))
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
 
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
+    page = {"rows": rows, "next": None, "prev": None, "total": None}
+    if rows:
+        if backwards:
+            page["next"] = _encode_cursor(rows[-1])
+            page["prev"] = _encode_cursor(rows[0]) if has_more else None
+        else:
+            page["next"] = _encode_cursor(rows[-1]) if has_more else None
+            page["prev"] = _encode_cursor(rows[0]) if cursor else None
+    if with_total:
+        page["total"] = count_expenses(year, month)
+    return page
 
-    return [(r[0], r[1], r[2], r[3], r[4], float(r[5]), r[6]) for r in rows]
+def count_expenses(year: int = None, month: int = None):
+    """Number of expenses, optionally in one year or month."""
+    start, end = _month_range(year, month)
+    _, count = next(get_backend().select(ExpenseQuery(start=start, end=end, totals=True)))
+    return count
 
 def get_available_years():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT strftime('%Y', date) FROM expenses ORDER BY 1 ASC")
-    years = [int(r[0]) for r in cur.fetchall() if r[0]]
-    conn.close()
+    # Hop from year to year through the date index instead of scanning every row
+    backend = get_backend()
+    years = []
+    first = backend.min_date()
+    while first:
+        year = int(first[:4])
+        years.append(year)
+        first = backend.min_date(f"{year + 1:04d}-01-01")
     return years
 
 def delete_expense(expense_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM expenses WHERE id=?", (expense_id,))
-    if cursor.rowcount == 0:
-        conn.close()
-        raise LookupError(f"❌ No expense found with ID {expense_id}")
-    conn.commit()
-    conn.close()
+    _, errors = delete_expenses_bulk([expense_id])
+    if errors:
+        raise errors[0][1]
@@ -1,25 +1,330 @@
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
 
 DB_NAME = "expenses.db"
 
+# Applied to every connection we open. WAL lets readers run while a writer
+# commits, and NORMAL sync is durable across app crashes in WAL mode.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -64000),        # ~64 MB page cache (negative = KiB)
+    ("mmap_size", 268435456),      # 256 MB memory-mapped reads
+    ("temp_store", "MEMORY"),      # sorter and temp b-trees in RAM instead of temp files
+    ("foreign_keys", "ON"),
+)
+
+# Rows pulled per fetchmany() round trip by iter_rows()
+FETCH_SIZE = 500
+
+_local = threading.local()
+_open_connections = set()
+_connections_lock = threading.Lock()
+
+
+def connect(db_name=None):
+    """
+    Open a new tuned connection to db_name (defaults to DB_NAME).
+    The caller owns it and must close it; most code should use get_connection().
+    """
+    conn = sqlite3.connect(db_name or DB_NAME, isolation_level=None, check_same_thread=False)
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def _is_open(conn):
+    try:
+        conn.total_changes
+    except sqlite3.ProgrammingError:
+        return False
+    return True
+
+
 def get_connection():
-    return sqlite3.connect(DB_NAME)
+    """
+    Return this thread's long-lived connection, opening it on first use.
+    The connection is reused across calls, so callers must not close it.
+    It runs in autocommit mode; use transaction() to group writes.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.db_name == DB_NAME and _is_open(conn):
+        return conn
+    if conn is not None:
+        _discard(conn)
 
-def init_db():
-    """Create the expenses table if it doesn't exist."""
+    conn = connect()
+    if getattr(_local, "read_only", False):
+        conn.execute("PRAGMA query_only=ON")
+    _local.conn = conn
+    _local.db_name = DB_NAME
+    with _connections_lock:
+        _open_connections.add(conn)
+    return conn
+
+
+def set_read_only(read_only=True):
+    """
+    Make the calling thread's connection refuse writes (PRAGMA query_only),
+    now and whenever it is reopened. Used by reader threads.
+    """
+    _local.read_only = read_only
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _is_open(conn):
+        conn.execute(f"PRAGMA query_only={'ON' if read_only else 'OFF'}")
+
+
+def _discard(conn):
+    with _connections_lock:
+        _open_connections.discard(conn)
+    conn.close()
+    _local.conn = None
+
+
+def close_connection():
+    """Close the calling thread's connection (a new one opens on next use)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        _discard(conn)
+
+
+def close_all_connections():
+    """Close every pooled connection, e.g. before moving or deleting the DB file."""
+    with _connections_lock:
+        conns = list(_open_connections)
+        _open_connections.clear()
+    for conn in conns:
+        conn.close()
+    _local.conn = None
+
+
+@contextmanager
+def transaction():
+    """
+    Run a block of statements as one transaction on the thread's connection:
+
+        with transaction() as conn:
+            conn.execute("INSERT ...")
+
+    Commits on success and rolls back if the block raises. Nested use joins
+    the outer transaction.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS expenses (
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def iter_rows(query, params=(), chunk_size=FETCH_SIZE):
+    """
+    Yield the rows of a SELECT lazily, fetching chunk_size at a time, so memory
+    stays flat however many rows match. Runs on the thread's pooled connection;
+    the cursor is closed when the generator is exhausted, closed or collected.
+    """
+    cur = get_connection().execute(query, params)
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cur.close()
+
+
+def _iso_date(value):
+    """A stored date as zero-padded YYYY-MM-DD, or unchanged if it doesn't parse."""
+    from .validators import parse_date
+
+    try:
+        return parse_date(value).isoformat()
+    except ValueError:
+        return value
+
+
+def _migrate_v1(conn):
+    """Normalize stored dates to YYYY-MM-DD and add the date and category indexes."""
+    # Legacy rows may use slashes or skip the zero padding ("2024/1/5")
+    conn.create_function("iso_date", 1, _iso_date, deterministic=True)
+    conn.execute("UPDATE expenses SET date = iso_date(date) WHERE date IS NOT iso_date(date)")
+    # (date, value) lets date-range totals be answered from the index alone
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date, value)")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_expenses_category
+        ON expenses (main_category, mid_category, sub_category, date, value)
+    """)
+
+
+def _migrate_v2(conn):
+    """
+    Move the category strings into the categories table and rebuild expenses
+    around an integer category_id foreign key.
+    """
+    from . import categories
+
+    categories.create_table(conn)
+    categories.seed(conn)
+    # Keep any legacy paths that are no longer in CATEGORIES
+    categories.seed(conn, conn.execute(
+        "SELECT DISTINCT main_category, mid_category, sub_category FROM expenses"
+    ).fetchall())
+
+    _rebuild_expenses(
+        conn,
+        """
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            main_category TEXT NOT NULL,
-            mid_category TEXT,
-            sub_category TEXT,
+            category_id INTEGER NOT NULL REFERENCES categories (id),
             date TEXT NOT NULL,
             value REAL NOT NULL,
             notes TEXT
+        """,
+        """
+            SELECT e.id, c.id, e.date, e.value, e.notes
+            FROM expenses e
+            JOIN categories c
+              ON c.main_category = e.main_category
+             AND c.mid_category IS e.mid_category
+             AND c.sub_category IS e.sub_category
+        """,
+    )
+    conn.execute("CREATE INDEX idx_expenses_date ON expenses (date, value)")
+    conn.execute("CREATE INDEX idx_expenses_category ON expenses (category_id, date, value)")
+
+
+def _migrate_v3(conn):
+    """Store amounts as exact INTEGER cents in value_cents instead of a REAL value."""
+    from .money import to_cents
+
+    conn.create_function("to_cents", 1, to_cents, deterministic=True)
+    _rebuild_expenses(
+        conn,
+        """
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            date TEXT NOT NULL,
+            value_cents INTEGER NOT NULL,
+            notes TEXT
+        """,
+        "SELECT id, category_id, date, to_cents(value), notes FROM expenses",
+    )
+    conn.execute("CREATE INDEX idx_expenses_date ON expenses (date, value_cents)")
+    conn.execute("CREATE INDEX idx_expenses_category ON expenses (category_id, date, value_cents)")
+
+
+def _migrate_v4(conn):
+    """Add the trigger-maintained monthly_category_totals table and fill it."""
+    from . import aggregates
+
+    aggregates.create_monthly_totals(conn)
+    aggregates.rebuild_monthly_totals()
+
+
+def _migrate_v5(conn):
+    """
+    Index (date, id, value_cents): ordered by (date, id), so keyset pages walk
+    it without a sort, and still covering, so date-range totals over partial
+    months are answered from the index alone.
+    """
+    conn.execute("DROP INDEX IF EXISTS idx_expenses_date")
+    conn.execute("CREATE INDEX idx_expenses_date ON expenses (date, id, value_cents)")
+
+
+def _migrate_v6(conn):
+    """Add the budgets table."""
+    from . import budgets
+
+    budgets.create_table(conn)
+
+
+def _migrate_v7(conn):
+    """Add import_checkpoints, which lets an interrupted import resume where it committed."""
+    conn.execute("""
+        CREATE TABLE import_checkpoints (
+            source TEXT PRIMARY KEY,
+            state TEXT NOT NULL          -- JSON, see backend.importer
         )
     """)
-    conn.commit()
-    conn.close()
+
+
+def _rebuild_expenses(conn, columns_sql, select_sql):
+    """
+    Replace the expenses table with one declared as `columns_sql`, filled from
+    `select_sql` (which reads the old table). Indexes must be recreated by the
+    caller; the AUTOINCREMENT sequence is carried over so ids are never reused.
+    """
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'expenses'").fetchone()
+    last_seq = row[0] if row else 0
+
+    conn.execute(f"CREATE TABLE expenses_new ({columns_sql})")
+    conn.execute(f"INSERT INTO expenses_new {select_sql}")
+    conn.execute("DROP TABLE expenses")
+    conn.execute("ALTER TABLE expenses_new RENAME TO expenses")
+
+    cur = conn.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'expenses'", (last_seq,))
+    if cur.rowcount == 0 and last_seq:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('expenses', ?)", (last_seq,))
+
+
+# MIGRATIONS[i] upgrades a database from user_version i to i + 1.
+# Append new steps; never edit one that has shipped.
+MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+    _migrate_v5,
+    _migrate_v6,
+    _migrate_v7,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn=None):
+    conn = conn or get_connection()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate():
+    """Apply any pending MIGRATIONS, each in its own transaction."""
+    version = get_schema_version()
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this app supports ({SCHEMA_VERSION})."
+        )
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        with transaction() as conn:
+            MIGRATIONS[target - 1](conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+
+    # Pick up paths added to CATEGORIES since the database was created
+    from . import categories
+    with transaction() as conn:
+        categories.seed(conn)
+
+
+def init_db():
+    """Create the expenses table if it doesn't exist and bring the schema up to date."""
+    with transaction() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS expenses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                main_category TEXT NOT NULL,
+                mid_category TEXT,
+                sub_category TEXT,
+                date TEXT NOT NULL,
+                value REAL NOT NULL,
+                notes TEXT
+            )
+        """)
+    migrate()
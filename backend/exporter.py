@@ -0,0 +1,122 @@
+# backend/exporter.py
+"""
+Write any ExpenseQuery out as CSV or JSON Lines, optionally gzip-compressed,
+in constant memory.
+
+Rows come from reports.run_query, so plain rows stream off the backend's
+cursor FETCH_SIZE at a time and are written as they arrive; nothing builds
+the whole result first. Category ids are written as their main/mid/sub path
+and cents as amounts, the way the frontends show them:
+
+- plain rows: id, main, mid, sub, date, value, notes
+- totals=True: total, count
+- group_by: the key columns (main, mid, sub for "category"; month; day;
+  value), then total, count
+
+The file is written next to its destination and renamed into place when
+complete, so an interrupted export never leaves a truncated file behind.
+
+    exporter.export(ExpenseQuery(main="Daily Expenses", start="2024-01-01"), "daily.csv.gz")
+    exporter.export(ExpenseQuery(group_by="month"), "monthly.jsonl")
+"""
+import csv
+import gzip
+import json
+import os
+
+from . import reports
+from .database import FETCH_SIZE
+from .money import from_cents
+from .storage import expense_tuples, get_backend
+
+FORMATS = ("csv", "jsonl")
+ROW_COLUMNS = ("id", "main", "mid", "sub", "date", "value", "notes")
+_KEY_COLUMNS = {"category": ("main", "mid", "sub"), "month": ("month",), "day": ("day",), "value": ("value",)}
+
+
+def columns(spec):
+    """Column names of the records spec exports."""
+    if spec.totals:
+        return ("total", "count")
+    if spec.group_by:
+        return tuple(name for key in spec.group_keys for name in _KEY_COLUMNS[key]) + ("total", "count")
+    return ROW_COLUMNS
+
+
+def iter_records(spec, chunk_size=FETCH_SIZE):
+    """Yield spec's rows as tuples matching columns(spec), chunk_size rows per fetch."""
+    rows = reports.run_query(spec, chunk_size)
+    paths = get_backend().category_paths()
+    if not spec.group_by and not spec.totals:
+        return expense_tuples(rows, paths)
+    keys = spec.group_keys
+    return (
+        (*_expand_keys(keys, row[:-2], paths), from_cents(row[-2]), row[-1])
+        for row in rows
+    )
+
+
+def _expand_keys(keys, values, paths):
+    for key, value in zip(keys, values):
+        if key == "category":
+            yield from paths[value]
+        elif key == "value":
+            yield from_cents(value)
+        else:
+            yield value
+
+
+def _format(path, fmt, compress):
+    """(format, compress) from the arguments or else the file name, e.g. "x.jsonl.gz"."""
+    name = os.fspath(path).lower()
+    if compress is None:
+        compress = name.endswith(".gz")
+    if fmt is None:
+        stem = name[:-3] if name.endswith(".gz") else name
+        fmt = os.path.splitext(stem)[1].lstrip(".") or "csv"
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid export format '{fmt}'. Use one of {', '.join(FORMATS)}.")
+    return fmt, compress
+
+
+def _write_csv(f, header, records):
+    writer = csv.writer(f)
+    writer.writerow(header)
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    return count
+
+
+def _write_jsonl(f, header, records):
+    count = 0
+    for record in records:
+        f.write(json.dumps(dict(zip(header, record)), ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def export(spec, path, fmt=None, compress=None, chunk_size=FETCH_SIZE):
+    """
+    Write spec's rows to path and return how many were written. fmt ("csv"
+    or "jsonl") and compress default to what the file name says
+    ("report.jsonl.gz"), else plain CSV.
+    """
+    fmt, compress = _format(path, fmt, compress)
+    header = columns(spec)
+    records = iter_records(spec, chunk_size)
+    partial = f"{os.fspath(path)}.part"
+    opener = gzip.open if compress else open
+    try:
+        with opener(partial, "wt", newline="", encoding="utf-8") as f:
+            count = (_write_csv if fmt == "csv" else _write_jsonl)(f, header, records)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        records.close()
+    return count
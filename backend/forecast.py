@@ -0,0 +1,125 @@
+# backend/forecast.py
+"""
+Day-of-period spending curves for projecting the end of the current month
+or year.
+
+For every category and period (a month "YYYY-MM" or a year "YYYY") the model
+keeps spend per day of the period, plus a running sum of those arrays over
+all periods. A forecast for some categories then needs only:
+
+- spent so far: the current period's array up to today
+- the history curve: the running sum minus the current period, which says
+  how much of a typical period's spend has usually happened by this day
+
+projected = spent so far + (average past period total - its share usually
+spent by today). Spend that always lands late (rent on the 28th) is still
+expected, and a category with no history falls back to a straight-line pace.
+
+The arrays follow crud writes and are rebuilt after outside commits (see
+crud.DerivedView), so a forecast is a few array sums rather than a scan of
+the rows.
+"""
+from array import array
+from calendar import isleap, monthrange
+from datetime import date
+
+from . import crud
+from .query import ExpenseQuery
+
+PERIODS = ("month", "year")
+_SLOTS = {"month": 31, "year": 366}
+
+
+def period_key(period, iso):
+    """The month ("YYYY-MM") or year ("YYYY") an ISO date falls in."""
+    return iso[:7] if period == "month" else iso[:4]
+
+
+def day_of_period(period, iso):
+    """1-based day of the month or year."""
+    if period == "month":
+        return int(iso[8:10])
+    return date.fromisoformat(iso).timetuple().tm_yday
+
+
+def _index(period, key):
+    """Consecutive period number, so gaps between periods can be counted."""
+    return int(key[:4]) * 12 + int(key[5:7]) - 1 if period == "month" else int(key)
+
+
+def period_length(period, key):
+    year = int(key[:4])
+    if period == "month":
+        return monthrange(year, int(key[5:7]))[1]
+    return 366 if isleap(year) else 365
+
+
+class ForecastModel(crud.DerivedView):
+    # --- building and keeping up ---
+    def _load(self):
+        """Read per-day, per-category totals from the backend."""
+        self._cells = {period: {} for period in PERIODS}    # category_id -> {key: cents per day}
+        self._history = {period: {} for period in PERIODS}  # category_id -> cents per day, all periods
+        for category_id, iso, cents, _ in self.backend.select(ExpenseQuery(group_by=("category", "day"))):
+            self._add(category_id, iso, cents)
+
+    def _add(self, category_id, iso, cents):
+        for period in PERIODS:
+            slot = day_of_period(period, iso) - 1
+            cells = self._cells[period].setdefault(category_id, {})
+            key = period_key(period, iso)
+            if key not in cells:
+                cells[key] = array("q", bytes(8 * _SLOTS[period]))
+            cells[key][slot] += cents
+            if cents < 0 and not any(cells[key]):
+                del cells[key]
+            history = self._history[period]
+            if category_id not in history:
+                history[category_id] = array("q", bytes(8 * _SLOTS[period]))
+            history[category_id][slot] += cents
+
+    def _apply(self, kind, old_rows, new_rows):
+        for rows, sign in ((old_rows, -1), (new_rows, 1)):
+            for _, category_id, iso, cents, _ in rows:
+                self._add(category_id, iso, sign * cents)
+
+    # --- forecasting ---
+    def project(self, period, category_ids, today=None):
+        """
+        (spent_cents, projected_cents) for the categories over the period
+        containing today (default: the real today).
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Invalid period '{period}'. Use one of {', '.join(PERIODS)}.")
+        iso = today if isinstance(today, str) else (today or date.today()).isoformat()
+        current = period_key(period, iso)
+        day = day_of_period(period, iso)
+        length = period_length(period, current)
+        wanted = set(category_ids)
+
+        with self._lock:
+            self.refresh()
+            spent = past_total = past_to_date = 0
+            first = None
+            for category_id in wanted:
+                cells = self._cells[period].get(category_id)
+                if not cells:
+                    continue
+                # All periods minus this one and any (post-dated) later ones
+                past = list(self._history[period][category_id])
+                for key, daily in cells.items():
+                    if key >= current:
+                        past = [a - b for a, b in zip(past, daily)]
+                    elif first is None or key < first:
+                        first = key
+                if current in cells:
+                    spent += sum(cells[current][:day])
+                past_total += sum(past)
+                past_to_date += sum(past[:day])
+
+        if first is None or past_total <= 0:
+            return spent, round(spent * length / day)
+        # Past periods from the group's first one, empty ones included
+        periods = _index(period, current) - _index(period, first)
+        expected_remaining = max(past_total - past_to_date, 0) / periods
+        return spent, round(spent + expected_remaining)
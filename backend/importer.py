@@ -0,0 +1,354 @@
+# backend/importer.py
+"""
+Stream expenses in from CSV files (exports, bank statements) in constant memory.
+
+Rows are read one at a time, mapped onto (main, mid, sub, date, value,
+notes), and handed to crud.add_expenses_bulk in batches; each batch is one
+transaction and is validated chunk by chunk there. Only the current batch
+is held in memory, whatever the file size.
+
+- mapping: field -> CSV column, for any of main, mid, sub, date, value and
+  notes; defaults: field -> fixed value for fields the file lacks (a bank
+  statement usually has no categories). Category names are matched to
+  validation.CATEGORIES ignoring case and surrounding spaces.
+- rejected rows are appended to a CSV report with their line number and
+  the validation error.
+- progress is stored as a checkpoint in the same transaction as each
+  batch, so an interrupted import resumes after the last committed batch
+  with no row imported twice.
+
+    result = importer.import_csv("statement.csv",
+                                 mapping={"date": "Booking date", "value": "Amount", "notes": "Text"},
+                                 defaults={"main": "Daily Expenses", "mid": "Others", "sub": "Others"},
+                                 rejects="statement.rejected.csv")
+    # {"rows": 120000, "imported": 119990, "rejected": 10, "resumed_from": 0, ...}
+
+import_files() imports many files at once using every core. The calling
+thread reads the files in order and hands chunks of rows to a process pool,
+which maps categories and validates dates and values (crud.check_row).
+Finished chunks go, in submission order, through a bounded queue to a single
+writer thread that commits large batches. The result is the same as
+importing the files one after the other:
+
+    results = importer.import_files(sorted(glob("statements/2024-*.csv")), workers=4, ...)
+"""
+import csv
+import hashlib
+import io
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from multiprocessing import get_context
+
+from . import crud, database
+from .storage import get_backend
+from .validation import CATEGORIES
+
+FIELDS = ("main", "mid", "sub", "date", "value", "notes")
+DEFAULT_MAPPING = {field: field for field in FIELDS}
+DEFAULT_BATCH_SIZE = 50_000   # rows per transaction
+DEFAULT_CHUNK_ROWS = 5_000    # rows per task handed to a worker process
+REJECTS_SUFFIX = ".rejected.csv"
+FINGERPRINT_BYTES = 1 << 16
+_COUNTS = ("rows", "imported", "rejected", "batches")
+
+
+@lru_cache(maxsize=1)
+def _category_names():
+    """Lower-cased name -> canonical name, per level of CATEGORIES."""
+    mains = {main.lower(): main for main in CATEGORIES}
+    mids = {main: {mid.lower(): mid for mid in mids} for main, mids in CATEGORIES.items()}
+    subs = {
+        (main, mid): {sub.lower(): sub for sub in subs}
+        for main, mids in CATEGORIES.items() for mid, subs in mids.items() if subs
+    }
+    return mains, mids, subs
+
+
+def _canonical_path(names, main, mid, sub):
+    """Match a category path to CATEGORIES' spelling; unknown parts are left for validation to reject."""
+    mains, mids, subs = names
+    main = mains.get(main.strip().lower(), main) if main else None
+    mid = mids.get(main, {}).get(mid.strip().lower(), mid) if mid else None
+    sub = subs.get((main, mid), {}).get(sub.strip().lower(), sub) if sub else None
+    return main, mid, sub
+
+
+def _prepare(values):
+    """Column values -> an add_expenses_bulk row, with categories spelled as in CATEGORIES."""
+    return (*_canonical_path(_category_names(), *values[:3]), *values[3:5], values[5] or "")
+
+
+def _check_chunk(chunk):
+    """
+    Worker process task: prepare and check a chunk of column values. Returns
+    (rows, errors): check_row() results for the good rows, in order, and
+    (index, message) for the others.
+    """
+    rows, errors, seen_dates = [], [], {}
+    for index, values in enumerate(chunk):
+        try:
+            rows.append(crud.check_row(*_prepare(values), _seen_dates=seen_dates))
+        except (ValueError, TypeError) as e:
+            errors.append((index, str(e)))
+    return rows, errors
+
+
+def fingerprint(path):
+    """Identify a file's content cheaply: its size and a hash of its first 64 KiB."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+    return f"{os.path.getsize(path)}:{digest.hexdigest()}"
+
+
+def _fields(mapping, defaults):
+    mapping = {**DEFAULT_MAPPING, **(mapping or {})}
+    defaults = defaults or {}
+    unknown = (set(mapping) | set(defaults)) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown import fields: {', '.join(sorted(unknown))}. Use {', '.join(FIELDS)}.")
+    return mapping, defaults
+
+
+class _Job:
+    """One file's import: its checkpoint, running counts and rejected-rows report."""
+
+    def __init__(self, backend, path, resume):
+        self.backend, self.path = backend, path
+        self.source = os.path.abspath(path)
+        self.size = os.path.getsize(path)
+        current = fingerprint(path)
+        if not resume:
+            backend.delete_checkpoint(self.source)
+        state = backend.load_checkpoint(self.source)
+        if state is not None and state["fingerprint"] != current:
+            raise ValueError(f"{path} changed since its import was interrupted; import it again with resume=False.")
+        self.state = state or {"fingerprint": current, "rows": 0, "imported": 0, "rejected": 0, "batches": 0}
+        self.resumed_from = self.state["rows"]
+        self._report = self._reject_writer = None
+
+    def summary(self):
+        summary = {"source": self.source, "resumed_from": self.resumed_from}
+        summary.update((key, self.state[key]) for key in _COUNTS)
+        return summary
+
+    @contextmanager
+    def open(self, mapping, defaults, rejects, delimiter, encoding):
+        """
+        Yield (raw file, DictReader) after checking the columns, and open the
+        rejects report (which stays open until close()). The report is started
+        afresh unless the import resumes from a checkpoint.
+        """
+        with open(self.path, "rb") as raw:
+            reader = csv.DictReader(io.TextIOWrapper(raw, encoding=encoding, newline=""), delimiter=delimiter)
+            columns = reader.fieldnames or []
+            missing = [
+                mapping[field] for field in ("main", "mid", "date", "value")
+                if field not in defaults and mapping[field] not in columns
+            ]
+            if missing:
+                raise ValueError(f"{self.path} has no column(s) {', '.join(missing)}.")
+            if rejects:
+                self._report = open(rejects, "a" if self.resumed_from else "w", newline="", encoding="utf-8")
+                self._reject_writer = csv.writer(self._report)
+                if self._report.tell() == 0:
+                    self._reject_writer.writerow(["line", "error", *columns])
+            yield raw, reader
+
+    def write(self, batch, rejected=(), checked=False):
+        """
+        Insert a batch of (line, record, row); rows that already failed a
+        check come as rejected (line, record, error). The checkpoint and the
+        rejected rows are recorded before the batch commits.
+        """
+        def before_commit(ids, errors):
+            failed = [*rejected, *((batch[index][0], batch[index][1], error) for index, error in errors)]
+            if self._reject_writer is not None:
+                for line, record, error in sorted(failed, key=lambda item: item[0]):
+                    self._reject_writer.writerow([line, str(error), *record.values()])
+            self.state.update(
+                rows=self.state["rows"] + len(batch) + len(rejected),
+                imported=self.state["imported"] + len(ids),
+                rejected=self.state["rejected"] + len(failed),
+                batches=self.state["batches"] + 1,
+            )
+            self.backend.save_checkpoint(self.source, self.state)
+
+        crud.add_expenses_bulk((row for _, _, row in batch), before_commit=before_commit, checked=checked)
+
+    def finish(self):
+        self.backend.delete_checkpoint(self.source)
+
+    def close(self):
+        if self._report is not None:
+            self._report.close()
+            self._report = self._reject_writer = None
+
+
+def import_csv(path, mapping=None, defaults=None, batch_size=DEFAULT_BATCH_SIZE,
+               rejects=None, progress=None, resume=True, delimiter=",", encoding="utf-8-sig"):
+    """
+    Import a CSV file and return a summary:
+
+        {"source", "rows", "imported", "rejected", "resumed_from", "batches"}
+
+    A field takes its mapped column's value, or its default when the cell is
+    empty or the column is missing. rows counts data rows read, including any
+    a resumed import skipped. progress(summary, fraction) is called after
+    every committed batch, with the share of the file read so far.
+    resume=False discards any checkpoint and starts from the first row; a
+    checkpoint for a file that has changed since is refused with ValueError.
+    """
+    mapping, defaults = _fields(mapping, defaults)
+    job = _Job(get_backend(), path, resume)
+    try:
+        with job.open(mapping, defaults, rejects, delimiter, encoding) as (raw, reader):
+            batch = []
+            for number, record in enumerate(reader):
+                if number < job.resumed_from:
+                    continue
+                values = [record.get(mapping[field]) or defaults.get(field) for field in FIELDS]
+                batch.append((reader.line_num, record, _prepare(values)))
+                if len(batch) >= batch_size:
+                    job.write(batch)
+                    batch.clear()
+                    if progress:
+                        progress(job.summary(), raw.tell() / (job.size or 1))
+            if batch:
+                job.write(batch)
+                if progress:
+                    progress(job.summary(), 1.0)
+    finally:
+        job.close()
+    job.finish()
+    return job.summary()
+
+
+def _write_chunks(pending, batch_size, progress, total_bytes, failure):
+    """
+    The writer thread: take ("chunk" | "end", job, payload, position) items
+    in order and commit batch_size rows at a time, never mixing files in a
+    batch. After a failure, drain the queue so the reader never blocks.
+    The thread's database connection is closed when it ends.
+    """
+    batch, rejected = [], []
+
+    def flush(job, position):
+        if batch or rejected:
+            job.write(batch, rejected, checked=True)
+            batch.clear()
+            rejected.clear()
+            if progress:
+                progress(job.summary(), position / total_bytes)
+
+    try:
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            kind, job, payload, position = item
+            if failure:
+                if kind == "chunk":
+                    payload[1].cancel()
+                continue
+            try:
+                if kind == "chunk":
+                    lines, future = payload
+                    rows, errors = future.result()
+                    failed = dict(errors)
+                    good = iter(rows)
+                    for index, (line, record) in enumerate(lines):
+                        if index in failed:
+                            rejected.append((line, record, failed[index]))
+                        else:
+                            batch.append((line, record, next(good)))
+                    if len(batch) + len(rejected) >= batch_size:
+                        flush(job, position)
+                else:
+                    flush(job, position)
+                    job.finish()
+            except BaseException as e:
+                failure.append(e)
+    finally:
+        database.close_connection()
+
+
+def import_files(paths, mapping=None, defaults=None, workers=None, batch_size=DEFAULT_BATCH_SIZE,
+                 chunk_size=DEFAULT_CHUNK_ROWS, rejects=False, progress=None, resume=True,
+                 delimiter=",", encoding="utf-8-sig"):
+    """
+    Import several CSV files, parsing and validating on `workers` processes
+    (default: one per core; 1 imports in this process), and return import_csv()'s summary for each, in
+    the order given. Rows are stored in file order, exactly as importing the
+    files one by one would.
+
+    rejects=True writes each file's rejected rows to <file>.rejected.csv.
+    progress(summary, fraction) is called from the writer thread after each
+    batch, with the share of all the files' bytes read so far. Every file is
+    checkpointed and resumable on its own, as with import_csv().
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        # One core has nothing to overlap: skip the pool and the pickling
+        total_bytes = sum(os.path.getsize(path) for path in paths) or 1
+        results, offset = [], 0
+        for path in paths:
+            size = os.path.getsize(path)
+            on_batch = progress and (lambda summary, fraction: progress(summary, (offset + fraction * size) / total_bytes))
+            results.append(import_csv(
+                path, mapping, defaults, batch_size, path + REJECTS_SUFFIX if rejects else None,
+                on_batch, resume, delimiter, encoding,
+            ))
+            offset += size
+        return results
+
+    mapping, defaults = _fields(mapping, defaults)
+    backend = get_backend()
+    jobs = [_Job(backend, path, resume) for path in paths]
+    total_bytes = sum(job.size for job in jobs) or 1
+
+    # Bounded: the reader stays at most a couple of chunks per worker ahead of the writer
+    pending = queue.Queue(maxsize=2 * workers)
+    failure = []
+    writer = threading.Thread(
+        target=_write_chunks, args=(pending, batch_size, progress, total_bytes, failure),
+        name="import-writer", daemon=True,
+    )
+    # spawn, not fork: the writer thread holds SQLite connections and locks
+    with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as pool:
+        writer.start()
+        try:
+            offset = 0
+            for job in jobs:
+                report = job.path + REJECTS_SUFFIX if rejects else None
+                with job.open(mapping, defaults, report, delimiter, encoding) as (raw, reader):
+                    lines, chunk = [], []
+                    for number, record in enumerate(reader):
+                        if number < job.resumed_from:
+                            continue
+                        lines.append((reader.line_num, record if rejects else {}))
+                        chunk.append([record.get(mapping[field]) or defaults.get(field) for field in FIELDS])
+                        if len(chunk) >= chunk_size:
+                            if failure:
+                                break
+                            future = pool.submit(_check_chunk, chunk)
+                            pending.put(("chunk", job, (lines, future), offset + raw.tell()))
+                            lines, chunk = [], []
+                    if chunk and not failure:
+                        pending.put(("chunk", job, (lines, pool.submit(_check_chunk, chunk)), offset + raw.tell()))
+                offset += job.size
+                pending.put(("end", job, None, offset))
+                if failure:
+                    break
+        finally:
+            pending.put(None)
+            writer.join()
+            for job in jobs:
+                job.close()
+    if failure:
+        raise failure[0]
+    return [job.summary() for job in jobs]
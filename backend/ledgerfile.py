@@ -0,0 +1,208 @@
+# backend/ledgerfile.py
+"""
+A compact columnar file holding the whole expenses table, for analysis and
+tests that want the ledger without a database.
+
+Layout (little-endian; each section starts on an 8-byte boundary):
+
+    header      64 bytes: magic, format version, row count, notes blob
+                size, categories size, CRC-32 of everything after the header
+    ids         int64   [rows]      in id order
+    days        int32   [rows]      days since 1970-01-01
+    codes       uint16  [rows]      category id
+    cents       int64   [rows]
+    note_ends   uint64  [rows]      end of each row's note in the blob
+    null_notes  uint8   [rows]      1 where notes is NULL (stored as b"")
+    notes       bytes               UTF-8 notes, back to back
+    categories  bytes               JSON [[id, main, mid, sub], ...]
+
+read() maps the file with numpy.memmap and hands out the columns as
+read-only views of it: nothing is parsed or copied, so opening is
+near-instant whatever the size, and pages are loaded as they are touched.
+The checksum check is one sequential pass; verify=False skips it.
+
+The reader has the columns a columnar.Snapshot has, so analyses such as
+anomalies.find_anomalies run on a file directly:
+
+    ledgerfile.write("ledger.bin")
+    ledger = ledgerfile.read("ledger.bin")
+    ledger.cents[ledger.codes == 3].sum()
+"""
+import json
+import os
+import struct
+import tempfile
+import zlib
+from contextlib import ExitStack
+from itertools import islice
+
+import numpy as np
+
+from . import storage
+from .columnar import LOAD_CHUNK, days_to_iso, to_days
+from .query import ExpenseQuery
+
+MAGIC = b"EXPLEDG\0"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sIIQQQI")   # magic, version, reserved, rows, notes bytes, categories bytes, crc32
+HEADER_SIZE = 64
+COLUMNS = (("ids", "<i8"), ("days", "<i4"), ("codes", "<u2"), ("cents", "<i8"), ("note_ends", "<u8"),
+           ("null_notes", "<u1"))
+COPY_BLOCK = 1 << 20   # bytes per read when assembling the file from its spilled sections
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _layout(rows, notes_bytes, categories_bytes):
+    """{section: (offset, size)}, and the file size."""
+    sections, offset = {}, HEADER_SIZE
+    for name, dtype in COLUMNS:
+        size = rows * np.dtype(dtype).itemsize
+        sections[name] = (offset, size)
+        offset = _align(offset + size)
+    sections["notes"] = (offset, notes_bytes)
+    offset = _align(offset + notes_bytes)
+    sections["categories"] = (offset, categories_bytes)
+    return sections, offset + categories_bytes
+
+
+def _spill(backend, spills):
+    """
+    Stream the backend's rows in id order into one temporary file per section,
+    LOAD_CHUNK rows at a time; returns (rows, notes bytes).
+    """
+    dtypes = dict(COLUMNS)
+    count = notes_bytes = 0
+    records = backend.select(ExpenseQuery(order_by="id"), LOAD_CHUNK)
+    while True:
+        batch = list(islice(records, LOAD_CHUNK))
+        if not batch:
+            break
+        ids, codes, dates, cents, texts = zip(*batch)
+        notes = [text.encode("utf-8") if text else b"" for text in texts]
+        note_ends = notes_bytes + np.cumsum([len(note) for note in notes], dtype=np.uint64)
+        columns = {
+            "ids": np.array(ids),
+            "days": to_days(dates),
+            "codes": np.array(codes),
+            "cents": np.array(cents),
+            "note_ends": note_ends,
+            "null_notes": np.array([text is None for text in texts]),
+        }
+        for name, column in columns.items():
+            spills[name].write(column.astype(dtypes[name]).tobytes())
+        spills["notes"].write(b"".join(notes))
+        count += len(batch)
+        notes_bytes = int(note_ends[-1])
+    return count, notes_bytes
+
+
+def write(path, backend=None):
+    """
+    Write the backend's (default: the active one's) expenses to path and
+    return the row count. Rows are read in batches and each section is
+    spilled to a temporary file, so memory use does not grow with the
+    ledger; the file is written beside path and renamed into place once
+    complete.
+    """
+    backend = backend or storage.get_backend()
+    categories = json.dumps(
+        [[cid, *path_] for cid, path_ in sorted(backend.category_paths().items())],
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+    partial = f"{os.fspath(path)}.part"
+    names = [name for name, _ in COLUMNS] + ["notes"]
+    try:
+        with ExitStack() as stack:
+            folder = os.path.dirname(os.path.abspath(partial))
+            spills = {name: stack.enter_context(tempfile.TemporaryFile(dir=folder)) for name in names}
+            rows, notes_bytes = _spill(backend, spills)
+            sections, _ = _layout(rows, notes_bytes, len(categories))
+
+            with open(partial, "wb") as f:
+                f.write(bytes(HEADER_SIZE))
+                crc = 0
+                for name in names + ["categories"]:
+                    padding = bytes(sections[name][0] - f.tell())
+                    f.write(padding)
+                    crc = zlib.crc32(padding, crc)
+                    if name == "categories":
+                        blocks = [categories]
+                    else:
+                        spills[name].seek(0)
+                        blocks = iter(lambda spill=spills[name]: spill.read(COPY_BLOCK), b"")
+                    for block in blocks:
+                        f.write(block)
+                        crc = zlib.crc32(block, crc)
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, rows, notes_bytes, len(categories), crc))
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return rows
+
+
+class LedgerFile:
+    """A ledger file mapped into memory; see read()."""
+
+    def __init__(self, path, verify=True):
+        self.path = os.fspath(path)
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size or header[:8] != MAGIC:
+            raise ValueError(f"{self.path} is not a ledger file.")
+        _, version, _, rows, notes_bytes, categories_bytes, crc = HEADER.unpack(header)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has ledger format version {version}; this version reads {FORMAT_VERSION}.")
+        sections, size = _layout(rows, notes_bytes, categories_bytes)
+        if os.path.getsize(self.path) != size:
+            raise ValueError(f"{self.path} is truncated or padded: expected {size} bytes.")
+
+        self._map = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if verify and zlib.crc32(self._map[HEADER_SIZE:]) != crc:
+            raise ValueError(f"{self.path} failed its checksum.")
+        for name, dtype in COLUMNS:
+            offset, length = sections[name]
+            setattr(self, name, self._map[offset:offset + length].view(dtype))
+        offset, length = sections["notes"]
+        self._notes = self._map[offset:offset + length]
+        offset, length = sections["categories"]
+        self.categories = {
+            cid: (main, mid, sub)
+            for cid, main, mid, sub in json.loads(self._map[offset:offset + length].tobytes())
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def refresh(self):
+        """A file never changes; here so analyses written for columnar.Snapshot accept it."""
+
+    def note(self, i):
+        """Notes of the i-th row (in id order); None where they were NULL."""
+        if self.null_notes[i]:
+            return None
+        start = int(self.note_ends[i - 1]) if i else 0
+        return self._notes[start:int(self.note_ends[i])].tobytes().decode("utf-8")
+
+    def rows(self):
+        """Yield StoredRows (id, category_id, date, value_cents, notes) in id order."""
+        for start in range(0, len(self), LOAD_CHUNK):
+            stop = start + LOAD_CHUNK
+            dates = days_to_iso(self.days[start:stop])
+            for i, (expense_id, code, iso, cents) in enumerate(
+                zip(self.ids[start:stop].tolist(), self.codes[start:stop].tolist(),
+                    dates.tolist(), self.cents[start:stop].tolist()),
+                start,
+            ):
+                yield expense_id, code, iso, cents, self.note(i)
+
+
+def read(path, verify=True):
+    """Map a file written by write(); raises ValueError if it is not one, or is damaged."""
+    return LedgerFile(path, verify)
@@ -0,0 +1,36 @@
+# backend/money.py
+"""
+Amounts are stored as integer cents so sums are exact. Parse to cents on the
+way in and convert back to a float only when handing values to the frontends.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any
+
+CENTS_PER_UNIT = 100
+
+
+def to_cents(value: Any) -> int:
+    """
+    Parse '12.1', '12,1', 12.1, 12 or Decimal('12.10') to integer cents (1210),
+    rounding half-up to the nearest cent. Raises ValueError if not a number.
+    """
+    if isinstance(value, bool):
+        raise ValueError("Invalid value. Must be a number.")
+    if isinstance(value, int):
+        return value * CENTS_PER_UNIT
+    if isinstance(value, float):
+        value = repr(value)  # shortest repr, so 0.285 stays 0.285 and not 0.28499...
+    if isinstance(value, str):
+        value = value.strip().replace(",", ".")
+    try:
+        amount = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError("Invalid value. Must be a number.")
+    if not amount.is_finite():
+        raise ValueError("Invalid value. Must be a number.")
+    return int(amount.scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents) -> float:
+    """Integer cents (or None for an empty SUM) to a float amount."""
+    return (cents or 0) / CENTS_PER_UNIT
@@ -0,0 +1,220 @@
+# backend/query.py
+"""
+ExpenseQuery: one description of "which expenses, shaped how" that every
+report is built on, instead of each function assembling its own WHERE clause.
+
+    spec = ExpenseQuery(main="Daily Expenses", start="2024-01-01", group_by="month")
+    rows = get_backend().select(spec)
+
+A spec selects by category path, inclusive date range, inclusive value range
+and a notes substring, and returns one of three shapes:
+
+- plain rows (the default): StoredRows ordered by "date", "value" or "id"
+- totals=True: a single (total_cents, count) row
+- group_by="category" | "month" | "day" | "value": (key, total_cents, count)
+  rows ordered by "key" or "total". A tuple such as ("category", "day")
+  groups on several keys and returns (key1, key2, total_cents, count) rows.
+  "value" groups by the exact value in cents, e.g. for distributions.
+
+compile_query() turns a spec into a single parameterized SQLite statement.
+Statement text depends only on the shape of the spec (which filters are
+set, how many category ids, the grouping and ordering), never on the values,
+so compiled text is kept in an LRU cache and SQLite's own statement cache
+sees identical SQL for repeated report calls.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from .aggregates import split_by_month
+from .categories import category_ids
+from .money import to_cents
+
+GROUPS = ("category", "month", "day", "value")
+ROW_ORDERS = ("date", "value", "id")
+GROUP_ORDERS = ("key", "total")
+
+
+@dataclass(frozen=True)
+class ExpenseQuery:
+    main: Optional[str] = None
+    mid: Optional[str] = None
+    sub: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    min_value: object = None
+    max_value: object = None
+    notes: Optional[str] = None
+    group_by: object = None
+    totals: bool = False
+    order_by: Optional[str] = None
+    descending: bool = False
+    limit: Optional[int] = None
+
+    def __post_init__(self):
+        for key in self.group_keys:
+            if key not in GROUPS:
+                raise ValueError(f"Invalid grouping '{key}'. Use one of {', '.join(GROUPS)}.")
+        if self.totals and self.group_by:
+            raise ValueError("Pass either 'totals' or 'group_by', not both.")
+        orders = GROUP_ORDERS if self.group_by else ROW_ORDERS
+        if self.order_by is not None and self.order_by not in orders:
+            raise ValueError(f"Invalid ordering '{self.order_by}'. Use one of {', '.join(orders)}.")
+
+    @property
+    def group_keys(self):
+        """group_by as a tuple of keys (empty when not grouping)."""
+        if not self.group_by:
+            return ()
+        return (self.group_by,) if isinstance(self.group_by, str) else tuple(self.group_by)
+
+    @property
+    def order(self):
+        return self.order_by or (GROUP_ORDERS[0] if self.group_by else ROW_ORDERS[0])
+
+    def category_ids(self):
+        """Ids matching the category path, or None when the spec has no category filter."""
+        if not (self.main or self.mid or self.sub):
+            return None
+        return category_ids(self.main, self.mid, self.sub)
+
+    def value_bounds(self):
+        """(min_cents, max_cents); either may be None."""
+        return (
+            to_cents(self.min_value) if self.min_value is not None else None,
+            to_cents(self.max_value) if self.max_value is not None else None,
+        )
+
+    def filters_rows(self):
+        """True if the spec filters on per-row values that the monthly totals don't keep."""
+        return self.min_value is not None or self.max_value is not None or bool(self.notes)
+
+
+def like_pattern(text):
+    """A LIKE pattern matching text anywhere, with % and _ taken literally."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _plan(spec):
+    """
+    Split the work into parts: ("months", first, last) reads whole months from
+    monthly_category_totals and ("expenses", start, end) reads rows. Row
+    filters and day or value grouping can only be answered from expenses.
+    """
+    if spec.filters_rows() or {"day", "value"} & set(spec.group_keys) or not (spec.totals or spec.group_by):
+        return [("expenses", spec.start, spec.end)]
+    split = split_by_month(spec.start, spec.end)
+    if split is None:
+        return [("expenses", spec.start, spec.end)]
+    months, edges = split
+    parts = [("months", *months)] if months is not None else []
+    return parts + [("expenses", *edge) for edge in edges]
+
+
+_ROW_COLUMNS = "id, category_id, date, value_cents, notes"
+_KEYS = {
+    "months": {"category": "category_id", "month": "month"},
+    "expenses": {"category": "category_id", "month": "substr(date, 1, 7)", "day": "date", "value": "value_cents"},
+}
+
+
+@lru_cache(maxsize=256)
+def _compile(shape):
+    """Build the statement for a spec shape (see compile_query)."""
+    n_ids, parts, row_filters, group_keys, totals, order, descending, has_limit = shape
+    has_min, has_max, has_notes = row_filters
+    direction = "DESC" if descending else "ASC"
+
+    selects = []
+    for source, has_lo, has_hi in parts:
+        where = []
+        if n_ids is not None:
+            where.append(f"category_id IN ({','.join('?' * n_ids)})")
+        column = "month" if source == "months" else "date"
+        if has_lo:
+            where.append(f"{column} >= ?")
+        if has_hi:
+            where.append(f"{column} <= ?")
+        if has_min:
+            where.append("value_cents >= ?")
+        if has_max:
+            where.append("value_cents <= ?")
+        if has_notes:
+            where.append("notes LIKE ? ESCAPE '\\'")
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+
+        if not (group_keys or totals):
+            selects.append(f"SELECT {_ROW_COLUMNS} FROM expenses{where_sql}")
+            continue
+        table, total, count = (
+            ("monthly_category_totals", "SUM(total_cents)", "SUM(expense_count)") if source == "months"
+            else ("expenses", "SUM(value_cents)", "COUNT(*)")
+        )
+        if group_keys:
+            keys = ", ".join(f"{_KEYS[source][key]} AS k{i}" for i, key in enumerate(group_keys))
+            names = ", ".join(f"k{i}" for i in range(len(group_keys)))
+            selects.append(f"SELECT {keys}, {total} AS total, {count} AS n FROM {table}{where_sql} GROUP BY {names}")
+        else:
+            selects.append(f"SELECT {total} AS total, {count} AS n FROM {table}{where_sql}")
+
+    names = ", ".join(f"k{i}" for i in range(len(group_keys)))
+    if len(selects) == 1:
+        sql = selects[0]
+    elif group_keys:
+        # Months and partial-month edges can share keys, so add them up again
+        sql = f"SELECT {names}, SUM(total), SUM(n) FROM ({' UNION ALL '.join(selects)}) GROUP BY {names}"
+    else:
+        sql = f"SELECT SUM(total), SUM(n) FROM ({' UNION ALL '.join(selects)})"
+
+    if group_keys:
+        positions = [str(i + 1) for i in range(len(group_keys))]
+        if order == "total":
+            positions.insert(0, str(len(group_keys) + 1))
+        sql += " ORDER BY " + ", ".join(f"{p} {direction}" for p in positions)
+    elif not totals and order == "id":
+        sql += f" ORDER BY id {direction}"
+    elif not totals:
+        column = "date" if order == "date" else "value_cents"
+        sql += f" ORDER BY {column} {direction}, id {direction}"
+    if has_limit:
+        sql += " LIMIT ?"
+    return sql
+
+
+def compile_query(spec):
+    """Return (sql, params) for an ExpenseQuery."""
+    ids = spec.category_ids()
+    min_cents, max_cents = spec.value_bounds()
+    parts = _plan(spec)
+
+    params = []
+    for source, lo, hi in parts:
+        if ids is not None:
+            params.extend(ids)
+        params.extend(bound for bound in (lo, hi) if bound)
+        if min_cents is not None:
+            params.append(min_cents)
+        if max_cents is not None:
+            params.append(max_cents)
+        if spec.notes:
+            params.append(like_pattern(spec.notes))
+    if spec.limit is not None:
+        params.append(spec.limit)
+
+    shape = (
+        None if ids is None else len(ids),
+        tuple((source, bool(lo), bool(hi)) for source, lo, hi in parts),
+        (min_cents is not None, max_cents is not None, bool(spec.notes)),
+        spec.group_keys,
+        spec.totals,
+        spec.order,
+        spec.descending,
+        spec.limit is not None,
+    )
+    return _compile(shape), params
+
+
+def compile_cache_info():
+    """functools cache statistics for the compiled-statement cache."""
+    return _compile.cache_info()
@@ -0,0 +1,174 @@
+# backend/rangeindex.py
+"""
+Cumulative per-day totals for answering date-range totals with two lookups.
+
+Daily cents and counts are kept in Fenwick (binary indexed) trees, one pair
+for the whole table and, with per_category=True, one pair per category id.
+A range total is prefix(end) - prefix(start), O(log days) no matter how many
+expenses the range covers, and a write adjusts O(log days) slots instead of
+forcing a rescan.
+
+The index follows crud writes through a write listener and applies them
+straight away. When something else commits (another process or connection)
+the index goes stale (see crud.DerivedView); stale reads return None so the
+caller falls back to SQL, and the index rebuilds itself once the outside
+writes settle (no new commit since it went stale).
+
+    index = RangeIndex()
+    index.range_sum("2024-01-01", "2024-06-30")            # (cents, count)
+    reports.use_range_index(index)                         # totals use it
+"""
+from array import array
+from datetime import date
+
+from . import crud
+from .query import ExpenseQuery
+
+# Days kept past the newest expense (or today) so new entries rarely force a regrow
+HEADROOM_DAYS = 366
+
+
+def _day(iso):
+    return date.fromisoformat(iso).toordinal()
+
+
+class Fenwick:
+    """Prefix sums over a fixed number of integer slots, with O(log n) add and prefix."""
+
+    def __init__(self, values):
+        tree = array("q", [0])
+        tree.extend(values)
+        size = len(tree)
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def add(self, slot, delta):
+        tree, i = self.tree, slot + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, stop):
+        """Sum of slots [0, stop)."""
+        tree, total = self.tree, 0
+        while stop > 0:
+            total += tree[stop]
+            stop &= stop - 1
+        return total
+
+    def values(self):
+        """The slot values, recovered from the prefix sums."""
+        sums = [self.prefix(i) for i in range(len(self) + 1)]
+        return [b - a for a, b in zip(sums, sums[1:])]
+
+
+class RangeIndex(crud.DerivedView):
+    REBUILD_WHEN_QUIET = True
+
+    def __init__(self, backend=None, per_category=True):
+        self.per_category = per_category
+        self.stale_reads = 0
+        super().__init__(backend)
+
+    # --- building and keeping up ---
+    def _load(self):
+        """Read per-day (and per-category) totals from the backend."""
+        group_by = ("category", "day") if self.per_category else ("day",)
+        cells = [
+            (row[0] if self.per_category else None, _day(row[-3]), row[-2], row[-1])
+            for row in self.backend.select(ExpenseQuery(group_by=group_by))
+        ]
+        today = date.today().toordinal()
+        first = min([today, *(cell[1] for cell in cells)])
+        last = max([today, *(cell[1] for cell in cells)])
+        self._build(first, last + HEADROOM_DAYS - first + 1, cells)
+
+    def _build(self, base, size, cells):
+        """Lay out the trees for days [base, base + size) from (key, day, cents, count) cells."""
+        columns = {}
+        for key, day, cents, count in cells:
+            for target in {None, key}:
+                daily = columns.setdefault(target, ([0] * size, [0] * size))
+                daily[0][day - base] += cents
+                daily[1][day - base] += count
+        columns.setdefault(None, ([0] * size, [0] * size))
+        self.base, self.size = base, size
+        self._trees = {key: (Fenwick(cents), Fenwick(counts)) for key, (cents, counts) in columns.items()}
+
+    def _grow(self, day):
+        """Widen the day range to include day, keeping what the trees hold."""
+        cells = []
+        for key, (cents, counts) in self._trees.items():
+            if key is None and self.per_category:
+                continue
+            for slot, (value, count) in enumerate(zip(cents.values(), counts.values())):
+                if count:
+                    cells.append((key, self.base + slot, value, count))
+        base = min(self.base, day)
+        top = max(self.base + self.size, day + HEADROOM_DAYS + 1)
+        self._build(base, top - base, cells)
+
+    def _apply(self, kind, old_rows, new_rows):
+        for rows, sign in ((old_rows, -1), (new_rows, 1)):
+            for _, category_id, iso, cents, _ in rows:
+                self._add(category_id, _day(iso), sign * cents, sign)
+
+    def _add(self, category_id, day, cents, count):
+        if not self.base <= day < self.base + self.size:
+            self._grow(day)
+        slot = day - self.base
+        keys = (None, category_id) if self.per_category else (None,)
+        for key in keys:
+            if key not in self._trees:
+                self._trees[key] = (Fenwick([0] * self.size), Fenwick([0] * self.size))
+            self._trees[key][0].add(slot, cents)
+            self._trees[key][1].add(slot, count)
+
+    # --- lookups ---
+    def _slots(self, start, end):
+        """Inclusive ISO dates -> the [lo, hi) slot range, clipped to the trees."""
+        lo = _day(start) - self.base if start else 0
+        hi = _day(end) - self.base + 1 if end else self.size
+        return max(lo, 0), min(hi, self.size)
+
+    def range_sum(self, start=None, end=None, category_ids=None):
+        """
+        (total_cents, count) over an inclusive date range, optionally limited to
+        some category ids; None while the index is stale.
+        """
+        if category_ids is not None and not self.per_category:
+            raise ValueError("This index was built without per-category totals.")
+        with self._lock:
+            if not self.refresh():
+                self.stale_reads += 1
+                return None
+            lo, hi = self._slots(start, end)
+            if lo >= hi:
+                return 0, 0
+            keys = [None] if category_ids is None else [key for key in category_ids if key in self._trees]
+            total = count = 0
+            for key in keys:
+                cents, counts = self._trees[key]
+                total += cents.prefix(hi) - cents.prefix(lo)
+                count += counts.prefix(hi) - counts.prefix(lo)
+            return total, count
+
+    # --- ExpenseQuery ---
+    def can_answer(self, spec):
+        """Totals without value or notes filters (and, without per-category trees, without a category)."""
+        if not spec.totals or spec.filters_rows():
+            return False
+        return self.per_category or not (spec.main or spec.mid or spec.sub)
+
+    def select(self, spec):
+        """Answer a totals ExpenseQuery like StorageBackend.select, or return None while stale."""
+        if not self.can_answer(spec):
+            raise ValueError("The range index only answers totals without value or notes filters.")
+        result = self.range_sum(spec.start, spec.end, spec.category_ids())
+        return None if result is None else iter([result])
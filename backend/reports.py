@@ -1,30 +1,58 @@
-from .database import get_connection
-from backend.database import get_connection
+import threading
+from datetime import date
 
+import numpy as np
+
+from .cache import cached
+from .database import FETCH_SIZE
+from .categories import category_ids, get_category_paths, rollup
+from .forecast import ForecastModel, day_of_period, period_key, period_length
+from .money import CENTS_PER_UNIT, from_cents
+from .query import ExpenseQuery
+from .stats import Stats
+from .storage import expense_tuples, get_backend
+
+# A columnar.Snapshot that answers totals and groupings instead of the backend
+_snapshot = None
+
+def use_snapshot(snapshot):
+    """Run aggregate reports on a columnar.Snapshot, or on the storage backend again with None."""
+    global _snapshot
+    _snapshot = snapshot
+
+# A rangeindex.RangeIndex that answers date-range totals with prefix-sum lookups
+_range_index = None
+
+def use_range_index(index):
+    """Answer range totals from a rangeindex.RangeIndex, or stop with None."""
+    global _range_index
+    _range_index = index
+
+def run_query(spec, chunk_size=FETCH_SIZE):
+    """Run an ExpenseQuery on the active storage backend and return its raw rows."""
+    index = _range_index
+    if index is not None and index.backend is get_backend() and index.can_answer(spec):
+        rows = index.select(spec)
+        if rows is not None:
+            return rows
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.backend is get_backend() and snapshot.can_answer(spec):
+        return snapshot.select(spec)
+    return get_backend().select(spec, chunk_size)
+
+def _total(spec):
+    total, _ = next(run_query(spec))
+    return from_cents(total)
+
+@cached
 def list_all_categories():
     """Return all distinct category pairs from expenses."""
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT main_category, sub_category FROM expenses")
-    categories = cur.fetchall()
-    conn.close()
-    return categories
-
-def get_totals_grouped():
-    """Return totals grouped by main and subcategory."""
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT main_category, sub_category, SUM(value) as total
-        FROM expenses
-        GROUP BY main_category, sub_category
-        ORDER BY main_category, sub_category
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-### for cli.py   
+    paths = get_category_paths()
+    used = [row[0] for row in run_query(ExpenseQuery(group_by="category"))]
+    return list(dict.fromkeys((paths[cid][0], paths[cid][2]) for cid in used))
+
+### for cli.py
+@cached
 def get_total_by_category(main_cat, mid_cat=None, sub_cat=None):
     """
     Return total expenses for a given category path.
@@ -32,58 +60,22 @@ def get_total_by_category(main_cat, mid_cat=None, sub_cat=None):
     - mid_cat optional
     - sub_cat optional
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    if mid_cat and sub_cat:
-        cur.execute(
-            "SELECT SUM(value) FROM expenses WHERE main_category=? AND mid_category=? AND sub_category=?",
-            (main_cat, mid_cat, sub_cat),
-        )
-    elif mid_cat:
-        cur.execute(
-            "SELECT SUM(value) FROM expenses WHERE main_category=? AND mid_category=?",
-            (main_cat, mid_cat),
-        )
-    else:
-        cur.execute(
-            "SELECT SUM(value) FROM expenses WHERE main_category=?",
-            (main_cat,),
-        )
-
-    total = cur.fetchone()[0]
-    conn.close()
-    return total or 0.0
+    # sub only narrows the path when mid is given too
+    return _total(ExpenseQuery(main_cat, mid_cat or None, sub_cat if mid_cat else None, totals=True))
 
+@cached
 def get_total_by_date_range(start_date, end_date):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT SUM(value) FROM expenses WHERE date BETWEEN ? AND ?",
-        (start_date, end_date)
-    )
-    total = cursor.fetchone()[0]
-    conn.close()
-    return total or 0
+    return _total(ExpenseQuery(start=start_date, end=end_date, totals=True))
 
+@cached
 def get_monthly_summary():
     """
     Returns a list of (YYYY-MM, total_value) for all expenses.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT substr(date, 1, 7) as month, SUM(value)
-        FROM expenses
-        GROUP BY month
-        ORDER BY month DESC
-        """
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    spec = ExpenseQuery(group_by="month", descending=True)
+    return [(month, from_cents(cents)) for month, cents, _ in run_query(spec)]
 
+@cached
 def get_totals_grouped(level="main"):
     """
     Returns totals grouped by category level:
@@ -91,85 +83,182 @@ def get_totals_grouped(level="main"):
     - "mid": totals by main_category + mid_category
     - "sub": totals by full path main+mid+sub
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    if level == "main":
-        cur.execute(
-            "SELECT main_category, SUM(value) FROM expenses GROUP BY main_category"
-        )
-    elif level == "mid":
-        cur.execute(
-            "SELECT main_category, mid_category, SUM(value) FROM expenses "
-            "GROUP BY main_category, mid_category"
-        )
-    elif level == "sub":
-        cur.execute(
-            "SELECT main_category, mid_category, sub_category, SUM(value) FROM expenses "
-            "GROUP BY main_category, mid_category, sub_category"
-        )
-    else:
+    if level not in ("main", "mid", "sub"):
         raise ValueError("Invalid grouping level. Use 'main', 'mid', or 'sub'.")
 
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    # Group on the integer key first, then fold the few resulting rows up to `level`
+    totals = {cid: cents for cid, cents, _ in run_query(ExpenseQuery(group_by="category"))}
+    return [(*row[:-1], from_cents(row[-1])) for row in rollup(totals, level)]
 
+@cached
 def get_total_filtered(main=None, mid=None, sub=None, start=None, end=None):
+    return _total(ExpenseQuery(main, mid, sub, start, end, totals=True))
 
-    conn = get_connection()
-    cur = conn.cursor()
-
-    query = "SELECT SUM(value) FROM expenses WHERE 1=1"
-    params = []
-
-    if main:
-        query += " AND main_category = ?"
-        params.append(main)
-    if mid:
-        query += " AND mid_category = ?"
-        params.append(mid)
-    if sub:
-        query += " AND sub_category = ?"
-        params.append(sub)
-    if start:
-        query += " AND date >= ?"
-        params.append(start)
-    if end:
-        query += " AND date <= ?"
-        params.append(end)
-
-    cur.execute(query, params)
-    total = cur.fetchone()[0]
-    return total or 0.0
+def iter_expenses_filtered(main=None, mid=None, sub=None, start=None, end=None, chunk_size=FETCH_SIZE):
+    """Stream the rows get_expenses_filtered() returns, chunk_size at a time."""
+    return expense_tuples(run_query(ExpenseQuery(main, mid, sub, start, end), chunk_size))
 
 def get_expenses_filtered(main=None, mid=None, sub=None, start=None, end=None):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    query = "SELECT * FROM expenses WHERE 1=1"
-    params = []
-
-    if main:
-        query += " AND main_category = ?"
-        params.append(main)
-    if mid:
-        query += " AND mid_category = ?"
-        params.append(mid)
-    if sub:
-        query += " AND sub_category = ?"
-        params.append(sub)
-    if start:
-        query += " AND date >= ?"
-        params.append(start)
-    if end:
-        query += " AND date <= ?"
-        params.append(end)
-
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    return list(iter_expenses_filtered(main, mid, sub, start, end))
+
+def _tree_node():
+    return {"total": 0, "count": 0, "children": {}}
+
+def _finish_tree(node):
+    node["total"] = from_cents(node["total"])
+    for child in node["children"].values():
+        _finish_tree(child)
+    return node
+
+@cached
+def get_category_tree(start=None, end=None, filters=None):
+    """
+    Totals and counts rolled up main -> mid -> sub from a single grouped query:
+
+        {"total": 42.0, "count": 3, "children": {
+            "Daily Expenses": {"total": 42.0, "count": 3, "children": {
+                "Groceries": {"total": 12.0, "count": 2, "children": {
+                    "Food": {"total": 12.0, "count": 2, "children": {}}, ...
+
+    Paths without a sub category stop at the mid level. filters takes any
+    other ExpenseQuery fields (main, mid, sub, min_value, max_value, notes).
+    Drilling down is a lookup: tree["children"][main]["children"][mid].
+    """
+    spec = ExpenseQuery(start=start, end=end, group_by="category", **(filters or {}))
+    paths = get_category_paths()
+    root = _tree_node()
+    for cid, cents, count in run_query(spec):
+        root["total"] += cents
+        root["count"] += count
+        node = root
+        for part in paths[cid]:
+            if part is None:
+                break
+            node = node["children"].setdefault(part, _tree_node())
+            node["total"] += cents
+            node["count"] += count
+    return _finish_tree(root)
+
+TIME_SERIES_FREQS = ("day", "week", "month")
+
+def _period_numbers(freq, dates):
+    """ISO dates -> integer period numbers: days, Monday-based weeks or months since 1970-01."""
+    if freq == "month":
+        return np.asarray(dates, dtype="datetime64[M]").astype(np.int64)
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    # 1970-01-01 was a Thursday, so shifting by 3 days puts week boundaries on Mondays
+    return (days + 3) // 7 if freq == "week" else days
+
+def _period_starts(freq, numbers):
+    if freq == "month":
+        return numbers.astype("datetime64[M]")
+    return (numbers * 7 - 3 if freq == "week" else numbers).astype("datetime64[D]")
+
+@cached
+def get_time_series(freq="month", start=None, end=None, filters=None, rolling=None):
+    """
+    Spending per day, week (starting Monday) or month between start and end,
+    with empty periods filled with zeros. Returns dense arrays for plotting:
+
+        {"periods": datetime64 period starts, "totals": float amounts,
+         "counts": int expense counts, "rolling": float moving average or None}
+
+    start/end default to the first/last expense. rolling=N adds the mean of
+    the last N periods (fewer at the very start). filters takes any other
+    ExpenseQuery fields, as in get_category_tree().
+    """
+    if freq not in TIME_SERIES_FREQS:
+        raise ValueError(f"Invalid frequency '{freq}'. Use one of {', '.join(TIME_SERIES_FREQS)}.")
+    if rolling is not None and rolling < 1:
+        raise ValueError("rolling must be at least 1 period.")
+
+    spec = ExpenseQuery(start=start, end=end, group_by="month" if freq == "month" else "day", **(filters or {}))
+    rows = list(run_query(spec))
+    keys = [row[0] for row in rows]
+    numbers = _period_numbers(freq, keys) if rows else np.empty(0, np.int64)
+    cents = np.array([row[1] for row in rows], dtype=np.int64)
+    counts = np.array([row[2] for row in rows], dtype=np.int64)
+
+    first = _period_numbers(freq, [start])[0] if start else (numbers.min() if rows else None)
+    last = _period_numbers(freq, [end])[0] if end else (numbers.max() if rows else None)
+    if first is None or last is None or first > last:
+        periods = np.empty(0, np.int64)
+        totals, filled_counts = np.zeros(0), np.zeros(0, np.int64)
+    else:
+        length = int(last - first + 1)
+        offsets = numbers - first
+        periods = np.arange(first, last + 1)
+        totals = np.bincount(offsets, weights=cents, minlength=length) / CENTS_PER_UNIT
+        filled_counts = np.bincount(offsets, weights=counts, minlength=length).astype(np.int64)
+
+    moving = None
+    if rolling is not None:
+        window = np.cumsum(totals)
+        window[rolling:] = window[rolling:] - window[:-rolling]
+        moving = window / np.minimum(np.arange(1, len(totals) + 1), rolling)
+
+    return {
+        "periods": _period_starts(freq, periods),
+        "totals": totals,
+        "counts": filled_counts,
+        "rolling": moving,
+    }
+
+# The ForecastModel behind forecast_period(), created on first use
+_forecast_model = None
+_forecast_lock = threading.Lock()
+
+def use_forecast_model(model):
+    """Serve forecast_period() from this forecast.ForecastModel (None: create one when needed)."""
+    global _forecast_model
+    _forecast_model = model
+
+def forecast_period(period="month", filters=None, level="mid", today=None):
+    """
+    Project end-of-period spend for the month or year containing today, per
+    main ("main") or main + mid ("mid") category:
+
+        {"period": "2024-05", "day": 12, "days": 31,
+         "rows": [(main, mid, spent, projected), ...], "spent": 310.0, "projected": 802.5}
+
+    Projections come from day-of-period curves of past periods (see
+    backend.forecast). filters takes main, mid and sub.
+    """
+    global _forecast_model
+    width = {"main": 1, "mid": 2}.get(level)
+    if width is None:
+        raise ValueError("Invalid forecast level. Use 'main' or 'mid'.")
+    filters = filters or {}
+    unknown = set(filters) - {"main", "mid", "sub"}
+    if unknown:
+        raise ValueError(f"Forecasts only filter by category, not {', '.join(sorted(unknown))}.")
+
+    with _forecast_lock:
+        model = _forecast_model
+        if model is None or model.backend is not get_backend():
+            if model is not None:
+                model.close()
+            model = _forecast_model = ForecastModel()
+
+    iso = today if isinstance(today, str) else (today or date.today()).isoformat()
+    groups = {}
+    paths = get_category_paths()
+    for cid in category_ids(filters.get("main"), filters.get("mid"), filters.get("sub")):
+        groups.setdefault(paths[cid][:width], []).append(cid)
+
+    rows = []
+    for key in sorted(groups, key=lambda k: tuple(part or "" for part in k)):
+        spent, projected = model.project(period, groups[key], iso)
+        if spent or projected:
+            rows.append((*key, from_cents(spent), from_cents(projected)))
+    return {
+        "period": period_key(period, iso),
+        "day": day_of_period(period, iso),
+        "days": period_length(period, period_key(period, iso)),
+        "rows": rows,
+        "spent": round(sum(row[-2] for row in rows), 2),
+        "projected": round(sum(row[-1] for row in rows), 2),
+    }
 
 def set_current_month(self):
     """Set start/end date to cover the current month."""
@@ -184,25 +273,40 @@ def set_current_year(self):
     self.end_date.setDate(today)
 
 
+def iter_expenses_by_date_range(start=None, end=None, chunk_size=FETCH_SIZE):
+    """Stream the rows get_expenses_by_date_range() returns, chunk_size at a time."""
+    return expense_tuples(run_query(ExpenseQuery(start=start, end=end), chunk_size))
+
 def get_expenses_by_date_range(start=None, end=None):
     """
     Returns all expenses within a given date range as tuples:
     (id, main_category, mid_category, sub_category, date, value, notes)
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    return list(iter_expenses_by_date_range(start, end))
+
+# The stats.Stats behind get_spending_distribution(), created on first use
+_stats = None
+_stats_lock = threading.Lock()
 
-    query = "SELECT id, main_category, mid_category, sub_category, date, value, notes FROM expenses WHERE 1=1"
-    params = []
+def use_stats(tracker):
+    """Serve get_spending_distribution() from this stats.Stats (None: create one when needed)."""
+    global _stats
+    _stats = tracker
 
-    if start:
-        query += " AND date >= ?"
-        params.append(start)
-    if end:
-        query += " AND date <= ?"
-        params.append(end)
+def get_spending_distribution(level="sub", start_month=None, end_month=None):
+    """
+    How large single expenses are per category at a level ("main", "mid" or
+    "sub") over an inclusive YYYY-MM range, as rows like get_totals_grouped's:
 
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+        [(main, mid, sub, {"count": 12, "mean": 8.5, "median": 7.0, "p90": 15.2, "p99": 21.0}), ...]
+
+    Percentiles are estimates within 1% (see backend.stats).
+    """
+    global _stats
+    with _stats_lock:
+        tracker = _stats
+        if tracker is None or tracker.backend is not get_backend():
+            if tracker is not None:
+                tracker.close()
+            tracker = _stats = Stats()
+    return tracker.by_category(level, start_month, end_month)
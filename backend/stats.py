@@ -0,0 +1,192 @@
+# backend/stats.py
+"""
+Spending distributions per category and month: count, mean, median, p90, p99.
+
+Exact percentiles need every value in the range sorted, so instead each
+(month, category_id) cell keeps a QuantileSketch, a log-bucketed histogram
+in the style of DDSketch:
+
+- a value v lands in bucket ceil(log_gamma(v)), gamma = (1 + a) / (1 - a),
+  and any quantile read back is within relative accuracy a (1% by default);
+  negative values (legacy refunds) get mirrored buckets, zeros a plain count
+- sketches merge by adding bucket counts, so a range of months or a whole
+  category branch is answered by merging its cells on demand
+- removing a value is adding it with count -1, so crud updates and deletes
+  are undone exactly
+
+The sketches live in memory only. Stats builds them on load from one
+grouped query (each distinct value per category and month, with its count),
+then follows crud writes like the other crud.DerivedView structures and
+rebuilds after outside commits.
+
+    stats = Stats()
+    stats.summary(main="Daily Expenses", start_month="2024-01", end_month="2024-06")
+    stats.by_category("mid", start_month="2024-01")
+"""
+import math
+
+from . import crud
+from .categories import category_ids, get_category_paths
+from .money import from_cents
+from .query import ExpenseQuery
+
+DEFAULT_ACCURACY = 0.01
+QUANTILES = {"median": 0.5, "p90": 0.9, "p99": 0.99}
+LOAD_CHUNK = 100_000
+
+
+class QuantileSketch:
+    """Mergeable quantile estimates over integer values (cents)."""
+
+    def __init__(self, relative_accuracy=DEFAULT_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1.")
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets = {}    # bucket key -> count of positive values
+        self.negative = {}   # bucket key of -value -> count of negative values
+        self.zeros = 0
+        self.count = 0
+        self.total = 0
+
+    def add(self, value, count=1):
+        """Record value `count` times; a negative count removes it again."""
+        if value > 0:
+            _add_count(self.buckets, self._key(value), count)
+        elif value < 0:
+            _add_count(self.negative, self._key(-value), count)
+        else:
+            self.zeros += count
+        self.count += count
+        self.total += value * count
+
+    def _key(self, magnitude):
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, key):
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def merge(self, other):
+        """Add another sketch's values into this one (accuracies must match)."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged.")
+        for key, count in other.buckets.items():
+            _add_count(self.buckets, key, count)
+        for key, count in other.negative.items():
+            _add_count(self.negative, key, count)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    def quantile(self, q):
+        """Estimated value at quantile q (0..1), or None when the sketch is empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1.")
+        if self.count <= 0:
+            return None
+        rank = max(math.ceil(q * self.count), 1)  # nearest-rank
+        seen = 0
+        # Most negative first: the mirrored buckets by falling magnitude
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen >= rank:
+                return -self._value(key)
+        seen += self.zeros
+        if seen >= rank:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen >= rank:
+                return self._value(key)
+        return self._value(max(self.buckets)) if self.buckets else 0.0
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+def _add_count(buckets, key, count):
+    left = buckets.get(key, 0) + count
+    if left:
+        buckets[key] = left
+    else:
+        del buckets[key]
+
+
+def _summary(sketch):
+    """A sketch as {"count", "mean", "median", "p90", "p99"} in currency units."""
+    summary = {"count": sketch.count, "mean": from_cents(sketch.mean()) if sketch.count else None}
+    for name, q in QUANTILES.items():
+        value = sketch.quantile(q)
+        summary[name] = None if value is None else from_cents(round(value))
+    return summary
+
+
+class Stats(crud.DerivedView):
+    def __init__(self, backend=None, relative_accuracy=DEFAULT_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        super().__init__(backend)
+
+    # --- building and keeping up ---
+    def _load(self):
+        """Sketch the backend's expenses from one (category, month, value) grouping."""
+        self._cells = {}
+        spec = ExpenseQuery(group_by=("category", "month", "value"))
+        for category_id, month, cents, _, count in self.backend.select(spec, LOAD_CHUNK):
+            self._add(category_id, month, cents, count)
+
+    def _add(self, category_id, date, cents, count):
+        key = (date[:7], category_id)
+        sketch = self._cells.get(key)
+        if sketch is None:
+            sketch = self._cells[key] = QuantileSketch(self.relative_accuracy)
+        sketch.add(cents, count)
+        if not sketch.count:
+            del self._cells[key]
+
+    def _apply(self, kind, old_rows, new_rows):
+        for rows, sign in ((old_rows, -1), (new_rows, 1)):
+            for _, category_id, date, cents, _ in rows:
+                self._add(category_id, date, cents, sign)
+
+    # --- queries ---
+    def sketch(self, main=None, mid=None, sub=None, start_month=None, end_month=None):
+        """A merged sketch of the cells matching a category path and inclusive YYYY-MM range."""
+        wanted = set(category_ids(main, mid, sub)) if (main or mid or sub) else None
+        merged = QuantileSketch(self.relative_accuracy)
+        with self._lock:
+            self.refresh()
+            for (month, category_id), sketch in self._cells.items():
+                if wanted is not None and category_id not in wanted:
+                    continue
+                if (start_month and month < start_month) or (end_month and month > end_month):
+                    continue
+                merged.merge(sketch)
+        return merged
+
+    def summary(self, main=None, mid=None, sub=None, start_month=None, end_month=None):
+        """{"count", "mean", "median", "p90", "p99"} for a category path and month range."""
+        return _summary(self.sketch(main, mid, sub, start_month, end_month))
+
+    def by_category(self, level="sub", start_month=None, end_month=None):
+        """
+        Summaries per category at a level ("main", "mid" or "sub"), as sorted
+        rows of (*path, summary) like categories.rollup.
+        """
+        width = {"main": 1, "mid": 2, "sub": 3}.get(level)
+        if width is None:
+            raise ValueError("Invalid grouping level. Use 'main', 'mid', or 'sub'.")
+        paths = get_category_paths()
+        grouped = {}
+        with self._lock:
+            self.refresh()
+            for (month, category_id), sketch in self._cells.items():
+                if (start_month and month < start_month) or (end_month and month > end_month):
+                    continue
+                key = paths[category_id][:width]
+                if key not in grouped:
+                    grouped[key] = QuantileSketch(self.relative_accuracy)
+                grouped[key].merge(sketch)
+        keys = sorted(grouped, key=lambda k: tuple(part or "" for part in k))
+        return [(*key, _summary(grouped[key])) for key in keys]
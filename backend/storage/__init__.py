@@ -0,0 +1,145 @@
+# backend/storage/__init__.py
+"""
+Storage engines behind backend.crud and backend.reports.
+
+crud validates input and reports shape output; everything that touches the
+stored rows goes through the StorageBackend selected here. Two engines ship:
+
+- "sqlite": the expenses.db file (default)
+- "memory": an in-process columnar store, handy for tests, benchmarks and
+  throwaway analysis
+
+Pick one with set_backend("memory") or the EXPENSES_BACKEND environment variable.
+"""
+import os
+import threading
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Set, Tuple
+
+from ..money import from_cents
+
+# Row shapes exchanged with the engines. Dates are ISO strings, values integer cents.
+#   NewRow:    (category_id, date, value_cents, notes)
+#   StoredRow: (id, category_id, date, value_cents, notes)
+CategoryPath = Tuple[str, Optional[str], Optional[str]]
+
+DEFAULT_BACKEND = "sqlite"
+
+
+class StorageBackend(Protocol):
+    name: str
+
+    def transaction(self) -> ContextManager:
+        """Group writes; everything inside commits or rolls back together."""
+
+    # --- categories ---
+    def category_paths(self) -> Dict[int, CategoryPath]:
+        """{category_id: (main, mid, sub)}. The same dict is returned until categories change."""
+
+    def add_categories(self, paths: Iterable[CategoryPath]) -> None:
+        """Store any of these paths that are missing."""
+
+    # --- writes (rows are already validated) ---
+    def insert(self, rows: Sequence[tuple]) -> List[int]:
+        """Insert NewRows and return their ids in order."""
+
+    def update(self, rows: Sequence[tuple]) -> None:
+        """Overwrite StoredRows by id; every id must exist."""
+
+    def delete(self, ids: Sequence[int]) -> None:
+        """Delete rows by id; every id must exist."""
+
+    def existing_ids(self, ids: Sequence[int]) -> Set[int]:
+        """The subset of ids that are stored."""
+
+    def fetch(self, ids: Sequence[int]) -> List[tuple]:
+        """The StoredRows for these ids (missing ids are skipped), in id order."""
+
+    # --- reads ---
+    def query(self, category_ids=None, start=None, end=None, after=None,
+              descending=False, limit=None, chunk_size=None) -> Iterator[tuple]:
+        """
+        Stream StoredRows ordered by (date, id), ascending unless descending.
+        - category_ids: only these categories (None = all)
+        - start / end: inclusive ISO date bounds
+        - after: a (date, id) key; only rows beyond it in the scan order
+        - limit: stop after this many rows
+        """
+
+    def select(self, spec, chunk_size=None) -> Iterator[tuple]:
+        """
+        Answer a backend.query.ExpenseQuery: StoredRows, a single
+        (total_cents, count) row, or (key, total_cents, count) groups.
+        """
+
+    def min_date(self, on_or_after=None) -> Optional[str]:
+        """Earliest stored date, optionally not before on_or_after."""
+
+    def rebuild_aggregates(self) -> int:
+        """Regenerate any derived summary data from the rows."""
+
+    # --- budgets ---
+    def budgets(self) -> List[tuple]:
+        """(id, main, mid, sub, period, limit_cents) rows sorted by path and period."""
+
+    def set_budget(self, path: CategoryPath, period: str, limit_cents: int) -> int:
+        """Create or replace the budget for a path and period; returns its id."""
+
+    def delete_budget(self, budget_id: int) -> bool:
+        """Delete a budget; False if it did not exist."""
+
+    # --- import checkpoints ---
+    def load_checkpoint(self, source: str) -> Optional[dict]:
+        """The saved progress of an import from source, or None."""
+
+    def save_checkpoint(self, source: str, state: dict) -> None:
+        """Store import progress; inside transaction() it commits or rolls back with the rows."""
+
+    def delete_checkpoint(self, source: str) -> None:
+        """Forget an import's progress."""
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name):
+    if name == "sqlite":
+        from .sqlite import SQLiteBackend
+        return SQLiteBackend()
+    if name == "memory":
+        from .memory import MemoryBackend
+        return MemoryBackend()
+    raise ValueError(f"Unknown storage backend '{name}'. Use 'sqlite' or 'memory'.")
+
+
+def get_backend() -> StorageBackend:
+    """Return the active backend, creating the configured one on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(os.environ.get("EXPENSES_BACKEND", DEFAULT_BACKEND))
+        return _backend
+
+
+def set_backend(backend):
+    """
+    Select the storage engine: a name ("sqlite" or "memory"), a backend
+    instance, or None to go back to the configured default on next use.
+    """
+    global _backend
+    if isinstance(backend, str):
+        backend = create_backend(backend)
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+def expense_tuples(rows, paths=None):
+    """
+    Turn StoredRows into the (id, main, mid, sub, date, value, notes) tuples
+    the frontends use, converting cents to a float amount.
+    """
+    paths = paths if paths is not None else get_backend().category_paths()
+    for expense_id, category_id, date, value_cents, notes in rows:
+        main, mid, sub = paths[category_id]
+        yield expense_id, main, mid, sub, date, from_cents(value_cents), notes
@@ -0,0 +1,285 @@
+# backend/storage/memory.py
+"""
+An in-process columnar engine. Each column is a typed array (int64 ids and
+cents, uint16 category ids, int32 day numbers) rather than a list of row
+tuples, so millions of rows stay compact and scans touch only the columns
+they need. Nothing is persisted; it suits tests, benchmarks and throwaway
+analysis.
+"""
+import threading
+from array import array
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+
+from ..categories import taxonomy_paths
+
+
+@lru_cache(maxsize=None)
+def _day(iso):
+    """ISO date string -> proleptic ordinal day number."""
+    return date.fromisoformat(iso).toordinal()
+
+
+@lru_cache(maxsize=None)
+def _iso(day):
+    return date.fromordinal(day).isoformat()
+
+
+@lru_cache(maxsize=None)
+def _month(day):
+    return _iso(day)[:7]
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = array("q")
+        self._category_ids = array("H")
+        self._days = array("i")
+        self._cents = array("q")
+        self._notes = []
+        self._positions = {}  # expense id -> index into the columns
+        self._next_id = 1
+        self._paths = {}
+        self._undo = None     # undo callbacks while a transaction is open
+        self._budgets = {}    # budget id -> (main, mid, sub, period, limit_cents)
+        self._next_budget_id = 1
+        self._checkpoints = {}  # import source -> progress state
+        self.add_categories(taxonomy_paths())
+
+    def _columns(self):
+        return self._ids, self._category_ids, self._days, self._cents, self._notes
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            if self._undo is not None:
+                yield self
+                return
+            self._undo = []
+            try:
+                yield self
+            except BaseException:
+                undo, self._undo = self._undo, None
+                for step in reversed(undo):
+                    step()
+                raise
+            self._undo = None
+
+    def _log(self, step):
+        if self._undo is not None:
+            self._undo.append(step)
+
+    # --- categories ---
+    def category_paths(self):
+        return self._paths
+
+    def add_categories(self, paths):
+        with self._lock:
+            known = set(self._paths.values())
+            new = [tuple(p) for p in paths if tuple(p) not in known]
+            if new:
+                # Replace rather than mutate so callers can cache on identity
+                paths = dict(self._paths)
+                for path in dict.fromkeys(new):
+                    paths[len(paths) + 1] = path
+                self._paths = paths
+
+    # --- column plumbing (no undo logging) ---
+    def _append(self, row):
+        expense_id, category_id, day, cents, notes = row
+        self._positions[expense_id] = len(self._ids)
+        self._ids.append(expense_id)
+        self._category_ids.append(category_id)
+        self._days.append(day)
+        self._cents.append(cents)
+        self._notes.append(notes)
+
+    def _row(self, i):
+        return self._ids[i], self._category_ids[i], self._days[i], self._cents[i], self._notes[i]
+
+    def _remove(self, expense_id):
+        """Delete by moving the last row into the hole, keeping the columns dense."""
+        i = self._positions.pop(expense_id)
+        row = self._row(i)
+        last = len(self._ids) - 1
+        if i != last:
+            for column in self._columns():
+                column[i] = column[last]
+            self._positions[self._ids[i]] = i
+        for column in self._columns():
+            column.pop()
+        return row
+
+    def _overwrite(self, row):
+        i = self._positions[row[0]]
+        old = self._row(i)
+        for column, value in zip(self._columns(), row):
+            column[i] = value
+        return old
+
+    # --- writes ---
+    def insert(self, rows):
+        ids = []
+        with self.transaction():
+            for category_id, iso, cents, notes in rows:
+                expense_id = self._next_id
+                self._next_id += 1
+                self._append((expense_id, category_id, _day(iso), cents, notes))
+                self._log(lambda expense_id=expense_id: self._remove(expense_id))
+                ids.append(expense_id)
+        return ids
+
+    def update(self, rows):
+        with self.transaction():
+            for expense_id, category_id, iso, cents, notes in rows:
+                old = self._overwrite((expense_id, category_id, _day(iso), cents, notes))
+                self._log(lambda old=old: self._overwrite(old))
+
+    def delete(self, ids):
+        with self.transaction():
+            for expense_id in ids:
+                old = self._remove(expense_id)
+                self._log(lambda old=old: self._append(old))
+
+    def existing_ids(self, ids):
+        return {i for i in ids if i in self._positions}
+
+    def fetch(self, ids):
+        with self._lock:
+            rows = []
+            for expense_id in sorted(set(ids)):
+                i = self._positions.get(expense_id)
+                if i is not None:
+                    rows.append((expense_id, self._category_ids[i], _iso(self._days[i]), self._cents[i], self._notes[i]))
+        return rows
+
+    # --- reads ---
+    def _matching(self, category_ids=None, start=None, end=None):
+        """Indices of rows in the given categories and inclusive date range."""
+        wanted = set(category_ids) if category_ids is not None else None
+        lo = _day(start) if start else None
+        hi = _day(end) if end else None
+        return [
+            i for i, (category_id, day) in enumerate(zip(self._category_ids, self._days))
+            if (wanted is None or category_id in wanted)
+            and (lo is None or day >= lo)
+            and (hi is None or day <= hi)
+        ]
+
+    def query(self, category_ids=None, start=None, end=None, after=None,
+              descending=False, limit=None, chunk_size=None):
+        with self._lock:
+            keyed = [((self._days[i], self._ids[i]), i) for i in self._matching(category_ids, start, end)]
+            keyed.sort(reverse=descending)
+            if after:
+                bound = (_day(after[0]), after[1])
+                keyed = [k for k in keyed if (k[0] < bound if descending else k[0] > bound)]
+            if limit is not None:
+                keyed = keyed[:limit]
+            # Copy the rows out so later writes cannot shift them under the caller
+            rows = [
+                (self._ids[i], self._category_ids[i], _iso(self._days[i]), self._cents[i], self._notes[i])
+                for _, i in keyed
+            ]
+        return iter(rows)
+
+    def select(self, spec, chunk_size=None):
+        ids = spec.category_ids()
+        min_cents, max_cents = spec.value_bounds()
+        notes = spec.notes.lower() if spec.notes else None
+        cents = self._cents
+
+        with self._lock:
+            matches = [
+                i for i in self._matching(ids, spec.start, spec.end)
+                if (min_cents is None or cents[i] >= min_cents)
+                and (max_cents is None or cents[i] <= max_cents)
+                and (notes is None or notes in (self._notes[i] or "").lower())
+            ]
+            if spec.totals:
+                return iter([(sum(cents[i] for i in matches), len(matches))])
+
+            if spec.group_by:
+                columns = {
+                    "category": self._category_ids.__getitem__,
+                    "month": lambda i: _month(self._days[i]),
+                    "day": lambda i: _iso(self._days[i]),
+                    "value": cents.__getitem__,
+                }
+                keys = [columns[key] for key in spec.group_keys]
+                cells = {}
+                for i in matches:
+                    cell = cells.setdefault(tuple(key(i) for key in keys), [0, 0])
+                    cell[0] += cents[i]
+                    cell[1] += 1
+                rows = [(*k, total, count) for k, (total, count) in cells.items()]
+                width = len(keys)
+                rows.sort(key=(lambda r: r[:width]) if spec.order == "key" else (lambda r: (r[width], r[:width])),
+                          reverse=spec.descending)
+            else:
+                column = {"date": self._days, "value": cents, "id": self._ids}[spec.order]
+                matches.sort(key=lambda i: (column[i], self._ids[i]), reverse=spec.descending)
+                rows = [
+                    (self._ids[i], self._category_ids[i], _iso(self._days[i]), cents[i], self._notes[i])
+                    for i in matches
+                ]
+
+        return iter(rows[:spec.limit] if spec.limit is not None else rows)
+
+    def min_date(self, on_or_after=None):
+        with self._lock:
+            lo = _day(on_or_after) if on_or_after else None
+            days = [d for d in self._days if lo is None or d >= lo]
+        return _iso(min(days)) if days else None
+
+    def rebuild_aggregates(self):
+        return 0  # aggregates are computed on demand; nothing is materialized
+
+    # --- budgets ---
+    def budgets(self):
+        with self._lock:
+            rows = [(budget_id, *budget) for budget_id, budget in self._budgets.items()]
+        rows.sort(key=lambda r: (r[1], r[2] or "", r[3] or "", ("week", "month", "year").index(r[4])))
+        return rows
+
+    def set_budget(self, path, period, limit_cents):
+        with self._lock:
+            for budget_id, (*other, other_period, _) in self._budgets.items():
+                if tuple(other) == tuple(path) and other_period == period:
+                    break
+            else:
+                budget_id = self._next_budget_id
+                self._next_budget_id += 1
+            self._budgets[budget_id] = (*path, period, limit_cents)
+        return budget_id
+
+    def delete_budget(self, budget_id):
+        with self._lock:
+            return self._budgets.pop(budget_id, None) is not None
+
+    # --- import checkpoints ---
+    def load_checkpoint(self, source):
+        with self._lock:
+            state = self._checkpoints.get(source)
+            return dict(state) if state is not None else None
+
+    def save_checkpoint(self, source, state):
+        with self.transaction():
+            old = self._checkpoints.get(source)
+            self._checkpoints[source] = dict(state)
+            self._log(lambda: self._restore_checkpoint(source, old))
+
+    def delete_checkpoint(self, source):
+        with self.transaction():
+            old = self._checkpoints.pop(source, None)
+            self._log(lambda: self._restore_checkpoint(source, old))
+
+    def _restore_checkpoint(self, source, state):
+        if state is None:
+            self._checkpoints.pop(source, None)
+        else:
+            self._checkpoints[source] = state
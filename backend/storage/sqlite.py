@@ -0,0 +1,190 @@
+# backend/storage/sqlite.py
+"""The SQLite engine: expenses.db via the pooled connection in backend.database."""
+import json
+import threading
+
+from .. import database
+from ..aggregates import rebuild_monthly_totals
+from ..query import compile_query
+
+# SQLite builds before 3.32 allow at most 999 bound parameters per statement
+MAX_VARIABLES = 999
+
+_category_cache = {"db": None, "paths": {}}
+_category_lock = threading.Lock()
+
+
+def clear_category_cache():
+    with _category_lock:
+        _category_cache["db"] = None
+
+
+_BUDGET_ORDER = (
+    "b.main_category, ifnull(b.mid_category, ''), ifnull(b.sub_category, ''), "
+    "CASE b.period WHEN 'week' THEN 0 WHEN 'month' THEN 1 ELSE 2 END"
+)
+
+
+def _id_chunks(ids):
+    """Distinct ids in slices small enough for one IN (...) list."""
+    ids = list(dict.fromkeys(ids))
+    return (ids[i:i + MAX_VARIABLES] for i in range(0, len(ids), MAX_VARIABLES))
+
+
+def _in_clause(column, values):
+    return f" AND {column} IN ({','.join('?' * len(values))})", list(values)
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def transaction(self):
+        return database.transaction()
+
+    # --- categories ---
+    def category_paths(self):
+        with _category_lock:
+            if _category_cache["db"] != database.DB_NAME:
+                rows = database.get_connection().execute(
+                    "SELECT id, main_category, mid_category, sub_category FROM categories"
+                ).fetchall()
+                _category_cache["paths"] = {r[0]: (r[1], r[2], r[3]) for r in rows}
+                _category_cache["db"] = database.DB_NAME
+            return _category_cache["paths"]
+
+    def add_categories(self, paths):
+        from ..categories import seed
+
+        with database.transaction() as conn:
+            seed(conn, paths)
+
+    # --- writes ---
+    def insert(self, rows):
+        with database.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO expenses (category_id, date, value_cents, notes) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            # We hold the write lock, so AUTOINCREMENT hands out consecutive ids
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def update(self, rows):
+        with database.transaction() as conn:
+            conn.executemany("""
+                UPDATE expenses
+                SET category_id = ?, date = ?, value_cents = ?, notes = ?
+                WHERE id = ?
+            """, [(*fields, expense_id) for expense_id, *fields in rows])
+
+    def delete(self, ids):
+        with database.transaction() as conn:
+            conn.executemany("DELETE FROM expenses WHERE id=?", [(i,) for i in ids])
+
+    def existing_ids(self, ids):
+        conn = database.get_connection()
+        found = set()
+        for chunk in _id_chunks(ids):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(r[0] for r in conn.execute(f"SELECT id FROM expenses WHERE id IN ({placeholders})", chunk))
+        return found
+
+    def fetch(self, ids):
+        conn = database.get_connection()
+        rows = []
+        for chunk in _id_chunks(ids):
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(conn.execute(
+                f"SELECT id, category_id, date, value_cents, notes FROM expenses WHERE id IN ({placeholders})",
+                chunk
+            ))
+        rows.sort()
+        return rows
+
+    # --- reads ---
+    def query(self, category_ids=None, start=None, end=None, after=None,
+              descending=False, limit=None, chunk_size=None):
+        query = "SELECT id, category_id, date, value_cents, notes FROM expenses WHERE 1=1"
+        params = []
+        if category_ids is not None:
+            clause, values = _in_clause("category_id", category_ids)
+            query += clause
+            params.extend(values)
+        if start:
+            query += " AND date >= ?"
+            params.append(start)
+        if end:
+            query += " AND date <= ?"
+            params.append(end)
+        if after:
+            query += f" AND (date, id) {'<' if descending else '>'} (?, ?)"
+            params.extend(after)
+
+        order = "DESC" if descending else "ASC"
+        query += f" ORDER BY date {order}, id {order}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return database.iter_rows(query, params, chunk_size or database.FETCH_SIZE)
+
+    def select(self, spec, chunk_size=None):
+        rows = database.iter_rows(*compile_query(spec), chunk_size or database.FETCH_SIZE)
+        if spec.totals:
+            # SUM() over no rows is NULL
+            total, count = next(rows)
+            rows.close()
+            return iter([(total or 0, count or 0)])
+        return rows
+
+    def min_date(self, on_or_after=None):
+        conn = database.get_connection()
+        if on_or_after:
+            return conn.execute("SELECT MIN(date) FROM expenses WHERE date >= ?", (on_or_after,)).fetchone()[0]
+        return conn.execute("SELECT MIN(date) FROM expenses").fetchone()[0]
+
+    def rebuild_aggregates(self):
+        return rebuild_monthly_totals()
+
+    # --- budgets ---
+    def budgets(self):
+        return database.get_connection().execute(f"""
+            SELECT id, main_category, mid_category, sub_category, period, limit_cents
+            FROM budgets b ORDER BY {_BUDGET_ORDER}
+        """).fetchall()
+
+    def set_budget(self, path, period, limit_cents):
+        main, mid, sub = path
+        with database.transaction() as conn:
+            row = conn.execute("""
+                SELECT id FROM budgets
+                WHERE main_category = ? AND mid_category IS ? AND sub_category IS ? AND period = ?
+            """, (main, mid, sub, period)).fetchone()
+            if row:
+                conn.execute("UPDATE budgets SET limit_cents = ? WHERE id = ?", (limit_cents, row[0]))
+                return row[0]
+            return conn.execute("""
+                INSERT INTO budgets (main_category, mid_category, sub_category, period, limit_cents)
+                VALUES (?, ?, ?, ?, ?)
+            """, (main, mid, sub, period, limit_cents)).lastrowid
+
+    def delete_budget(self, budget_id):
+        with database.transaction() as conn:
+            return conn.execute("DELETE FROM budgets WHERE id = ?", (budget_id,)).rowcount > 0
+
+    # --- import checkpoints ---
+    def load_checkpoint(self, source):
+        row = database.get_connection().execute(
+            "SELECT state FROM import_checkpoints WHERE source = ?", (source,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_checkpoint(self, source, state):
+        with database.transaction() as conn:
+            conn.execute("""
+                INSERT INTO import_checkpoints (source, state) VALUES (?, ?)
+                ON CONFLICT (source) DO UPDATE SET state = excluded.state
+            """, (source, json.dumps(state)))
+
+    def delete_checkpoint(self, source):
+        with database.transaction() as conn:
+            conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source,))
@@ -2,23 +2,34 @@
 from datetime import datetime, timedelta
 from typing import Any
 
-def validate_date(date_str: str) -> bool:
+from .money import to_cents
+
+def parse_date(date_str: str):
     """
-    Accept YYYY-MM-DD (also accept YYYY/MM/DD by normalizing). Also enforce:
-      - date <= today
-      - date >= today - 10 years
-    Raises ValueError on invalid input.
+    Parse YYYY-MM-DD or YYYY/MM/DD, zero padding optional, into a date.
+    Only the format is checked. Raises ValueError on invalid input.
     """
     if not isinstance(date_str, str):
         raise ValueError("Invalid date format. Please use YYYY-MM-DD.")
 
     # allow slashes by replacing them
-    date_normalized = date_str.replace("/", "-")
+    date_normalized = date_str.strip().replace("/", "-")
     try:
-        dt = datetime.strptime(date_normalized, "%Y-%m-%d").date()
+        return datetime.strptime(date_normalized, "%Y-%m-%d").date()
     except ValueError:
         raise ValueError("Invalid date format. Please use YYYY-MM-DD.")
 
+
+def normalize_date(date_str: str) -> str:
+    """
+    Accept YYYY-MM-DD (also accept YYYY/MM/DD by normalizing). Also enforce:
+      - date <= today
+      - date >= today - 10 years
+    Returns the date as a zero-padded YYYY-MM-DD string so that stored dates
+    sort and range-compare correctly. Raises ValueError on invalid input.
+    """
+    dt = parse_date(date_str)
+
     today = datetime.today().date()
     ten_years_ago = today - timedelta(days=365 * 10)
 
@@ -27,6 +38,12 @@ def validate_date(date_str: str) -> bool:
     if dt < ten_years_ago:
         raise ValueError("Date cannot be older than 10 years.")
 
+    return dt.isoformat()
+
+
+def validate_date(date_str: str) -> bool:
+    """Same checks as normalize_date(); returns True if valid, else raises."""
+    normalize_date(date_str)
     return True
 
 
@@ -41,3 +58,11 @@ def validate_value(value: Any) -> float:
     if val <= 0:
         raise ValueError("Value must be positive.")
     return val
+
+
+def validate_cents(value: Any) -> int:
+    """Like validate_value() but parses straight to integer cents ('12,1' -> 1210)."""
+    cents = to_cents(value)
+    if cents <= 0:
+        raise ValueError("Value must be positive.")
+    return cents
@@ -0,0 +1,43 @@
+"""
+Outlier and duplicate detection over the whole ledger, and for a batch of
+freshly inserted ids, on the columnar snapshot.
+
+    python -m benchmarks.bench_anomalies --rows 1000000
+"""
+import argparse
+import time
+
+from backend import anomalies, columnar, database
+from benchmarks.common import seed_database, temp_db_path, timeit, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default=temp_db_path("bench_anomalies.db"))
+    args = parser.parse_args()
+
+    print(f"Seeding {args.rows:,} rows into {args.db} ...")
+    seed_database(args.db, args.rows)
+
+    start = time.perf_counter()
+    snapshot = columnar.Snapshot()
+    print(f"Snapshot loaded in {time.perf_counter() - start:.2f}s")
+
+    flags = anomalies.find_anomalies(snapshot)
+    print(f"{len(flags):,} rows flagged")
+    new_ids = list(snapshot.ids[-1000:])
+
+    report(f"Anomaly detection, {args.rows:,} rows", [
+        ("outliers, whole ledger", *timeit(lambda: anomalies.find_outliers(snapshot), args.repeat)),
+        ("duplicates, whole ledger", *timeit(lambda: anomalies.find_duplicates(snapshot), args.repeat)),
+        ("both, 1,000 new ids", *timeit(lambda: anomalies.find_anomalies(snapshot, ids=new_ids), args.repeat)),
+    ])
+
+    snapshot.close()
+    database.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Aggregates on the NumPy columnar snapshot versus SQLite, plus the old
+pattern of streaming tuples and summing them in a Python dict.
+
+    python -m benchmarks.bench_columnar --rows 1000000
+    python -m benchmarks.bench_columnar --rows 10000000 --repeat 3
+"""
+import argparse
+import time
+from collections import defaultdict
+from datetime import date
+
+from backend import columnar, database, reports
+from backend.query import ExpenseQuery
+from backend.storage import get_backend
+from benchmarks.common import seed_database, temp_db_path, timeit, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--db", default=temp_db_path("bench_columnar.db"))
+    args = parser.parse_args()
+
+    print(f"Seeding {args.rows:,} rows into {args.db} ...")
+    seed_database(args.db, args.rows)
+
+    start = time.perf_counter()
+    snapshot = columnar.Snapshot()
+    print(f"Snapshot loaded in {time.perf_counter() - start:.2f}s "
+          f"({sum(a.nbytes for a in (snapshot.ids, snapshot.days, snapshot.codes, snapshot.cents)) / 1e6:.0f} MB)")
+
+    year_ago = date.today().replace(year=date.today().year - 1)
+    specs = [
+        ("total, partial-month range", ExpenseQuery(start=year_ago.replace(day=15).isoformat(), end=date.today().isoformat(), totals=True)),
+        ("by category", ExpenseQuery(group_by="category")),
+        ("by month", ExpenseQuery(group_by="month")),
+        ("by day, value >= 100", ExpenseQuery(group_by="day", min_value=100)),
+        ("main filter by month", ExpenseQuery(main="Daily Expenses", group_by="month")),
+    ]
+
+    backend = get_backend()
+    results = []
+    for label, spec in specs:
+        assert list(snapshot.select(spec)) == list(backend.select(spec)), label
+        results.append((f"sql: {label}", *timeit(lambda: list(backend.select(spec)), args.repeat)))
+        results.append((f"numpy: {label}", *timeit(lambda: list(snapshot.select(spec)), args.repeat)))
+
+    def python_loop():
+        totals = defaultdict(float)
+        for exp in reports.iter_expenses_by_date_range():
+            totals[exp[1]] += exp[5]
+        return totals
+
+    results.append(("python loop: by main", *timeit(python_loop, max(1, args.repeat // 5))))
+    report(f"Aggregates, {args.rows:,} rows", results)
+
+    snapshot.close()
+    database.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Per-call latency: a fresh sqlite3.connect() per call (the old pattern) versus
+the pooled, tuned connection from backend.database.
+
+    python -m benchmarks.bench_connection --rows 1000000
+"""
+import argparse
+import sqlite3
+
+from backend import database
+from benchmarks.common import seed_database, temp_db_path, timeit, report
+
+QUERIES = [
+    ("point lookup by id", "SELECT * FROM expenses WHERE id = ?", (12345,)),
+    ("count rows", "SELECT COUNT(*) FROM expenses", ()),
+    ("total by main category",
+     "SELECT SUM(value_cents) FROM expenses WHERE category_id IN "
+     "(SELECT id FROM categories WHERE main_category = ?)", ("Daily Expenses",)),
+    ("monthly summary",
+     "SELECT substr(date, 1, 7) AS month, SUM(value_cents) FROM expenses GROUP BY month", ()),
+]
+
+
+def per_call_connection(path, sql, params):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def pooled_connection(sql, params):
+    return database.get_connection().execute(sql, params).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", default=temp_db_path())
+    args = parser.parse_args()
+
+    print(f"Seeding {args.rows:,} rows into {args.db} ...")
+    seed_database(args.db, args.rows)
+    database.close_all_connections()
+
+    results = []
+    for label, sql, params in QUERIES:
+        best, mean = timeit(lambda: per_call_connection(args.db, sql, params), args.repeat)
+        results.append((f"{label} (connect per call)", best, mean))
+        pooled_connection(sql, params)  # warm the pooled connection once
+        best, mean = timeit(lambda: pooled_connection(sql, params), args.repeat)
+        results.append((f"{label} (pooled)", best, mean))
+    report(f"Connection latency, {args.rows:,} rows", results)
+    database.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
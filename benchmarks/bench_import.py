@@ -0,0 +1,68 @@
+"""
+CSV import throughput and the process's peak memory as the file grows.
+Rows/s should hold steady and peak memory stay flat: only one batch is ever
+in memory. (ru_maxrss is in KiB on Linux; Unix only.)
+
+--files splits the rows over several files imported with import_files();
+compare --workers 1 (in-process) with more workers on a multi-core machine.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --rows 10000 100000 1000000 --batch-size 50000
+    python -m benchmarks.bench_import --rows 1200000 --files 12 --workers 1
+    python -m benchmarks.bench_import --rows 1200000 --files 12 --workers 8
+"""
+import argparse
+import csv
+import os
+import resource
+import time
+
+from backend import database, importer
+from benchmarks.common import random_rows, temp_db_path
+
+
+def write_csv(path, rows, seed=42):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(importer.FIELDS)
+        writer.writerows(random_rows(rows, seed=seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--batch-size", type=int, default=importer.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="default: one per core")
+    parser.add_argument("--db", default=temp_db_path("bench_import.db"))
+    args = parser.parse_args()
+
+    sources = [temp_db_path(f"bench_import_{n}.csv") for n in range(args.files)]
+    print(f"\n{'rows':>12}{'seconds':>10}{'rows/s':>12}{'max RSS MiB':>13}")
+    for rows in args.rows:
+        for n, source in enumerate(sources):
+            write_csv(source, rows // args.files, seed=n)
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        database.close_all_connections()
+        database.DB_NAME = args.db
+        database.init_db()
+
+        start = time.perf_counter()
+        if args.files == 1 and args.workers is None:
+            imported = importer.import_csv(sources[0], batch_size=args.batch_size, resume=False)["imported"]
+        else:
+            results = importer.import_files(sources, workers=args.workers, batch_size=args.batch_size, resume=False)
+            imported = sum(result["imported"] for result in results)
+        elapsed = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        assert imported == rows // args.files * args.files, imported
+        print(f"{rows:>12,}{elapsed:>10.2f}{rows / elapsed:>12,.0f}{peak / 1024:>13.1f}")
+
+    for source in sources:
+        os.remove(source)
+    database.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Random date-range totals on the prefix-sum range index versus SQLite, as the
+history grows. SQL time grows with the rows in the range; the index does two
+lookups per tree whatever the size.
+
+    python -m benchmarks.bench_range_index
+    python -m benchmarks.bench_range_index --rows 10000 100000 1000000 --queries 500
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from backend import database, rangeindex
+from backend.query import ExpenseQuery
+from backend.storage import get_backend
+from benchmarks.common import seed_database, temp_db_path, timeit, report
+
+
+def random_ranges(n, days, seed=7):
+    """n (start, end) ISO pairs inside the last `days` days."""
+    rng = random.Random(seed)
+    today = date.today()
+    ranges = []
+    for _ in range(n):
+        a, b = sorted(rng.randrange(days) for _ in range(2))
+        ranges.append(((today - timedelta(days=b)).isoformat(), (today - timedelta(days=a)).isoformat()))
+    return ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db", default=temp_db_path("bench_range_index.db"))
+    args = parser.parse_args()
+
+    ranges = random_ranges(args.queries, 3650)
+    results = []
+    for rows in args.rows:
+        print(f"Seeding {rows:,} rows into {args.db} ...")
+        seed_database(args.db, rows)
+        backend = get_backend()
+        index = rangeindex.RangeIndex()
+
+        specs = [ExpenseQuery(start=start, end=end, totals=True) for start, end in ranges]
+        specs += [ExpenseQuery(main="Daily Expenses", start=start, end=end, totals=True) for start, end in ranges[:20]]
+        for spec in specs[:20] + specs[-5:]:
+            assert list(index.select(spec)) == list(backend.select(spec)), spec
+
+        def sql():
+            for spec in specs:
+                next(backend.select(spec))
+
+        def indexed():
+            for spec in specs:
+                next(index.select(spec))
+
+        for label, fn in ((f"sql: {rows:,} rows", sql), (f"index: {rows:,} rows", indexed)):
+            best, mean = timeit(fn, args.repeat)
+            results.append((label, best / len(specs), mean / len(specs)))
+        index.close()
+
+    report(f"Range totals, ms per query ({args.queries + 20} queries per run)", results)
+    database.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
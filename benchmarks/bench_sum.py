@@ -0,0 +1,52 @@
+"""
+SUM throughput: integer cents (value_cents) versus the old REAL column, plus
+the old pattern of fetching every row and calling float() on it in Python.
+
+    python -m benchmarks.bench_sum --rows 1000000
+"""
+import argparse
+
+from backend import database
+from benchmarks.common import seed_database, temp_db_path, timeit, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--db", default=temp_db_path())
+    args = parser.parse_args()
+
+    print(f"Seeding {args.rows:,} rows into {args.db} ...")
+    seed_database(args.db, args.rows)
+    conn = database.get_connection()
+
+    # Side table with the pre-migration REAL representation for comparison
+    with database.transaction():
+        conn.execute("DROP TABLE IF EXISTS bench_real_values")
+        conn.execute("CREATE TABLE bench_real_values (value REAL NOT NULL)")
+        conn.execute("INSERT INTO bench_real_values SELECT value_cents / 100.0 FROM expenses")
+
+    cents_total = conn.execute("SELECT SUM(value_cents) FROM expenses").fetchone()[0]
+    real_total = conn.execute("SELECT SUM(value) FROM bench_real_values").fetchone()[0]
+    print(f"exact total  {cents_total / 100:.2f}")
+    print(f"REAL total   {real_total!r}  (drift {real_total - cents_total / 100:+.3e})")
+
+    cases = [
+        ("SUM(value_cents) integer", lambda: conn.execute("SELECT SUM(value_cents) FROM expenses").fetchone()),
+        ("SUM(value) REAL", lambda: conn.execute("SELECT SUM(value) FROM bench_real_values").fetchone()),
+        ("fetch + float() per row", lambda: sum(float(r[0]) for r in conn.execute("SELECT value FROM bench_real_values"))),
+    ]
+    results = []
+    for label, fn in cases:
+        best, mean = timeit(fn, args.repeat)
+        results.append((f"{label} ({args.rows / best / 1000:,.1f}M rows/s)", best, mean))
+    report(f"SUM throughput, {args.rows:,} rows", results)
+
+    with database.transaction():
+        conn.execute("DROP TABLE bench_real_values")
+    database.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Shared helpers for the benchmark scripts (run them from the repo root)."""
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from backend import crud, database
+from backend.categories import taxonomy_paths
+
+
+def random_rows(n, seed=42, days=3650):
+    """Yield n random (main, mid, sub, date, value, notes) rows over the last `days` days."""
+    rng = random.Random(seed)
+    paths = list(taxonomy_paths())
+    today = date.today()
+    for _ in range(n):
+        main, mid, sub = rng.choice(paths)
+        day = today - timedelta(days=rng.randrange(days))
+        value = round(rng.uniform(1, 200), 2)
+        yield main, mid, sub, day.isoformat(), value, ""
+
+
+def seed_database(path, rows, batch=50_000):
+    """Create a fresh database at `path` holding `rows` random expenses."""
+    if os.path.exists(path):
+        os.remove(path)
+    database.close_all_connections()
+    database.DB_NAME = path
+    database.init_db()
+
+    ids, errors = crud.add_expenses_bulk(random_rows(rows), chunk_size=batch)
+    if errors:
+        raise errors[0][1]
+    return path
+
+
+def temp_db_path(name="bench_expenses.db"):
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def timeit(fn, repeat=20):
+    """Return (best, mean) wall time in milliseconds over `repeat` calls."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times), sum(times) / len(times)
+
+
+def report(title, results):
+    """Print rows of (label, best_ms, mean_ms) as a small table."""
+    print(f"\n{title}")
+    print(f"{'case':<40}{'best ms':>12}{'mean ms':>12}")
+    for label, best, mean in results:
+        print(f"{label:<40}{best:>12.3f}{mean:>12.3f}")
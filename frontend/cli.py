@@ -1,7 +1,9 @@
 import sys, os
+import glob
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from backend import crud, reports
+from backend import backup, budgets, crud, exporter, importer, reports, storage
+from backend.query import ExpenseQuery
 from tabulate import tabulate
 from colorama import Fore, Style, init
 from backend.validation import CATEGORIES, validate_category
@@ -15,6 +17,9 @@ def print_menu():
     print("3. Update expense")
     print("4. Delete expense")
     print("5. Reports")
+    print("6. Import CSV")
+    print("7. Export expenses or totals")
+    print("8. Backup / restore")
     print(Fore.RED + "0. Exit")
 
 def print_reports_menu():
@@ -99,27 +104,40 @@ def handle_add():
         print("exp_id = ", main_cat, mid_cat, sub_cat, date, value_input, notes)
         exp_id = crud.add_expense(main_cat, mid_cat, sub_cat, date, value_input, notes)
         print(Fore.GREEN + f"✅ Expense added successfully (ID {exp_id}).")
+        for main, mid, sub, period, limit, spent in budgets.over_budget(main_cat, mid_cat, sub_cat, date):
+            path = " > ".join(part for part in (main, mid, sub) if part)
+            print(Fore.YELLOW + f"⚠️ Over budget: {path} spent ${spent:.2f} of ${limit:.2f} this {period}.")
     except Exception as e:
         print(Fore.RED + f"❌ Error: {e}")
 
-def handle_list():
-    expenses = crud.get_expenses()
-    if not expenses:
+def handle_list(page_size=20):
+    headers = ["ID", "Category", "Mid Category", "Sub Category", "Date", "Value", "Notes"]
+    page = crud.get_expenses_page(page_size=page_size, with_total=True)
+    total = page["total"]
+    if not page["rows"]:
         print("⚠️ No expenses found.")
         return
 
-    #print("\n=== Expense List ===")
-    #for exp in expenses:
-    #    exp_id, main_cat, sub_cat, date, value, notes = exp
-    #    category_display = f"{main_cat}" + (f" > {sub_cat}" if sub_cat else "")
-    #    print(f"[{exp_id}] {category_display} | {date} | ${value} | {notes}") # -> debug
-    #    value_float = float(value)  # 👈 convert here
-    #    print(f"[{exp_id}] {category_display} | {date} | ${value_float:.2f} | {notes}")
-    
-    headers = ["ID", "Category", "Mid Category", "Sub Category", "Date", "Value", "Notes"]
-    table = [[exp[0], exp[1], exp[2], exp[3], exp[4], f"${exp[5]:.2f}", exp[6]] for exp in expenses]
-    print("\n--- Expenses ---")
-    print(tabulate(table, headers, tablefmt="grid"))
+    while True:
+        table = [[exp[0], exp[1], exp[2], exp[3], exp[4], f"${exp[5]:.2f}", exp[6]] for exp in page["rows"]]
+        print("\n--- Expenses ---")
+        print(tabulate(table, headers, tablefmt="grid"))
+        print(f"{len(page['rows'])} shown of {total} expenses.")
+
+        options = []
+        if page["next"]:
+            options.append("n = next")
+        if page["prev"]:
+            options.append("p = previous")
+        if not options:
+            return
+        choice = input(f"({', '.join(options)}, Enter = back): ").strip().lower()
+        if choice == "n" and page["next"]:
+            page = crud.get_expenses_page(page_size=page_size, after=page["next"])
+        elif choice == "p" and page["prev"]:
+            page = crud.get_expenses_page(page_size=page_size, before=page["prev"])
+        else:
+            return
 
 def handle_update():
     try:
@@ -143,6 +161,90 @@ def handle_delete():
     except Exception as e:
         print(Fore.RED + f"❌ Error: {e}")
 
+def handle_import():
+    try:
+        pattern = input("CSV file, or a pattern for several (e.g. statements/*.csv): ").strip()
+        paths = sorted(glob.glob(pattern)) or [pattern]
+        print("Column names for each field (Enter = same name as the field, '-' = not in the file).")
+        mapping, defaults = {}, {}
+        for field in importer.FIELDS:
+            column = input(f"  {field} column [{field}]: ").strip()
+            if column == "-":
+                value = input(f"  {field} for every row: ").strip()
+                if value:
+                    defaults[field] = value
+            elif column:
+                mapping[field] = column
+
+        def show_progress(summary, fraction):
+            name = os.path.basename(summary["source"])
+            print(f"\r{fraction:6.1%}  {name}: {summary['imported']:,} imported, {summary['rejected']:,} rejected",
+                  end="", flush=True)
+
+        if len(paths) == 1:
+            rejects = input(f"Rejected rows report [{paths[0]}{importer.REJECTS_SUFFIX}]: ").strip()
+            rejects = rejects or paths[0] + importer.REJECTS_SUFFIX
+            results = [importer.import_csv(paths[0], mapping, defaults, rejects=rejects, progress=show_progress)]
+        else:
+            workers = input(f"{len(paths)} files. Worker processes [{os.cpu_count()}]: ").strip()
+            results = importer.import_files(paths, mapping, defaults, workers=int(workers) if workers else None,
+                                            rejects=True, progress=show_progress)
+        print()
+        for path, result in zip(paths, results):
+            if result["resumed_from"]:
+                print(f"{path}: resumed after row {result['resumed_from']:,}.")
+            print(Fore.GREEN + f"✅ {path}: imported {result['imported']:,} of {result['rows']:,} rows.")
+            if result["rejected"]:
+                report = rejects if len(paths) == 1 else path + importer.REJECTS_SUFFIX
+                print(Fore.YELLOW + f"⚠️ {result['rejected']:,} rows rejected, see {report}.")
+    except KeyboardInterrupt:
+        print(Fore.YELLOW + "\n⚠️ Import interrupted; run it again on the same files to resume.")
+    except Exception as e:
+        print(Fore.RED + f"❌ Error: {e}")
+
+def handle_export():
+    try:
+        main = input("Main Category (optional): ").strip() or None
+        mid = input("Mid Category (optional): ").strip() or None
+        sub = input("Sub Category (optional): ").strip() or None
+        start = input("Start date YYYY-MM-DD (optional): ").strip() or None
+        end = input("End date YYYY-MM-DD (optional): ").strip() or None
+        group_by = input("Totals by category/month/day (Enter = every expense): ").strip().lower() or None
+        path = input("Save to (.csv or .jsonl, add .gz to compress) [expenses.csv]: ").strip() or "expenses.csv"
+        count = exporter.export(ExpenseQuery(main, mid, sub, start, end, group_by=group_by), path)
+        print(Fore.GREEN + f"✅ Exported {count:,} rows to {path}.")
+    except Exception as e:
+        print(Fore.RED + f"❌ Error: {e}")
+
+def handle_backup():
+    print("\n--- Backup ---")
+    print("1. Back up now")
+    print("2. List backups")
+    print("3. Restore a backup")
+    print("0. Back")
+    choice = input("Choose option: ").strip()
+    try:
+        if choice == "1":
+            result = backup.backup(keep=backup.DEFAULT_KEEP)
+            print(Fore.GREEN + f"✅ Backed up to {result['path']}: {result['bytes'] / 2**20:.1f} MiB "
+                  f"in {result['seconds']:.2f}s ({result['mb_per_s']} MiB/s).")
+        elif choice in ("2", "3"):
+            paths = backup.list_backups()
+            if not paths:
+                print("⚠️ No backups yet.")
+                return
+            for i, path in enumerate(paths, start=1):
+                print(f"{i}. {os.path.basename(path)}  {os.path.getsize(path) / 2**20:.1f} MiB")
+            if choice == "3":
+                number = int(input("Restore which backup? ").strip())
+                if not 1 <= number <= len(paths):
+                    raise ValueError("No such backup.")
+                if input("This replaces every expense. Type 'yes' to continue: ").strip().lower() == "yes":
+                    saved = backup.restore(paths[number - 1])
+                    print(Fore.GREEN + f"✅ Restored. The previous ledger was saved to {saved['path']}.")
+    except Exception as e:
+        print(Fore.RED + f"❌ Error: {e}")
+
 def handle_reports():
     while True:
         print("\n=== Reports ===")
@@ -150,6 +252,11 @@ def handle_reports():
         print("2. Show totals by Main + Mid Category")
         print("3. Show totals by Full Category Path")
         print("4. Pick a Specific Category")
+        print("5. Rebuild summary tables")
+        print("6. Budget status")
+        print("7. Set a budget")
+        print("8. Forecast this month / year")
+        print("9. Spending distribution")
         print("0. Back")
 
         choice = input("Choose option: ").strip()
@@ -178,6 +285,64 @@ def handle_reports():
             total = reports.get_total_by_category(main, mid, sub)
             print(Fore.GREEN + f"Total for {main} {mid or ''} {sub or ''} = ${total:.2f}")
 
+        elif choice == "5":
+            cells = storage.get_backend().rebuild_aggregates()
+            print(Fore.GREEN + f"✅ Monthly totals rebuilt ({cells} month/category rows).")
+
+        elif choice == "6":
+            rows = budgets.budget_status()
+            if not rows:
+                print("⚠️ No budgets set.")
+                continue
+            table = [
+                [main, mid or "", sub or "", period, f"${limit:.2f}", f"${spent:.2f}",
+                 (Fore.RED if remaining < 0 else Fore.GREEN) + f"${remaining:.2f}" + Style.RESET_ALL]
+                for _, main, mid, sub, period, limit, spent, remaining in rows
+            ]
+            print(tabulate(table, headers=["Main", "Mid", "Sub", "Period", "Limit", "Spent", "Left"], tablefmt="grid"))
+
+        elif choice == "7":
+            try:
+                main = input("Enter Main Category: ").strip()
+                mid = input("Enter Mid Category (optional): ").strip() or None
+                sub = input("Enter Sub Category (optional): ").strip() or None
+                period = input("Period (week/month/year) [month]: ").strip() or "month"
+                limit = input("Limit: ").strip()
+                budgets.set_budget(main, mid, sub, period, limit)
+                print(Fore.GREEN + "✅ Budget saved.")
+            except Exception as e:
+                print(Fore.RED + f"❌ Error: {e}")
+
+        elif choice == "8":
+            period = input("Period (month/year) [month]: ").strip() or "month"
+            try:
+                forecast = reports.forecast_period(period)
+            except ValueError as e:
+                print(Fore.RED + f"❌ Error: {e}")
+                continue
+            table = [[main, mid, f"${spent:.2f}", f"${projected:.2f}"] for main, mid, spent, projected in forecast["rows"]]
+            table.append(["Total", "", f"${forecast['spent']:.2f}", f"${forecast['projected']:.2f}"])
+            print(f"Forecast for {forecast['period']} (day {forecast['day']} of {forecast['days']}):")
+            print(tabulate(table, headers=["Main", "Mid", "Spent", "Projected"], tablefmt="grid"))
+
+        elif choice == "9":
+            level = input("Group by (main/mid/sub) [mid]: ").strip() or "mid"
+            start_month = input("From month (YYYY-MM, optional): ").strip() or None
+            end_month = input("To month (YYYY-MM, optional): ").strip() or None
+            try:
+                rows = reports.get_spending_distribution(level, start_month, end_month)
+            except ValueError as e:
+                print(Fore.RED + f"❌ Error: {e}")
+                continue
+            width = {"main": 1, "mid": 2, "sub": 3}[level]
+            table = [
+                [*(part or "" for part in row[:width]), row[-1]["count"],
+                 *(f"${row[-1][name]:.2f}" for name in ("mean", "median", "p90", "p99"))]
+                for row in rows
+            ]
+            headers = ["Main", "Mid", "Sub"][:width] + ["Count", "Mean", "Median", "P90", "P99"]
+            print(tabulate(table, headers=headers, tablefmt="grid"))
+
         else:
             print(Fore.RED + "❌ Invalid choice. Try again.")
 
@@ -195,6 +360,12 @@ def menu():
             handle_delete()
         elif choice == "5":
             handle_reports()
+        elif choice == "6":
+            handle_import()
+        elif choice == "7":
+            handle_export()
+        elif choice == "8":
+            handle_backup()
         elif choice == "0":
             print("Goodbye! 👋")
             break
@@ -4,10 +4,11 @@ from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
     QTabWidget, QLabel, QPushButton, QFormLayout,
     QComboBox, QLineEdit, QTextEdit, QTableWidget, QTableWidgetItem,
-    QDateEdit, QMessageBox, QHBoxLayout
+    QDateEdit, QMessageBox, QHBoxLayout, QFileDialog
 )
 from PySide6.QtCore import QDate, Qt
-from backend import crud, reports
+from backend import budgets, crud, exporter, reports
+from backend.query import ExpenseQuery
 from backend.validation import CATEGORIES
 from datetime import date, timedelta
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
@@ -226,6 +227,14 @@ class ExpenseTracker(QMainWindow):
 
             exp_id = crud.add_expense(main_cat, mid_cat, sub_cat, date, value, notes)
             QMessageBox.information(self, "Success", f"Expense added (ID {exp_id}).")
+            over = budgets.over_budget(main_cat, mid_cat, sub_cat, date)
+            if over:
+                lines = [
+                    f"{' > '.join(part for part in (main, mid, sub) if part)}: "
+                    f"{spent:.2f} spent of {limit:.2f} this {period}"
+                    for main, mid, sub, period, limit, spent in over
+                ]
+                QMessageBox.warning(self, "Over budget", "\n".join(lines))
             self.value_input.clear()
             self.notes_input.clear()
             self.load_expenses()  # refresh list
@@ -277,6 +286,18 @@ class ExpenseTracker(QMainWindow):
 
         layout.addWidget(self.table)
 
+        # --- Paging ---
+        page_layout = QHBoxLayout()
+        self.prev_page_btn = QPushButton("◀ Previous")
+        self.prev_page_btn.clicked.connect(self.prev_page)
+        self.next_page_btn = QPushButton("Next ▶")
+        self.next_page_btn.clicked.connect(self.next_page)
+        self.page_label = QLabel("")
+        page_layout.addWidget(self.prev_page_btn)
+        page_layout.addWidget(self.page_label)
+        page_layout.addWidget(self.next_page_btn)
+        layout.addLayout(page_layout)
+
         # --- Action Buttons ---
         btn_layout = QHBoxLayout()
 
@@ -318,43 +339,68 @@ class ExpenseTracker(QMainWindow):
         self.update_filter_options()
         self.load_expenses()
 
-    def load_expenses(self):
-        """Load and display expenses with active filters."""
-        filter_mode = self.filter_type.currentText()
-        expenses = []
+    PAGE_SIZE = 200
 
+    def current_list_filter(self):
+        """Return (year, month) for the active filter, or (None, None) for all."""
+        filter_mode = self.filter_type.currentText()
         try:
-            if filter_mode == "All":
-                expenses = crud.get_expenses()
-                self.current_filter_label.setText("Showing: All expenses")
-            elif filter_mode == "By Year":
-                year = int(self.year_combo.currentText())
-                expenses = crud.get_expenses(year=year)
-                self.current_filter_label.setText(f"Showing: Expenses from {year}")
-                
-            elif filter_mode == "By Year and Month":
-                year = int(self.year_combo.currentText())
-                month = int(self.month_combo.currentText())
-                expenses = crud.get_expenses(year=year, month=month)
-                self.current_filter_label.setText(f"Showing: Expenses from {year}-{month}")
-
-        except Exception:
-            expenses = crud.get_expenses()  # fallback if any error
-
-        # Sort by date ASC
-        expenses = sorted(
-            [e for e in expenses if e[4] is not None],
-            key=lambda e: e[4],
-            reverse=True
+            if filter_mode == "By Year":
+                return int(self.year_combo.currentText()), None
+            if filter_mode == "By Year and Month":
+                return int(self.year_combo.currentText()), int(self.month_combo.currentText())
+        except ValueError:
+            pass  # fallback to all expenses if the combos are empty
+        return None, None
+
+    def load_expenses(self):
+        """Load and display the first page of expenses with active filters."""
+        year, month = self.current_list_filter()
+        if year and month:
+            self.current_filter_label.setText(f"Showing: Expenses from {year}-{month}")
+        elif year:
+            self.current_filter_label.setText(f"Showing: Expenses from {year}")
+        else:
+            self.current_filter_label.setText("Showing: All expenses")
+
+        self.show_page(crud.get_expenses_page(
+            year=year, month=month, page_size=self.PAGE_SIZE, newest_first=True, with_total=True
+        ))
+
+    def next_page(self):
+        self.turn_page(after=self._page["next"])
+
+    def prev_page(self):
+        self.turn_page(before=self._page["prev"])
+
+    def turn_page(self, after=None, before=None):
+        if not (after or before):
+            return
+        year, month = self.current_list_filter()
+        page = crud.get_expenses_page(
+            year=year, month=month, page_size=self.PAGE_SIZE, newest_first=True, after=after, before=before
         )
-        # Display in table
+        page["total"] = self._page["total"]
+        self.show_page(page)
+
+    def show_page(self, page):
+        """Display one page from crud.get_expenses_page (already newest first)."""
+        self._page = page
+        expenses = page["rows"]
+
+        # Filling a sorted table makes rows jump around while they are inserted
+        self.table.setSortingEnabled(False)
         self.table.setRowCount(len(expenses))
         for row, exp in enumerate(expenses):
             for col, val in enumerate(exp):
                 display_val = "" if val is None else str(val)
                 self.table.setItem(row, col, QTableWidgetItem(display_val))
+        self.table.setSortingEnabled(True)
 
         self.table.resizeColumnsToContents()
+        self.prev_page_btn.setEnabled(bool(page["prev"]))
+        self.next_page_btn.setEnabled(bool(page["next"]))
+        self.page_label.setText(f"{len(expenses)} shown of {page['total']} expenses")
 
     def load_years(self):
         """Load available years dynamically (fallback if unavailable)."""
@@ -464,6 +510,17 @@ class ExpenseTracker(QMainWindow):
         gen_btn.clicked.connect(self.generate_report)
         layout.addWidget(gen_btn)
 
+        # --- Export ---
+        export_layout = QHBoxLayout()
+        self.export_group_box = QComboBox()
+        self.export_group_box.addItems(["Every expense", "category", "month", "day"])
+        export_btn = QPushButton("💾 Export")
+        export_btn.clicked.connect(self.export_report)
+        export_layout.addWidget(QLabel("Export:"))
+        export_layout.addWidget(self.export_group_box)
+        export_layout.addWidget(export_btn)
+        layout.addLayout(export_layout)
+
         # --- Report Summary ---
         self.report_result_label = QLabel("")
         self.report_result_label.setAlignment(Qt.AlignCenter)
@@ -505,6 +562,21 @@ class ExpenseTracker(QMainWindow):
         self.btn_reset_pies.clicked.connect(self.reset_pies)
         layout.addWidget(self.btn_reset_pies)
 
+        # --- Forecast ---
+        forecast_layout = QHBoxLayout()
+        self.forecast_period_box = QComboBox()
+        self.forecast_period_box.addItems(["month", "year"])
+        forecast_btn = QPushButton("🔮 Forecast")
+        forecast_btn.clicked.connect(self.show_forecast)
+        forecast_layout.addWidget(QLabel("Projected spend this"))
+        forecast_layout.addWidget(self.forecast_period_box)
+        forecast_layout.addWidget(forecast_btn)
+        layout.addLayout(forecast_layout)
+
+        self.forecast_table = QTableWidget(0, 4)
+        self.forecast_table.setHorizontalHeaderLabels(["Main", "Mid", "Spent", "Projected"])
+        layout.addWidget(self.forecast_table)
+
         widget.setLayout(layout)
 
         # Initialize pie charts
@@ -523,7 +595,11 @@ class ExpenseTracker(QMainWindow):
             sub = None
 
         # --- logic ---
-        total = reports.get_total_filtered(main, mid, sub, start, end)
+        # One grouped query gives the total and every pie for this filter
+        self.category_tree = reports.get_category_tree(
+            start, end, {"main": main or None, "mid": mid or None, "sub": sub}
+        )
+        total = self.category_tree["total"]
 
         filters = []
         if main:
@@ -536,37 +612,44 @@ class ExpenseTracker(QMainWindow):
         filter_text = " > ".join(filters) if filters else "All Categories"
         summary_text = f"💰 Total from {start} to {end} for {filter_text}: ${total:.2f}"
 
-        # --- Generate Pie Chart Data ---
-        from collections import defaultdict
+        self.show_category_tree()
+        self.report_result_label.setText(summary_text)
 
-        expenses = reports.expenses = reports.get_expenses_filtered(
-            main=main or None,
-            mid=mid or None,
-            sub=sub or None,
-            start=start or None,
-            end=end or None
+    def export_report(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export", "expenses.csv",
+            "CSV (*.csv);;CSV, gzip (*.csv.gz);;JSON Lines (*.jsonl);;JSON Lines, gzip (*.jsonl.gz)",
         )
+        if not path:
+            return
+        group_by = self.export_group_box.currentText()
+        spec = ExpenseQuery(
+            self.main_box.currentText() or None,
+            self.mid_box.currentText() or None,
+            self.sub_box.currentText() or None,
+            self.start_date.date().toString("yyyy-MM-dd"),
+            self.end_date.date().toString("yyyy-MM-dd"),
+            group_by=None if group_by == "Every expense" else group_by,
+        )
+        try:
+            count = exporter.export(spec, path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        QMessageBox.information(self, "Export", f"Exported {count:,} rows to {path}.")
 
-        main_totals = defaultdict(float)
-        mid_totals = defaultdict(float)
-        sub_totals = defaultdict(float)
-
-        for exp in expenses:
-            try:
-                value = float(exp[4])  # Convert safely
-            except (ValueError, TypeError):
-                value = 0.0
-
-            main_totals[exp[1]] += value
-            mid_totals[exp[2]] += value
-            sub_totals[exp[3]] += value
-
-        # --- Update Pie Charts ---
-        self.pie_main.plot_pie(main_totals)
-        self.pie_mid.plot_pie(mid_totals)
-        self.pie_sub.plot_pie(sub_totals)
-
-        self.report_result_label.setText(summary_text)
+    def show_forecast(self):
+        try:
+            forecast = reports.forecast_period(self.forecast_period_box.currentText())
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        rows = forecast["rows"]
+        self.forecast_table.setRowCount(len(rows) + 1)
+        for row, values in enumerate(rows + [("Total", "", forecast["spent"], forecast["projected"])]):
+            main, mid, spent, projected = values
+            for col, text in enumerate([main, mid, f"{spent:.2f}", f"{projected:.2f}"]):
+                self.forecast_table.setItem(row, col, QTableWidgetItem(text))
 
     def update_mid_box(self, main):
         self.mid_box.clear()
@@ -611,37 +694,34 @@ class ExpenseTracker(QMainWindow):
     def update_pie_charts(self):
         start = self.start_date.date().toString("yyyy-MM-dd")
         end = self.end_date.date().toString("yyyy-MM-dd")
+        self.category_tree = reports.get_category_tree(start, end)
+        self.show_category_tree()
 
-        expenses = reports.get_expenses_by_date_range(start, end)
-        if not expenses:
+        # Draw labels
+        #self.label_main_total.setText(f"Total: ${sum(main_totals.values()):.2f}")
+        #self.label_daily_total.setText(f"Total: ${sum(daily_mid_totals.values()):.2f}")
+        #self.label_month_total.setText(f"Total: ${sum(month_mid_totals.values()):.2f}")
+
+    def show_category_tree(self):
+        if not self.category_tree["children"]:
             self.pie_main.draw_empty()
             self.pie_daily.draw_empty()
             self.pie_month.draw_empty()
             return
 
-        from collections import defaultdict
-        main_totals = defaultdict(float)
-        daily_mid_totals = defaultdict(float)
-        month_mid_totals = defaultdict(float)
-
-        for exp in expenses:
-            main, mid, value = exp[1], exp[2], float(exp[5])
-            main_totals[main] += value
-
-            if main == "Daily Expenses":
-                daily_mid_totals[mid] += value
-            elif main == "Month Expenses":
-                month_mid_totals[mid] += value
-
         # Draw the pies
-        self.pie_main.plot_pie(main_totals)
-        self.pie_daily.plot_pie(daily_mid_totals)
-        self.pie_month.plot_pie(month_mid_totals)
-
-        # Draw labels
-        #self.label_main_total.setText(f"Total: ${sum(main_totals.values()):.2f}")
-        #self.label_daily_total.setText(f"Total: ${sum(daily_mid_totals.values()):.2f}")
-        #self.label_month_total.setText(f"Total: ${sum(month_mid_totals.values()):.2f}")
+        self.pie_main.plot_pie(self.tree_totals())
+        self.pie_daily.plot_pie(self.tree_totals("Daily Expenses"))
+        self.pie_month.plot_pie(self.tree_totals("Month Expenses"))
+
+    def tree_totals(self, *path):
+        """Totals of the children under a category path in the loaded tree."""
+        node = self.category_tree
+        for part in path:
+            node = node["children"].get(part)
+            if node is None:
+                return {}
+        return {name: child["total"] for name, child in node["children"].items()}
 
     def handle_pie_click(self, chart_title, category_clicked):
         print(f"[DEBUG] Clicked on {category_clicked} in {chart_title}")
@@ -657,19 +737,9 @@ class ExpenseTracker(QMainWindow):
             self.current_month_mid = category_clicked
 
     def get_sub_totals(self, main_category, mid_category):
-        from collections import defaultdict
-        subs = defaultdict(float)
-
-        expenses = reports.get_expenses_by_date_range(
-            self.start_date.date().toString("yyyy-MM-dd"),
-            self.end_date.date().toString("yyyy-MM-dd")
-        )
-
-        for exp in expenses:
-            if exp[1] == main_category and exp[2] == mid_category:
-                subs[exp[3]] += float(exp[5])
-
-        return dict(subs)
+        # A mid category without subcategories is drawn as a single slice
+        subs = self.tree_totals(main_category, mid_category)
+        return subs or {mid_category: self.tree_totals(main_category).get(mid_category, 0)}
 
     def reset_pies(self):
         if hasattr(self, "pie_daily"):
@@ -681,17 +751,7 @@ class ExpenseTracker(QMainWindow):
             self.pie_month.animate_transition(month_data)
 
     def get_mid_totals(self, main_category):
-        from collections import defaultdict
-        mids = defaultdict(float)
-        expenses = reports.get_expenses_by_date_range(
-            self.start_date.date().toString("yyyy-MM-dd"),
-            self.end_date.date().toString("yyyy-MM-dd")
-        )
-
-        for exp in expenses:
-            if exp[1] == main_category:
-                mids[exp[2]] += float(exp[5])
-        return dict(mids)
+        return self.tree_totals(main_category)
 
 
 if __name__ == "__main__":
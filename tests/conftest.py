@@ -1,5 +1,7 @@
+from datetime import datetime, timedelta
+
 import pytest
-from backend import database
+from backend import database, storage
 
 
 @pytest.fixture(autouse=True)
@@ -9,3 +11,25 @@ def reset_db(tmp_path, monkeypatch):
     monkeypatch.setattr(database, "DB_NAME", str(test_db))
     database.init_db()
     yield
+    database.close_all_connections()
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def storage_backend(request):
+    """Run a test against each storage engine."""
+    backend = storage.set_backend(request.param)
+    yield backend
+    storage.set_backend(None)
+
+
+@pytest.fixture
+def sample_rows():
+    """Four expenses over two categories, today and last month, as crud rows."""
+    today = datetime.today().date()
+    last_month = today.replace(day=1) - timedelta(days=1)
+    return [
+        ("Daily Expenses", "Groceries", "Food", last_month.isoformat(), 12, ""),
+        ("Daily Expenses", "Groceries", "Food", today.isoformat(), 3.5, ""),
+        ("Daily Expenses", "Going Out", "Restaurant", today.isoformat(), 40, ""),
+        ("Month Expenses", "Rent", None, today.replace(day=1).isoformat(), 700, ""),
+    ]
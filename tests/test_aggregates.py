@@ -0,0 +1,49 @@
+import pytest
+from datetime import date, timedelta
+from backend import aggregates, crud, database, reports
+
+TODAY = date.today()
+FIRST = TODAY.replace(day=1)
+LAST_MONTH = FIRST - timedelta(days=1)
+
+
+def _snapshot():
+    conn = database.get_connection()
+    return conn.execute("SELECT * FROM monthly_category_totals ORDER BY month, category_id").fetchall()
+
+
+def test_triggers_match_rebuild():
+    ids, _ = crud.add_expenses_bulk([
+        ("Daily Expenses", "Groceries", "Food", TODAY.isoformat(), 10, ""),
+        ("Daily Expenses", "Groceries", "Food", LAST_MONTH.isoformat(), 5, ""),
+        ("Month Expenses", "Rent", None, FIRST.isoformat(), 700, ""),
+    ])
+    crud.update_expense(ids[1], "Daily Expenses", "Groceries", "Others", TODAY.isoformat(), 6)
+    crud.delete_expense(ids[2])
+
+    maintained = _snapshot()
+    aggregates.rebuild_monthly_totals()
+    assert maintained == _snapshot()
+    assert reports.get_monthly_summary() == [(TODAY.strftime("%Y-%m"), 16.0)]
+
+
+def test_partial_month_ranges_combine_aggregate_and_rows():
+    crud.add_expenses_bulk([
+        ("Daily Expenses", "Groceries", "Food", LAST_MONTH.isoformat(), 1, ""),
+        ("Daily Expenses", "Groceries", "Food", LAST_MONTH.replace(day=1).isoformat(), 2, ""),
+        ("Daily Expenses", "Groceries", "Food", TODAY.isoformat(), 4, ""),
+    ])
+    start = LAST_MONTH.replace(day=2).isoformat()
+    assert reports.get_total_filtered("Daily Expenses", start=start, end=TODAY.isoformat()) == 5.0
+    assert reports.get_total_by_date_range(LAST_MONTH.replace(day=1).isoformat(), TODAY.isoformat()) == 7.0
+
+
+@pytest.mark.parametrize("start,end,expected", [
+    ("2024-01-01", "2024-03-31", (("2024-01", "2024-03"), [])),
+    ("2024-01-15", "2024-03-10", (("2024-02", "2024-02"), [("2024-01-15", "2024-01-31"), ("2024-03-01", "2024-03-10")])),
+    ("2024-02-03", "2024-02-20", (None, [("2024-02-03", "2024-02-20")])),
+    (None, "2024-02-29", ((None, "2024-02"), [])),
+    ("2024/01/01", None, None),
+])
+def test_split_by_month(start, end, expected):
+    assert aggregates.split_by_month(start, end) == expected
@@ -0,0 +1,79 @@
+import asyncio
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+from backend import aio, crud
+from backend.database import get_connection, transaction
+
+TODAY_STR = datetime.today().date().strftime("%Y-%m-%d")
+
+# Counts to a billion; only an interrupt stops it in reasonable time
+SLOW_QUERY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000000) SELECT COUNT(*) FROM n"
+
+
+@pytest.fixture(autouse=True)
+def stop_workers():
+    yield
+    aio.shutdown()
+
+
+def _slow_read():
+    return get_connection().execute(SLOW_QUERY).fetchone()
+
+
+def test_overlapping_reads_and_writes():
+    async def scenario():
+        ids = await asyncio.gather(*(
+            aio.add_expense("Daily Expenses", "Groceries", "Food", TODAY_STR, v) for v in (1, 2, 3)
+        ))
+        totals = await asyncio.gather(
+            aio.get_total_by_category("Daily Expenses"),
+            aio.get_totals_grouped("main"),
+            aio.count_expenses(),
+        )
+        return ids, totals
+
+    ids, (total, grouped, count) = asyncio.run(scenario())
+    assert sorted(ids) == [1, 2, 3]
+    assert total == 6.0
+    assert grouped == [("Daily Expenses", 6.0)]
+    assert count == 3
+
+
+def test_reader_threads_cannot_write():
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        asyncio.run(aio.read(crud.add_expense, "Daily Expenses", "Groceries", "Food", TODAY_STR, 1))
+    assert crud.get_expenses() == []
+
+
+def test_timeout_interrupts_running_query():
+    async def scenario():
+        started = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            await aio.read(_slow_read, timeout=0.2)
+        elapsed = time.perf_counter() - started
+        # The interrupted worker is free again for the next call
+        return elapsed, await aio.count_expenses(timeout=5)
+
+    elapsed, count = asyncio.run(scenario())
+    assert elapsed < 5
+    assert count == 0
+
+
+def test_cancelled_write_rolls_back():
+    def slow_insert():
+        with transaction() as conn:
+            conn.execute("INSERT INTO expenses (category_id, date, value_cents) VALUES (1, ?, 100)", (TODAY_STR,))
+            conn.execute(SLOW_QUERY).fetchone()
+
+    async def scenario():
+        task = asyncio.create_task(aio.write(slow_insert))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await aio.count_expenses(timeout=5)
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,59 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from backend import anomalies, columnar, crud, database
+
+TODAY = datetime.today().date()
+
+
+def day(offset):
+    return (TODAY - timedelta(days=offset)).isoformat()
+
+
+@pytest.fixture
+def snapshot():
+    # Ten ordinary grocery runs a week apart, one huge one and a repeated restaurant bill
+    rows = [("Daily Expenses", "Groceries", "Food", day(7 * i), 40 + i, "") for i in range(10)]
+    rows += [
+        ("Daily Expenses", "Groceries", "Food", day(3), 950, ""),
+        ("Daily Expenses", "Going Out", "Restaurant", day(20), 62.5, ""),
+        ("Daily Expenses", "Going Out", "Restaurant", day(18), 62.5, ""),
+        ("Daily Expenses", "Going Out", "Restaurant", day(10), 62.5, ""),
+    ]
+    crud.add_expenses_bulk(rows)
+    snap = columnar.Snapshot()
+    yield snap
+    snap.close()
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_finds_outliers_and_duplicates(snapshot):
+    flags = anomalies.find_anomalies(snapshot)
+    assert [flag_id for flag_id, _ in flags] == [11, 13]
+    assert flags[0][1].startswith("outlier: 950.00 vs typical 4")
+    assert flags[1][1] == "possible duplicate of #12"
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_only_reports_given_ids(snapshot):
+    ids, _ = crud.add_expenses_bulk([
+        ("Daily Expenses", "Going Out", "Restaurant", day(9), 62.5, ""),
+        ("Daily Expenses", "Groceries", "Food", day(1), 44, ""),
+    ])
+    assert anomalies.find_anomalies(snapshot, ids=ids) == [(ids[0], "possible duplicate of #14")]
+    assert anomalies.find_anomalies(snapshot, ids=[12]) == [(12, "possible duplicate of #13")]
+    assert anomalies.find_duplicates(snapshot, duplicate_days=0) == []
+
+
+def test_outliers_in_a_constant_category(storage_backend, snapshot):
+    rows = [("Month Expenses", "Rent", None, day(30 * i), 700, "") for i in range(9)]
+    rows.append(("Month Expenses", "Rent", None, day(5), 7000, ""))
+    ids, _ = crud.add_expenses_bulk(rows)
+    if storage_backend.name == "sqlite":
+        # A legacy row of zero has no log and is left out
+        other = sqlite3.connect(database.DB_NAME)
+        other.execute("INSERT INTO expenses (category_id, date, value_cents) SELECT category_id, date, 0 FROM expenses WHERE id = ?", (ids[0],))
+        other.commit()
+        other.close()
+    assert anomalies.find_outliers(snapshot, ids=ids) == [(ids[9], "outlier: 7000.00 vs typical 700.00 for this category")]
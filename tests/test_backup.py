@@ -0,0 +1,90 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from backend import backup, budgets, crud, rangeindex, reports
+
+TODAY = datetime.today().date()
+
+
+def day(offset):
+    return (TODAY - timedelta(days=offset)).isoformat()
+
+
+def add(value, offset=1):
+    return crud.add_expense("Daily Expenses", "Groceries", "Food", day(offset), value, "")
+
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_backup_verify_and_rotate(tmp_path):
+    crud.add_expenses_bulk([("Daily Expenses", "Groceries", "Food", day(i % 30), i + 1, "") for i in range(500)])
+    directory = tmp_path / "backups"
+    pages = []
+    result = backup.backup(directory=str(directory), pages=2, progress=lambda done, total: pages.append(done))
+    assert count_rows(result["path"]) == 500
+    assert backup.verify(result["path"]) == []
+    assert result["bytes"] == result["pages"] * 4096 and result["restarts"] == 0
+    assert len(pages) > 1 and pages[-1] == result["pages"]
+    assert not os.path.exists(result["path"] + "-wal")
+
+    for _ in range(3):
+        last = backup.backup(directory=str(directory), keep=2)
+    assert backup.list_backups(str(directory)) == sorted(backup.list_backups(str(directory)))
+    assert len(backup.list_backups(str(directory))) == 2
+    assert backup.list_backups(str(directory))[-1] == last["path"]
+
+
+def test_restarted_copy_finishes_in_one_step(tmp_path):
+    add(1)
+
+    def write_between_steps(done, total):
+        add(2)
+
+    result = backup.backup(str(tmp_path / "copy.db"), pages=1, progress=write_between_steps, max_restarts=2)
+    assert result["restarts"] == 3
+    assert count_rows(result["path"]) == crud.count_expenses()
+
+    # A copy that fails part way leaves no partial file behind
+    def fail(done, total):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        backup.backup(str(tmp_path / "stopped.db"), pages=1, progress=fail)
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("stopped.db")]
+
+
+def test_restore(tmp_path):
+    add(10)
+    saved = backup.backup(str(tmp_path / "one.db"))
+    add(20)
+    assert reports.get_total_filtered() == 30
+    budgets.set_budget("Daily Expenses", period="year", limit=15)
+    index = rangeindex.RangeIndex()
+
+    try:
+        safety = backup.restore(saved["path"], directory=str(tmp_path / "before"))
+        assert reports.get_total_filtered() == 10
+        assert count_rows(safety["path"]) == 2
+        assert budgets.list_budgets() == []
+        assert index.stale
+        assert index.range_sum() == (1000, 1)
+        assert add(5) == 2
+    finally:
+        index.close()
+
+
+def test_refuses_damaged_backup(tmp_path):
+    path = tmp_path / "broken.db"
+    path.write_bytes(b"SQLite format 3\x00" + bytes(200))
+    assert backup.verify(str(path))
+    with pytest.raises(RuntimeError, match="integrity"):
+        backup.restore(str(path), directory=str(tmp_path / "before"))
+    assert not (tmp_path / "before").exists()
@@ -0,0 +1,93 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from backend import budgets, crud, database
+
+TODAY = datetime.today().date()
+LAST_MONTH = TODAY.replace(day=1) - timedelta(days=1)
+
+pytestmark = pytest.mark.usefixtures("storage_backend")
+
+
+@pytest.fixture
+def groceries_budget():
+    crud.add_expenses_bulk([
+        ("Daily Expenses", "Groceries", "Food", LAST_MONTH.isoformat(), 300, ""),
+        ("Daily Expenses", "Groceries", "Food", TODAY.isoformat(), 80, ""),
+        ("Daily Expenses", "Going Out", "Restaurant", TODAY.isoformat(), 40, ""),
+    ])
+    return budgets.set_budget("Daily Expenses", "Groceries", period="month", limit=100)
+
+
+def test_period_bounds():
+    assert budgets.period_bounds("week", "2024-02-29") == ("2024-02-26", "2024-03-03")
+    assert budgets.period_bounds("month", "2024-02-10") == ("2024-02-01", "2024-02-29")
+    assert budgets.period_bounds("year", "2024-02-10") == ("2024-01-01", "2024-12-31")
+    with pytest.raises(ValueError):
+        budgets.period_bounds("decade")
+
+
+def test_over_budget_follows_inserts(groceries_budget):
+    assert budgets.over_budget("Daily Expenses", "Groceries", "Food") == []
+
+    extra = crud.add_expense("Daily Expenses", "Groceries", "Others", TODAY.isoformat(), 25)
+    assert budgets.over_budget("Daily Expenses", "Groceries", "Food") == [
+        ("Daily Expenses", "Groceries", None, "month", 100.0, 105.0)
+    ]
+    assert budgets.over_budget("Daily Expenses", "Going Out", "Restaurant") == []
+    # A back-dated expense is outside the current period
+    assert budgets.over_budget("Daily Expenses", "Groceries", "Food", LAST_MONTH.isoformat()) == []
+
+    crud.delete_expense(extra)
+    assert budgets.over_budget("Daily Expenses", "Groceries", "Food") == []
+
+
+def test_budget_status_and_bulk_writes(groceries_budget, monkeypatch):
+    budgets.set_budget("Daily Expenses", period="year", limit=1000)
+    same_id = budgets.set_budget("Daily Expenses", "Groceries", period="month", limit=90)
+    assert same_id == groceries_budget
+
+    monkeypatch.setattr(budgets, "BULK_ROWS", 1)
+    crud.add_expenses_bulk([("Daily Expenses", "Going Out", "Restaurant", TODAY.isoformat(), 5, "")] * 2)
+
+    status = budgets.budget_status()
+    yearly = 420.0 + 10 if LAST_MONTH.year == TODAY.year else 130.0
+    assert [row[1:] for row in status] == [
+        ("Daily Expenses", None, None, "year", 1000.0, yearly, 1000.0 - yearly),
+        ("Daily Expenses", "Groceries", None, "month", 90.0, 80.0, 10.0),
+    ]
+    assert budgets.over_budget("Daily Expenses", "Groceries", "Food") == []
+    last_month = budgets.budget_status(LAST_MONTH)
+    assert last_month[1][1:] == ("Daily Expenses", "Groceries", None, "month", 90.0, 300.0, -210.0)
+
+    budgets.delete_budget(groceries_budget)
+    with pytest.raises(LookupError):
+        budgets.delete_budget(groceries_budget)
+    with pytest.raises(ValueError):
+        budgets.set_budget("Nope", period="month", limit=5)
+
+
+def test_recompute_after_outside_commit(groceries_budget, storage_backend):
+    if storage_backend.name != "sqlite":
+        pytest.skip("only the SQLite file can be written from outside")
+    assert budgets.over_budget("Daily Expenses", "Groceries", "Food") == []
+    other = sqlite3.connect(database.DB_NAME)
+    other.execute("UPDATE expenses SET value_cents = 20000 WHERE id = 2")
+    other.commit()
+    other.close()
+    assert budgets.over_budget("Daily Expenses", "Groceries", "Food")[0][-1] == 200.0
+
+
+def test_recompute_reads_every_period_in_one_query(groceries_budget, storage_backend, monkeypatch):
+    budgets.set_budget("Daily Expenses", period="year", limit=1000)
+    budgets.set_budget("Daily Expenses", "Going Out", period="week", limit=10)
+    specs = []
+    select = storage_backend.select
+    monkeypatch.setattr(storage_backend, "select", lambda spec: specs.append(spec) or select(spec))
+
+    budgets.recompute()
+    assert len(specs) == 1
+    spent = {row[4]: row[6] for row in budgets.budget_status()}
+    assert spent["week"] == 40.0 and spent["month"] == 80.0
+    assert spent["year"] == (420.0 if LAST_MONTH.year == TODAY.year else 120.0)
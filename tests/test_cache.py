@@ -0,0 +1,131 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+from backend import cache, crud, database, reports
+
+TODAY_STR = datetime.today().date().strftime("%Y-%m-%d")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    cache.clear()
+    yield
+    cache.configure(maxsize=cache.DEFAULT_MAXSIZE, maxbytes=cache.DEFAULT_MAXBYTES, ttl=cache.DEFAULT_TTL)
+
+
+def _add(value):
+    return crud.add_expense("Daily Expenses", "Groceries", "Food", TODAY_STR, value)
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_repeat_calls_hit_until_a_write():
+    _add(10)
+    assert reports.get_totals_grouped("main") == [("Daily Expenses", 10.0)]
+    assert reports.get_totals_grouped(level="main") == [("Daily Expenses", 10.0)]
+    info = cache.cache_info()
+    assert (info["hits"], info["misses"]) == (1, 1)
+
+    _add(5)
+    assert reports.get_totals_grouped("main") == [("Daily Expenses", 15.0)]
+    assert cache.cache_info()["misses"] == 2
+
+
+def test_commits_from_another_connection_invalidate():
+    _add(10)
+    assert reports.get_total_by_date_range(TODAY_STR, TODAY_STR) == 10.0
+
+    other = sqlite3.connect(database.DB_NAME)
+    other.execute(
+        "INSERT INTO expenses (category_id, date, value_cents) SELECT category_id, date, 250 FROM expenses"
+    )
+    other.commit()
+    other.close()
+
+    assert reports.get_total_by_date_range(TODAY_STR, TODAY_STR) == 12.5
+
+
+def test_entries_expire_and_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "_clock", lambda: now[0])
+    cache.configure(maxsize=2, ttl=60)
+    _add(10)
+
+    reports.get_totals_grouped("main")
+    now[0] += 61
+    reports.get_totals_grouped("main")
+    assert cache.cache_info()["hits"] == 0
+
+    reports.get_totals_grouped("mid")
+    reports.get_totals_grouped("sub")
+    info = cache.cache_info()
+    assert (info["size"], info["evictions"]) == (2, 1)
+
+
+def test_results_are_copies():
+    _add(10)
+    tree = reports.get_category_tree()
+    tree["children"].clear()
+    assert "Daily Expenses" in reports.get_category_tree()["children"]
+
+    # Immutable results are shared; lists of immutable rows only need a new list
+    rows = reports.get_totals_grouped("main")
+    again = reports.get_totals_grouped("main")
+    assert again == rows and again is not rows and again[0] is rows[0]
+    assert reports.get_total_by_category("Daily Expenses") is reports.get_total_by_category("Daily Expenses")
+
+
+def test_keys_include_the_module():
+    calls = []
+
+    def make(module):
+        def report():
+            calls.append(module)
+            return module
+        report.__module__ = module
+        return cache.cached(report)
+
+    first, second = make("one"), make("two")
+    assert (first(), second(), first()) == ("one", "two", "one")
+    assert calls == ["one", "two"]
+
+
+def test_only_outside_commits_count_as_outside():
+    _add(10)
+    outside = cache.outside_generation()
+
+    # A connection's first look, and commits crud reported from another thread, are ours
+    def write():
+        database.get_connection()
+        cache.outside_generation()
+        _add(5)
+        database.close_connection()
+
+    worker = threading.Thread(target=write)
+    worker.start()
+    worker.join()
+    assert cache.outside_generation() == outside
+    assert reports.get_total_by_date_range(TODAY_STR, TODAY_STR) == 15.0
+
+    other = sqlite3.connect(database.DB_NAME)
+    other.execute("DELETE FROM expenses")
+    other.commit()
+    other.close()
+    assert cache.outside_generation() == outside + 1
+
+
+def test_entries_are_bounded_by_bytes():
+    _add(10)
+    reports.get_totals_grouped("main")
+    reports.get_totals_grouped("mid")
+    total = cache.cache_info()["bytes"]
+
+    cache.configure(maxbytes=total - 1)
+    info = cache.cache_info()
+    assert (info["size"], info["evictions"]) == (1, 1) and 0 < info["bytes"] < total
+
+    # A result larger than the whole budget isn't kept at all
+    cache.configure(maxbytes=1)
+    reports.get_totals_grouped("sub")
+    assert cache.cache_info()["size"] == 0
@@ -0,0 +1,83 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from backend import columnar, crud, database, reports
+from backend.query import ExpenseQuery
+from backend.storage import get_backend
+
+TODAY = datetime.today().date()
+LAST_MONTH = TODAY.replace(day=1) - timedelta(days=1)
+
+SPECS = [
+    ExpenseQuery(totals=True),
+    ExpenseQuery(main="Daily Expenses", start=LAST_MONTH.replace(day=2).isoformat(), totals=True),
+    ExpenseQuery(group_by="category"),
+    ExpenseQuery(group_by="month", descending=True),
+    ExpenseQuery(group_by="day", min_value=5),
+    ExpenseQuery(group_by="category", order_by="total", descending=True, limit=2),
+]
+
+
+@pytest.fixture
+def snapshot(sample_rows):
+    crud.add_expenses_bulk(sample_rows)
+    snap = columnar.Snapshot()
+    yield snap
+    snap.close()
+    reports.use_snapshot(None)
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_snapshot_answers_like_the_backend(snapshot):
+    for spec in SPECS:
+        assert list(snapshot.select(spec)) == list(get_backend().select(spec)), spec
+    assert snapshot.range_sum(TODAY.isoformat(), TODAY.isoformat()) == (4350, 2)
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_snapshot_follows_writes(snapshot):
+    ids, _ = crud.add_expenses_bulk([("Daily Expenses", "Groceries", "Others", TODAY.isoformat(), 1, "")])
+    crud.update_expense(1, "Daily Expenses", "Groceries", "Food", LAST_MONTH.isoformat(), 20)
+    crud.delete_expense(3)
+    snapshot.refresh()
+    assert list(snapshot.ids) == [1, 2, 4, ids[0]]
+    assert list(snapshot.cents) == [2000, 350, 70000, 100]
+
+    reports.use_snapshot(snapshot)
+    assert reports.get_totals_grouped("mid") == [
+        ("Daily Expenses", "Groceries", 24.5), ("Month Expenses", "Rent", 700.0)
+    ]
+
+
+def test_snapshot_reloads_after_outside_commit(snapshot):
+    other = sqlite3.connect(database.DB_NAME)
+    other.execute("DELETE FROM expenses WHERE id = 4")
+    other.commit()
+    other.close()
+    assert snapshot.range_sum() == (5550, 3)
+
+
+def test_snapshot_reloads_after_outside_date_move(snapshot):
+    # Same count and total, so only the outside commit itself gives it away
+    other = sqlite3.connect(database.DB_NAME)
+    other.execute("UPDATE expenses SET date = ? WHERE id = 1", (TODAY.isoformat(),))
+    other.commit()
+    other.close()
+    assert snapshot.range_sum(TODAY.isoformat(), TODAY.isoformat()) == (5550, 3)
+    assert snapshot.rebuilds == 2
+
+
+def test_snapshot_reloads_instead_of_replaying_a_long_backlog(snapshot, monkeypatch):
+    monkeypatch.setattr(columnar, "PENDING_LIMIT", 2)
+    crud.add_expenses_bulk([("Daily Expenses", "Groceries", "Food", TODAY.isoformat(), 1, "")] * 3)
+    assert snapshot.stale and not snapshot._pending
+    assert snapshot.range_sum() == (75850, 7)
+    assert snapshot.rebuilds == 2
+
+
+def test_snapshot_update_of_an_unknown_row_reloads(snapshot):
+    snapshot._on_write("update", [], [(0, 1, TODAY.isoformat(), 5, "")])  # would land on id 1
+    snapshot.refresh()
+    assert list(snapshot.ids) == [1, 2, 3, 4]
+    assert list(snapshot.cents) == [1200, 350, 4000, 70000]
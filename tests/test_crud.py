@@ -8,17 +8,20 @@ TODAY_STR = TODAY.strftime("%Y-%m-%d")
 LAST_MONTH = (TODAY.replace(day=1) - timedelta(days=1))
 LAST_MONTH_STR = LAST_MONTH.strftime("%Y-%m-%d")
 
+# Every test here runs once per storage engine
+pytestmark = pytest.mark.usefixtures("storage_backend")
+
 
 def test_add_and_get_expense():
-    exp_id = crud.add_expense("Daily Expenses", "Groceries", None , TODAY_STR, 12.5, "Test")
+    exp_id = crud.add_expense("Daily Expenses", "Groceries", "Food", TODAY_STR, 12.5, "Test")
     assert exp_id is not None
     expenses = crud.get_expenses()
     assert any(exp[0] == exp_id for exp in expenses)
 
 
 def test_update_expense():
-    exp_id = crud.add_expense("Daily Expenses", "Travel", "Transport", TODAY_STR, 5.0, "Bus")
-    crud.update_expense(exp_id,"Daily Expenses", "Travel", "Transport", TODAY_STR, 7.0, "Bus updated")
+    exp_id = crud.add_expense("Daily Expenses", "Transportation", "Train/Bus", TODAY_STR, 5.0, "Bus")
+    crud.update_expense(exp_id,"Daily Expenses", "Transportation", "Train/Bus", TODAY_STR, 7.0, "Bus updated")
     expenses = crud.get_expenses()
     updated = [exp for exp in expenses if exp[0] == exp_id][0]
     assert updated[5] == 7.0
@@ -32,12 +35,12 @@ def test_delete_expense():
 
 
 def test_reports_totals():
-    crud.add_expense("Daily Expenses", "Going Out", "Food", TODAY_STR, 10, "")
-    crud.add_expense("Daily Expenses", "Going Out", "Food", TODAY_STR, 20, "")
-    crud.add_expense("Daily Expenses", "Travel", "Transport", TODAY_STR, 5, "")
+    crud.add_expense("Daily Expenses", "Going Out", "Restaurant", TODAY_STR, 10, "")
+    crud.add_expense("Daily Expenses", "Going Out", "Restaurant", TODAY_STR, 20, "")
+    crud.add_expense("Daily Expenses", "Transportation", "Train/Bus", TODAY_STR, 5, "")
 
-    food_total = reports.get_total_by_category("Daily Expenses", "Going Out","Food")
-    transport_total = reports.get_total_by_category("Daily Expenses", "Travel", "Transport")
+    food_total = reports.get_total_by_category("Daily Expenses", "Going Out", "Restaurant")
+    transport_total = reports.get_total_by_category("Daily Expenses", "Transportation", "Train/Bus")
 
     assert food_total == 30
     assert transport_total == 5
@@ -48,9 +51,9 @@ def test_monthly_summary():
     this_month_date2 = TODAY_STR
     last_month_date = LAST_MONTH_STR
 
-    crud.add_expense("Daily Expenses", "Going Out", "Food", this_month_date1, 20, "")
-    crud.add_expense("Daily Expenses", "Going Out", "Food", this_month_date2, 30, "")
-    crud.add_expense("Daily Expenses", "Travel", "Transport", last_month_date, 15, "")
+    crud.add_expense("Daily Expenses", "Going Out", "Restaurant", this_month_date1, 20, "")
+    crud.add_expense("Daily Expenses", "Going Out", "Restaurant", this_month_date2, 30, "")
+    crud.add_expense("Daily Expenses", "Transportation", "Train/Bus", last_month_date, 15, "")
 
     summary = reports.get_monthly_summary()
 
@@ -64,7 +67,7 @@ def test_monthly_summary():
 
 def test_invalid_value():
     with pytest.raises(ValueError, match="(?i)(value|amount|positive)"):
-        crud.add_expense("Daily Expenses", "Going Out", "Food", TODAY_STR, -5, "Bad value")
+        crud.add_expense("Daily Expenses", "Going Out", "Restaurant", TODAY_STR, -5, "Bad value")
 
 def test_delete_nonexistent():
     with pytest.raises(LookupError, match="No expense"):
@@ -73,16 +76,144 @@ def test_delete_nonexistent():
 
 def test_update_nonexistent():
     with pytest.raises(LookupError, match="No expense"):
-        crud.update_expense(999999, "Daily Expenses", "Going Out", "Food", TODAY_STR, 10, "Test")
+        crud.update_expense(999999, "Daily Expenses", "Going Out", "Restaurant", TODAY_STR, 10, "Test")
 
 
 def test_future_date_invalid():
     future_date = (TODAY + timedelta(days=1)).strftime("%Y-%m-%d")
     with pytest.raises(ValueError, match="future"):
-        crud.add_expense("Daily Expenses", "Going Out", "Food", future_date, 10, "")
+        crud.add_expense("Daily Expenses", "Going Out", "Restaurant", future_date, 10, "")
 
 
 def test_too_old_date_invalid():
     old_date = (TODAY - timedelta(days=365*11)).strftime("%Y-%m-%d")
     with pytest.raises(ValueError, match="older than 10 years"):
-        crud.add_expense("Daily Expenses", "Going Out", "Food", old_date, 10, "")
+        crud.add_expense("Daily Expenses", "Going Out", "Restaurant", old_date, 10, "")
+
+
+def test_add_expenses_bulk_reports_row_errors():
+    rows = [
+        ("Daily Expenses", "Groceries", "Food", TODAY_STR, 10, "a"),
+        ("Daily Expenses", "Groceries", "Food", TODAY_STR, -1, "bad value"),
+        ("Month Expenses", "Rent", None, TODAY_STR, "700,50", "b"),
+        ("Nope", "Groceries", "Food", TODAY_STR, 1, "bad category"),
+    ]
+    ids, errors = crud.add_expenses_bulk(rows, chunk_size=2)
+    assert len(ids) == 2
+    assert [index for index, _ in errors] == [1, 3]
+    stored = {exp[0]: exp for exp in crud.get_expenses()}
+    assert stored[ids[0]][6] == "a"
+    assert stored[ids[1]][5] == 700.5
+
+
+def test_update_and_delete_expenses_bulk():
+    ids, _ = crud.add_expenses_bulk(
+        [("Daily Expenses", "Groceries", "Food", TODAY_STR, v, "") for v in (1, 2, 3)]
+    )
+    updated, errors = crud.update_expenses_bulk(
+        [(i, "Daily Expenses", "Groceries", "Others", TODAY_STR, 5, "x") for i in ids + [999999]]
+    )
+    assert updated == ids
+    assert errors[0][0] == 3 and isinstance(errors[0][1], LookupError)
+
+    deleted, errors = crud.delete_expenses_bulk([ids[0], 999999, ids[2]])
+    assert deleted == [ids[0], ids[2]]
+    assert [index for index, _ in errors] == [1]
+    assert [exp[0] for exp in crud.get_expenses()] == [ids[1]]
+
+
+def test_bulk_deletes_past_the_sqlite_variable_limit():
+    ids, _ = crud.add_expenses_bulk([("Daily Expenses", "Groceries", "Food", TODAY_STR, 1, "")] * 1500)
+    deleted, errors = crud.delete_expenses_bulk(ids + ids[:10], chunk_size=2000)
+    assert deleted == ids and errors == []
+    assert crud.count_expenses() == 0
+
+
+def test_totals_are_exact_in_cents():
+    crud.add_expenses_bulk(
+        [("Daily Expenses", "Groceries", "Food", TODAY_STR, v, "") for v in ["0.10", 0.2, "0,3"] * 1000]
+    )
+    # 0.1 + 0.2 + 0.3 accumulated as floats would drift away from 600.0
+    assert reports.get_total_by_category("Daily Expenses", "Groceries", "Food") == 600.0
+    assert reports.get_totals_grouped("main") == [("Daily Expenses", 600.0)]
+    assert crud.get_expenses()[0][5] == 0.1
+
+
+def test_iter_expenses_streams_in_chunks():
+    crud.add_expenses_bulk(
+        [("Daily Expenses", "Groceries", "Food", TODAY_STR, v, "") for v in range(1, 11)]
+    )
+    it = crud.iter_expenses(chunk_size=3)
+    first = next(it)
+    assert first[5] == 1.0
+    it.close()  # abandoning the stream must release its cursor
+    assert [exp[5] for exp in crud.iter_expenses(chunk_size=3)] == [float(v) for v in range(1, 11)]
+    assert len(list(reports.iter_expenses_by_date_range(TODAY_STR, TODAY_STR, chunk_size=4))) == 10
+    assert list(reports.iter_expenses_filtered("Month Expenses")) == []
+
+
+def test_keyset_pagination_walks_both_ways():
+    days = [(TODAY - timedelta(days=d)).strftime("%Y-%m-%d") for d in (3, 2, 2, 1, 0)]
+    ids, _ = crud.add_expenses_bulk([("Daily Expenses", "Groceries", "Food", d, 1, "") for d in days])
+
+    first = crud.get_expenses_page(page_size=2, with_total=True)
+    assert [r[0] for r in first["rows"]] == ids[:2]
+    assert first["prev"] is None and first["total"] == 5
+
+    second = crud.get_expenses_page(page_size=2, after=first["next"])
+    third = crud.get_expenses_page(page_size=2, after=second["next"])
+    assert [r[0] for r in second["rows"]] == ids[2:4]
+    assert [r[0] for r in third["rows"]] == ids[4:]
+    assert third["next"] is None
+
+    back = crud.get_expenses_page(page_size=2, before=third["prev"])
+    assert [r[0] for r in back["rows"]] == ids[2:4]
+
+    newest = crud.get_expenses_page(page_size=3, newest_first=True)
+    assert [r[0] for r in newest["rows"]] == [ids[4], ids[3], ids[2]]
+
+    with pytest.raises(ValueError, match="cursor"):
+        crud.get_expenses_page(after="not-a-cursor")
+
+
+def test_listeners_hear_writes_when_the_outer_transaction_commits():
+    heard = []
+    listener = lambda kind, old_rows, new_rows: heard.append((kind, [r[0] for r in old_rows + new_rows]))
+    crud.add_write_listener(listener)
+    try:
+        with crud.transaction():
+            first = crud.add_expense("Daily Expenses", "Groceries", "Food", TODAY_STR, 1)
+            crud.delete_expense(first)
+            assert heard == []
+        assert heard == [("insert", [first]), ("delete", [first])]
+
+        heard.clear()
+        with pytest.raises(RuntimeError):
+            with crud.transaction():
+                crud.add_expense("Daily Expenses", "Groceries", "Food", TODAY_STR, 2)
+                raise RuntimeError
+        assert heard == [] and crud.count_expenses() == 0
+
+        # Writes that change nothing are not announced
+        crud.add_expenses_bulk([("Daily Expenses", "Groceries", "Food", "not a date", 1, "")])
+        crud.delete_expenses_bulk([999999])
+        assert heard == []
+    finally:
+        crud.remove_write_listener(listener)
+
+
+def test_a_view_that_fails_to_apply_a_write_goes_stale():
+    class Broken(crud.DerivedView):
+        def _load(self):
+            self.total = crud.count_expenses()
+
+        def _apply(self, kind, old_rows, new_rows):
+            raise KeyError(kind)
+
+    view = Broken()
+    try:
+        crud.add_expense("Daily Expenses", "Groceries", "Food", TODAY_STR, 1)
+        assert view.stale
+        assert view.refresh() and view.total == 1
+    finally:
+        view.close()
@@ -0,0 +1,84 @@
+import pytest
+from backend import database
+
+
+def test_connection_is_reused():
+    assert database.get_connection() is database.get_connection()
+
+
+def test_connection_is_tuned():
+    conn = database.get_connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+
+def test_transaction_rolls_back_on_error():
+    with pytest.raises(RuntimeError):
+        with database.transaction() as conn:
+            conn.execute(
+                "INSERT INTO expenses (category_id, date, value_cents) VALUES (1, '2024-01-01', 100)"
+            )
+            raise RuntimeError("boom")
+    count = database.get_connection().execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+    assert count == 0
+
+
+def test_reconnects_after_close():
+    conn = database.get_connection()
+    conn.close()
+    assert database.get_connection() is not conn
+
+
+def test_migrates_legacy_string_schema(tmp_path, monkeypatch):
+    import sqlite3
+    from backend import crud, reports
+
+    legacy = tmp_path / "legacy.db"
+    conn = sqlite3.connect(legacy)
+    conn.execute("""
+        CREATE TABLE expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, main_category TEXT NOT NULL, mid_category TEXT,
+            sub_category TEXT, date TEXT NOT NULL, value REAL NOT NULL, notes TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO expenses (main_category, mid_category, sub_category, date, value, notes) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("Daily Expenses", "Groceries", "Food", "2024/01/05", 10.0, "a"),
+            ("Month Expenses", "Rent", None, "2024-02-01", 700.0, "b"),
+            ("Daily Expenses", "Travel", "Transport", "2024-02-03", 5.0, "legacy path"),
+            ("Daily Expenses", "Groceries", "Food", "2024-02-04", 1.0, "deleted"),
+            ("Daily Expenses", "Groceries", "Food", "2024-2-9", 2.0, "unpadded"),
+        ],
+    )
+    conn.execute("DELETE FROM expenses WHERE id = 4")
+    conn.commit()
+    conn.close()
+
+    database.close_all_connections()
+    monkeypatch.setattr(database, "DB_NAME", str(legacy))
+    database.init_db()
+
+    assert database.get_schema_version() == database.SCHEMA_VERSION
+    rows = crud.get_expenses()
+    assert [r[0] for r in rows] == [1, 2, 3, 5]
+    assert rows[0][1:5] == ("Daily Expenses", "Groceries", "Food", "2024-01-05")
+    assert rows[3][4] == "2024-02-09"
+    assert rows[2][2] == "Travel"
+    assert reports.get_total_by_category("Month Expenses", "Rent") == 700.0
+    # ids are never reused after the table rebuild
+    assert crud.add_expense("Daily Expenses", "Groceries", "Food", "2024-03-01", 1) == 6
+
+
+def test_money_parses_to_exact_cents():
+    from backend.money import to_cents
+    from backend.validators import validate_cents
+
+    assert to_cents("12,1") == 1210
+    assert to_cents(0.285) == 29
+    assert to_cents(7) == 700
+    assert validate_cents(" 3.50 ") == 350
+    with pytest.raises(ValueError, match="positive"):
+        validate_cents("0.001")
+    with pytest.raises(ValueError, match="number"):
+        validate_cents("abc")
@@ -0,0 +1,58 @@
+import csv
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from backend import crud, exporter
+from backend.query import ExpenseQuery
+
+TODAY = datetime.today().date()
+
+
+def day(offset):
+    return (TODAY - timedelta(days=offset)).isoformat()
+
+
+@pytest.fixture
+def expenses(storage_backend):
+    crud.add_expenses_bulk([
+        ("Daily Expenses", "Groceries", "Food", day(3), 12.5, "bakery, fresh"),
+        ("Daily Expenses", "Going Out", "Restaurant", day(2), 40, "dinner ü"),
+        ("Daily Expenses", "Groceries", "Food", day(1), 7.25, ""),
+    ])
+
+
+@pytest.mark.usefixtures("expenses")
+def test_exports_rows_as_csv(tmp_path):
+    path = tmp_path / "rows.csv"
+    assert exporter.export(ExpenseQuery(mid="Groceries", main="Daily Expenses"), path) == 2
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows == [
+        list(exporter.ROW_COLUMNS),
+        ["1", "Daily Expenses", "Groceries", "Food", day(3), "12.5", "bakery, fresh"],
+        ["3", "Daily Expenses", "Groceries", "Food", day(1), "7.25", ""],
+    ]
+    assert not (tmp_path / "rows.csv.part").exists()
+
+
+@pytest.mark.usefixtures("expenses")
+def test_exports_groups_as_gzipped_jsonl(tmp_path):
+    path = tmp_path / "totals.jsonl.gz"
+    assert exporter.export(ExpenseQuery(group_by="category", order_by="total", descending=True), path) == 2
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert records == [
+        {"main": "Daily Expenses", "mid": "Going Out", "sub": "Restaurant", "total": 40.0, "count": 1},
+        {"main": "Daily Expenses", "mid": "Groceries", "sub": "Food", "total": 19.75, "count": 2},
+    ]
+
+    exporter.export(ExpenseQuery(totals=True), tmp_path / "total", fmt="jsonl", compress=False)
+    assert json.loads((tmp_path / "total").read_text()) == {"total": 59.75, "count": 3}
+
+
+def test_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="format"):
+        exporter.export(ExpenseQuery(), tmp_path / "rows.xlsx")
+    assert not (tmp_path / "rows.xlsx").exists()
@@ -0,0 +1,132 @@
+import csv
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from backend import crud, database, importer
+
+TODAY = datetime.today().date()
+
+
+def day(offset):
+    return (TODAY - timedelta(days=offset)).isoformat()
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_maps_columns_and_reports_rejects(tmp_path):
+    path = write_csv(tmp_path / "statement.csv", ["Booking date", "Amount", "Text", "Kind"], [
+        [day(3), "12.50", "bakery", "groceries"],
+        [day(2), "abc", "broken amount", "groceries"],
+        [day(1), "40", "cinema", " GOING OUT "],
+        ["2001-01-01", "5", "too old", "groceries"],
+    ])
+    rejects = tmp_path / "rejects.csv"
+    rejects.write_text("left over from an earlier import\n")
+    result = importer.import_csv(
+        path,
+        mapping={"date": "Booking date", "value": "Amount", "notes": "Text", "mid": "Kind"},
+        defaults={"main": "daily expenses", "sub": "others"},
+        rejects=str(rejects),
+    )
+    assert (result["rows"], result["imported"], result["rejected"], result["batches"]) == (4, 2, 2, 1)
+    rows = sorted(r[1:] for r in crud.get_expenses())
+    assert rows == [
+        ("Daily Expenses", "Going Out", "Others", day(1), 40.0, "cinema"),
+        ("Daily Expenses", "Groceries", "Others", day(3), 12.5, "bakery"),
+    ]
+
+    with open(rejects, newline="") as f:
+        report = list(csv.reader(f))
+    assert report[0] == ["line", "error", "Booking date", "Amount", "Text", "Kind"]
+    assert [line for line, *_ in report[1:]] == ["3", "5"]
+    assert report[1][4] == "broken amount"
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_resumes_after_interruption(tmp_path):
+    path = write_csv(tmp_path / "export.csv", importer.FIELDS, [
+        ["Daily Expenses", "Groceries", "Food", day(i % 30), str(i + 1), f"row {i}"] for i in range(10)
+    ])
+
+    def interrupt(summary, fraction):
+        if summary["batches"] == 2:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        importer.import_csv(path, batch_size=3, progress=interrupt)
+    assert len(crud.get_expenses()) == 6
+
+    result = importer.import_csv(path, batch_size=3)
+    assert (result["resumed_from"], result["rows"], result["imported"], result["batches"]) == (6, 10, 10, 4)
+    notes = sorted(r[6] for r in crud.get_expenses())
+    assert notes == sorted(f"row {i}" for i in range(10))
+
+    # The finished import left no checkpoint behind: a second run imports again
+    assert importer.import_csv(path)["resumed_from"] == 0
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_refuses_to_resume_a_changed_file(tmp_path):
+    rows = [["Daily Expenses", "Groceries", "Food", day(1), "1", ""]] * 4
+    path = write_csv(tmp_path / "export.csv", importer.FIELDS, rows)
+
+    def interrupt(summary, fraction):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        importer.import_csv(path, batch_size=2, progress=interrupt)
+    write_csv(path, importer.FIELDS, rows + rows)
+    with pytest.raises(ValueError, match="changed"):
+        importer.import_csv(path)
+    assert importer.import_csv(path, resume=False)["imported"] == 8
+
+
+def test_missing_columns(tmp_path):
+    path = write_csv(tmp_path / "bad.csv", ["date", "value"], [[day(1), "3"]])
+    with pytest.raises(ValueError, match="main, mid"):
+        importer.import_csv(path)
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_parallel_import_keeps_file_order(tmp_path):
+    paths = [
+        write_csv(tmp_path / f"2024-{month:02}.csv", importer.FIELDS, [
+            ["daily expenses", "groceries", "food", day(month * 20 + i % 15), str(i + 1), f"{month}/{i}"]
+            for i in range(25)
+        ] + [["Daily Expenses", "Groceries", "Food", "not a date", "1", f"{month}/bad"]])
+        for month in (1, 2, 3)
+    ]
+    crud.count_expenses()
+    connections = len(database._open_connections)
+    results = importer.import_files(paths, workers=2, batch_size=10, chunk_size=4, rejects=True)
+    assert [(r["rows"], r["imported"], r["rejected"]) for r in results] == [(26, 25, 1)] * 3
+    assert len(database._open_connections) == connections   # the writer thread closed its own
+    assert [r["source"] for r in results] == [os.path.abspath(p) for p in paths]
+
+    rows = sorted(crud.get_expenses())
+    assert [r[6] for r in rows] == [f"{month}/{i}" for month in (1, 2, 3) for i in range(25)]
+    assert rows[0][1:4] == ("Daily Expenses", "Groceries", "Food")
+    with open(paths[1] + importer.REJECTS_SUFFIX, newline="") as f:
+        report = list(csv.reader(f))
+    assert report[1][:2] == ["27", "Invalid date format. Please use YYYY-MM-DD."]
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_single_worker_imports_in_process(tmp_path):
+    paths = [
+        write_csv(tmp_path / f"{n}.csv", importer.FIELDS, [["Daily Expenses", "Groceries", "Food", day(n + 1), "2", str(n)]])
+        for n in range(3)
+    ]
+    fractions = []
+    results = importer.import_files(paths, workers=1, progress=lambda summary, fraction: fractions.append(fraction))
+    assert [r["imported"] for r in results] == [1, 1, 1]
+    assert [r[6] for r in sorted(crud.get_expenses())] == ["0", "1", "2"]
+    assert fractions[-1] == 1.0 and fractions == sorted(fractions)
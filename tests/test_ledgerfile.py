@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from backend import anomalies, columnar, crud, ledgerfile
+from backend.storage import get_backend
+
+TODAY = datetime.today().date()
+
+
+def day(offset):
+    return (TODAY - timedelta(days=offset)).isoformat()
+
+
+@pytest.fixture
+def ledger_path(storage_backend, tmp_path):
+    rows = [("Daily Expenses", "Groceries", "Food", day(7 * i), 40 + i, f"run {i}" if i % 3 else "") for i in range(10)]
+    rows += [
+        ("Daily Expenses", "Groceries", "Food", day(3), 950, "big shop, ümlaut"),
+        ("Daily Expenses", "Going Out", "Restaurant", day(20), 62.5, ""),
+        ("Daily Expenses", "Going Out", "Restaurant", day(18), 62.5, "again"),
+        ("Month Expenses", "Rent", None, day(1), 700, None),
+    ]
+    crud.add_expenses_bulk(rows)
+    crud.delete_expense(2)
+    path = tmp_path / "ledger.bin"
+    assert ledgerfile.write(path) == 13
+    return path
+
+
+def test_round_trip(ledger_path):
+    ledger = ledgerfile.read(ledger_path)
+    assert list(ledger.rows()) == sorted(get_backend().query())
+    assert ledger.categories == get_backend().category_paths()
+    assert isinstance(ledger.cents, np.memmap) and not ledger.cents.flags.writeable
+    assert ledger.note(9) == "big shop, ümlaut"
+    assert ledger.note(12) is None and ledger.note(11) == "again" and ledger.note(0) == ""
+
+    snapshot = columnar.Snapshot()
+    try:
+        assert anomalies.find_anomalies(ledger) == anomalies.find_anomalies(snapshot)
+    finally:
+        snapshot.close()
+
+
+def test_empty_ledger(storage_backend, tmp_path):
+    path = tmp_path / "empty.bin"
+    assert ledgerfile.write(path) == 0
+    ledger = ledgerfile.read(path)
+    assert len(ledger) == 0 and list(ledger.rows()) == []
+
+
+def test_rejects_damaged_files(ledger_path, tmp_path):
+    data = bytearray(ledger_path.read_bytes())
+    data[ledgerfile.HEADER_SIZE] ^= 0xFF
+    ledger_path.write_bytes(data)
+    with pytest.raises(ValueError, match="checksum"):
+        ledgerfile.read(ledger_path)
+    assert len(ledgerfile.read(ledger_path, verify=False)) == 13
+
+    ledger_path.write_bytes(data[:-1])
+    with pytest.raises(ValueError, match="truncated"):
+        ledgerfile.read(ledger_path)
+
+    data[8] = ledgerfile.FORMAT_VERSION + 1
+    ledger_path.write_bytes(data)
+    with pytest.raises(ValueError, match="version"):
+        ledgerfile.read(ledger_path)
+
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"id,main\n")
+    with pytest.raises(ValueError, match="not a ledger file"):
+        ledgerfile.read(other)
+
+
+def test_written_in_batches(ledger_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(ledgerfile, "LOAD_CHUNK", 4)
+    path = tmp_path / "batched.bin"
+    assert ledgerfile.write(path) == 13
+    assert path.read_bytes() == ledger_path.read_bytes()
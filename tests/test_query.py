@@ -0,0 +1,64 @@
+import pytest
+from datetime import datetime, timedelta
+from backend import crud, reports
+from backend.query import ExpenseQuery, compile_query
+
+TODAY = datetime.today().date()
+LAST_MONTH = TODAY.replace(day=1) - timedelta(days=1)
+
+pytestmark = pytest.mark.usefixtures("storage_backend")
+
+
+@pytest.fixture
+def ledger():
+    ids, _ = crud.add_expenses_bulk([
+        ("Daily Expenses", "Groceries", "Food", LAST_MONTH.isoformat(), 12, "weekly shop"),
+        ("Daily Expenses", "Groceries", "Food", TODAY.isoformat(), 3.5, "bread"),
+        ("Daily Expenses", "Going Out", "Restaurant", TODAY.isoformat(), 40, "100% birthday_dinner"),
+        ("Month Expenses", "Rent", None, TODAY.replace(day=1).isoformat(), 700, ""),
+    ])
+    return ids
+
+
+def test_value_and_notes_filters(ledger):
+    spec = ExpenseQuery(min_value=10, max_value=100)
+    assert [row[0] for row in reports.run_query(spec)] == [ledger[0], ledger[2]]
+    # LIKE wildcards in the search text are matched literally
+    assert [row[0] for row in reports.run_query(ExpenseQuery(notes="0% BIRTHDAY_"))] == [ledger[2]]
+    assert list(reports.run_query(ExpenseQuery(notes="_x"))) == []
+
+
+def test_grouping_ordering_and_limit(ledger):
+    by_month = list(reports.run_query(ExpenseQuery(main="Daily Expenses", group_by="month")))
+    assert by_month == [(LAST_MONTH.strftime("%Y-%m"), 1200, 1), (TODAY.strftime("%Y-%m"), 4350, 2)]
+
+    top = list(reports.run_query(ExpenseQuery(group_by="category", order_by="total", descending=True, limit=1)))
+    assert [(count, cents) for _, cents, count in top] == [(1, 70000)]
+
+    cheapest = next(reports.run_query(ExpenseQuery(order_by="value", limit=1)))
+    assert cheapest[0] == ledger[1]
+
+    start = LAST_MONTH.replace(day=2).isoformat()
+    assert next(reports.run_query(ExpenseQuery(start=start, totals=True))) == (75550, 4)
+
+    by_month_and_category = list(reports.run_query(
+        ExpenseQuery(main="Daily Expenses", start=start, group_by=("month", "category"), order_by="total")
+    ))
+    assert [row[2:] for row in by_month_and_category] == [(350, 1), (1200, 1), (4000, 1)]
+    assert by_month_and_category[1][0] == LAST_MONTH.strftime("%Y-%m")
+
+
+def test_statements_are_cached_by_shape():
+    first_sql, first_params = compile_query(ExpenseQuery("Daily Expenses", start="2024-01-05", min_value=1))
+    second_sql, second_params = compile_query(ExpenseQuery("Daily Expenses", start="2025-03-09", min_value=2))
+    assert first_sql is second_sql
+    assert first_params != second_params
+
+
+def test_invalid_specs_are_rejected():
+    with pytest.raises(ValueError, match="grouping"):
+        ExpenseQuery(group_by="week")
+    with pytest.raises(ValueError, match="ordering"):
+        ExpenseQuery(group_by="month", order_by="date")
+    with pytest.raises(ValueError):
+        ExpenseQuery(group_by="month", totals=True)
@@ -0,0 +1,81 @@
+"""Every query in crud and reports should be answered through an index."""
+import pytest
+from datetime import datetime
+from backend import crud, database, reports
+
+TODAY_STR = datetime.today().date().strftime("%Y-%m-%d")
+YEAR = datetime.today().year
+MONTH = datetime.today().month
+
+SMALL_TABLES = ("c", "categories", "t", "monthly_category_totals")
+
+CALLS = [
+    ("get_expenses", lambda: crud.get_expenses()),
+    ("get_expenses year", lambda: crud.get_expenses(year=YEAR)),
+    ("get_expenses month", lambda: crud.get_expenses(year=YEAR, month=MONTH)),
+    ("get_available_years", crud.get_available_years),
+    ("expenses page", lambda: crud.get_expenses_page(page_size=2, with_total=True)),
+    ("expenses page after", lambda: crud.get_expenses_page(
+        year=YEAR, page_size=1, after=crud.get_expenses_page(page_size=1)["next"])),
+    ("expenses page newest first", lambda: crud.get_expenses_page(page_size=2, newest_first=True, with_total=True)),
+    ("update_expense", lambda: crud.update_expense(1, "Daily Expenses", "Groceries", "Food", TODAY_STR, 3)),
+    ("delete_expense", lambda: crud.delete_expense(2)),
+    ("list_all_categories", reports.list_all_categories),
+    ("totals main", lambda: reports.get_totals_grouped("main")),
+    ("totals mid", lambda: reports.get_totals_grouped("mid")),
+    ("totals sub", lambda: reports.get_totals_grouped("sub")),
+    ("total by main", lambda: reports.get_total_by_category("Daily Expenses")),
+    ("total by mid", lambda: reports.get_total_by_category("Daily Expenses", "Groceries")),
+    ("total by sub", lambda: reports.get_total_by_category("Daily Expenses", "Groceries", "Food")),
+    ("total by date range", lambda: reports.get_total_by_date_range("2020-01-01", TODAY_STR)),
+    ("monthly summary", reports.get_monthly_summary),
+    ("total filtered", lambda: reports.get_total_filtered("Daily Expenses", "Groceries", None, "2020-01-01", TODAY_STR)),
+    ("total filtered partial months", lambda: reports.get_total_filtered("Daily Expenses", start="2020-01-15", end="2020-03-10")),
+    ("total filtered dates", lambda: reports.get_total_filtered(start="2020-01-01", end=TODAY_STR)),
+    ("expenses filtered", lambda: reports.get_expenses_filtered("Daily Expenses", start="2020-01-01")),
+    ("expenses filtered dates", lambda: reports.get_expenses_filtered(start="2020-01-01", end=TODAY_STR)),
+    ("expenses by date range", lambda: reports.get_expenses_by_date_range("2020-01-01", TODAY_STR)),
+]
+
+
+def _plans_for(call):
+    """Run call() and return the EXPLAIN QUERY PLAN details of every statement it issued."""
+    conn = database.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+
+    plans = []
+    for sql in statements:
+        keyword = sql.lstrip().split(None, 1)[0].upper()
+        if keyword not in ("SELECT", "UPDATE", "DELETE"):
+            continue
+        details = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        plans.append((sql, details))
+    return plans
+
+
+@pytest.mark.parametrize("name,call", CALLS, ids=[c[0] for c in CALLS])
+def test_queries_use_indexes(name, call):
+    crud.add_expenses_bulk(
+        [("Daily Expenses", "Groceries", "Food", TODAY_STR, v, "") for v in (1, 2, 3)]
+    )
+    plans = _plans_for(call)
+    assert plans, f"{name} issued no queries"
+    for sql, details in plans:
+        for detail in details:
+            # SEARCH always goes through an index; a bare SCAN is only fine on the small
+            # categories and monthly aggregate tables (the latter scans its primary key).
+            # "SCAN (subquery-N)" reads a co-routine whose own steps are checked too.
+            if detail.startswith("SCAN") and "INDEX" not in detail and "(subquery-" not in detail:
+                assert detail.split()[1] in SMALL_TABLES, f"{sql}\n{details}"
+
+
+def test_schema_version_is_current():
+    assert database.get_schema_version() == database.SCHEMA_VERSION
+    indexes = {r[0] for r in database.get_connection().execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='expenses'")}
+    assert {"idx_expenses_date", "idx_expenses_category"} <= indexes
@@ -0,0 +1,85 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from backend import crud, database, rangeindex, reports
+from backend.query import ExpenseQuery
+from backend.storage import get_backend
+
+TODAY = datetime.today().date()
+LAST_MONTH = TODAY.replace(day=1) - timedelta(days=1)
+
+SPECS = [
+    ExpenseQuery(totals=True),
+    ExpenseQuery(start=TODAY.isoformat(), totals=True),
+    ExpenseQuery(end=LAST_MONTH.isoformat(), totals=True),
+    ExpenseQuery(main="Daily Expenses", start=LAST_MONTH.replace(day=2).isoformat(), totals=True),
+    ExpenseQuery(main="Daily Expenses", mid="Groceries", totals=True),
+    ExpenseQuery(start="1990-01-01", end="1990-12-31", totals=True),
+]
+
+
+@pytest.fixture
+def index(sample_rows):
+    crud.add_expenses_bulk(sample_rows)
+    idx = rangeindex.RangeIndex()
+    yield idx
+    idx.close()
+    reports.use_range_index(None)
+
+
+def test_fenwick_prefix_sums():
+    tree = rangeindex.Fenwick([3, 0, 5, 1, 2])
+    assert [tree.prefix(i) for i in range(6)] == [0, 3, 3, 8, 9, 11]
+    tree.add(1, 4)
+    assert tree.prefix(2) == 7
+    assert tree.values() == [3, 4, 5, 1, 2]
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_index_answers_like_the_backend(index):
+    for spec in SPECS:
+        assert list(index.select(spec)) == list(get_backend().select(spec)), spec
+    assert index.range_sum(TODAY.isoformat(), TODAY.isoformat()) == (4350, 2)
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_index_follows_writes(index):
+    old = (TODAY - timedelta(days=5000)).isoformat()
+    crud.add_expenses_bulk([("Daily Expenses", "Groceries", "Others", old, 1, "")])
+    crud.update_expense(1, "Daily Expenses", "Groceries", "Food", TODAY.isoformat(), 20)
+    crud.delete_expense(3)
+    for spec in SPECS + [ExpenseQuery(end=old, totals=True)]:
+        assert list(index.select(spec)) == list(get_backend().select(spec)), spec
+    assert index.rebuilds == 1
+
+    reports.use_range_index(index)
+    assert reports.get_total_by_date_range(TODAY.isoformat(), TODAY.isoformat()) == 23.5
+
+
+def test_index_falls_back_after_outside_commit(index):
+    reports.use_range_index(index)
+    other = sqlite3.connect(database.DB_NAME)
+    other.execute("DELETE FROM expenses WHERE id = 4")
+    other.commit()
+    other.close()
+
+    # The read that notices goes to SQL; the next one, with no commit in between, rebuilds
+    assert reports.get_total_by_date_range(None, None) == 55.5
+    assert index.stale_reads == 1
+    assert index.range_sum() == (5550, 3)
+    assert index.rebuilds == 2
+
+
+def test_index_notices_an_outside_date_move(index):
+    # Moving a row keeps the table's count and total, so only the commit itself tells
+    reports.use_range_index(index)
+    other = sqlite3.connect(database.DB_NAME)
+    other.execute("UPDATE expenses SET date = ? WHERE id = 1", (TODAY.isoformat(),))
+    other.commit()
+    other.close()
+
+    assert reports.get_total_by_date_range(TODAY.isoformat(), TODAY.isoformat()) == 55.5
+    assert index.stale_reads == 1
+    assert index.range_sum(TODAY.isoformat(), TODAY.isoformat()) == (5550, 3)
+    assert index.rebuilds == 2
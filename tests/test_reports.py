@@ -0,0 +1,125 @@
+import sqlite3
+import pytest
+from datetime import datetime
+from backend import crud, database, reports
+
+TODAY = datetime.today().date()
+TODAY_STR = TODAY.isoformat()
+
+pytestmark = pytest.mark.usefixtures("storage_backend")
+
+
+def test_category_tree_rolls_up_every_level():
+    crud.add_expenses_bulk([
+        ("Daily Expenses", "Groceries", "Food", TODAY_STR, 10, ""),
+        ("Daily Expenses", "Groceries", "Food", TODAY_STR, 2.5, ""),
+        ("Daily Expenses", "Groceries", "Others", TODAY_STR, 1, ""),
+        ("Daily Expenses", "Going Out", "Restaurant", TODAY_STR, 30, ""),
+        ("Month Expenses", "Rent", None, TODAY_STR, 700, ""),
+    ])
+    tree = reports.get_category_tree(TODAY_STR, TODAY_STR)
+    assert (tree["total"], tree["count"]) == (743.5, 5)
+
+    daily = tree["children"]["Daily Expenses"]
+    assert (daily["total"], daily["count"]) == (43.5, 4)
+    groceries = daily["children"]["Groceries"]
+    assert {name: node["total"] for name, node in groceries["children"].items()} == {"Food": 12.5, "Others": 1.0}
+    assert groceries["children"]["Food"]["count"] == 2
+    # Paths without a sub category end at the mid level
+    assert tree["children"]["Month Expenses"]["children"]["Rent"]["children"] == {}
+
+
+def test_category_tree_applies_filters():
+    crud.add_expenses_bulk([
+        ("Daily Expenses", "Groceries", "Food", TODAY_STR, 10, ""),
+        ("Daily Expenses", "Going Out", "Restaurant", TODAY_STR, 30, ""),
+        ("Month Expenses", "Rent", None, TODAY_STR, 700, ""),
+    ])
+    tree = reports.get_category_tree(filters={"main": "Daily Expenses", "min_value": 20})
+    assert list(tree["children"]) == ["Daily Expenses"]
+    assert list(tree["children"]["Daily Expenses"]["children"]) == ["Going Out"]
+    assert reports.get_category_tree("2000-01-01", "2000-12-31") == {"total": 0.0, "count": 0, "children": {}}
+
+
+def test_time_series_fills_gaps_and_rolls():
+    crud.add_expenses_bulk([
+        ("Daily Expenses", "Groceries", "Food", "2024-03-04", 10, ""),  # Monday
+        ("Daily Expenses", "Groceries", "Food", "2024-03-06", 5, ""),
+        ("Daily Expenses", "Groceries", "Food", "2024-03-20", 30, ""),
+        ("Month Expenses", "Rent", None, "2024-05-01", 700, ""),
+    ])
+    daily = reports.get_time_series("day", "2024-03-03", "2024-03-07")
+    assert [str(d) for d in daily["periods"]] == ["2024-03-03", "2024-03-04", "2024-03-05", "2024-03-06", "2024-03-07"]
+    assert list(daily["totals"]) == [0, 10, 0, 5, 0]
+    assert daily["rolling"] is None
+
+    weekly = reports.get_time_series("week", "2024-03-04", "2024-03-24", rolling=2)
+    assert [str(d) for d in weekly["periods"]] == ["2024-03-04", "2024-03-11", "2024-03-18"]
+    assert list(weekly["totals"]) == [15, 0, 30]
+    assert list(weekly["counts"]) == [2, 0, 1]
+    assert list(weekly["rolling"]) == [15, 7.5, 15]
+
+    monthly = reports.get_time_series("month", filters={"main": "Daily Expenses"})
+    assert [str(m) for m in monthly["periods"]] == ["2024-03"]
+    assert list(reports.get_time_series("month")["totals"]) == [45, 0, 700]
+
+
+def test_time_series_rejects_unknown_frequency():
+    with pytest.raises(ValueError, match="frequency"):
+        reports.get_time_series("hour")
+    assert len(reports.get_time_series("day", "2001-01-02", "2001-01-01")["periods"]) == 0
+
+
+@pytest.fixture
+def forecast_history(storage_backend):
+    rows = []
+    for month in ("2024-02", "2024-03", "2024-04"):
+        rows += [
+            ("Month Expenses", "Rent", None, f"{month}-28", 700, ""),
+            ("Daily Expenses", "Groceries", "Food", f"{month}-05", 10, ""),
+            ("Daily Expenses", "Groceries", "Food", f"{month}-20", 10, ""),
+        ]
+    rows += [
+        ("Daily Expenses", "Groceries", "Food", "2024-05-05", 30, ""),
+        ("Daily Expenses", "Going Out", "Restaurant", "2024-05-02", 20, ""),
+    ]
+    crud.add_expenses_bulk(rows)
+    yield
+    reports.use_forecast_model(None)
+
+
+@pytest.mark.usefixtures("forecast_history")
+def test_forecast_period_uses_past_curves():
+    forecast = reports.forecast_period("month", today="2024-05-10")
+    assert (forecast["period"], forecast["day"], forecast["days"]) == ("2024-05", 10, 31)
+    assert forecast["rows"] == [
+        # No history: straight-line pace. Groceries: half of a usual month is still to come.
+        ("Daily Expenses", "Going Out", 20.0, 62.0),
+        ("Daily Expenses", "Groceries", 30.0, 40.0),
+        # Rent always lands on the 28th
+        ("Month Expenses", "Rent", 0.0, 700.0),
+    ]
+
+    crud.add_expense("Daily Expenses", "Groceries", "Food", "2024-05-08", 10)
+    crud.update_expense(4, "Month Expenses", "Rent", None, "2024-03-10", 1400)  # March's rent, paid early
+    forecast = reports.forecast_period("month", {"main": "Month Expenses"}, level="main", today="2024-05-10")
+    assert forecast["rows"] == [("Month Expenses", 0.0, 466.67)]
+    groceries = reports.forecast_period("month", {"mid": "Groceries"}, today="2024-05-10")
+    assert groceries["rows"] == [("Daily Expenses", "Groceries", 40.0, 50.0)]
+
+    with pytest.raises(ValueError):
+        reports.forecast_period("month", {"notes": "x"})
+
+
+@pytest.mark.usefixtures("forecast_history")
+def test_forecast_follows_outside_commits(storage_backend):
+    if storage_backend.name != "sqlite":
+        pytest.skip("Only the SQLite ledger can be written from outside.")
+    assert reports.forecast_period("month", {"mid": "Going Out"}, today="2024-05-10")["spent"] == 20.0
+
+    # Going out moves past today: same count and total, only the outside commit tells
+    other = sqlite3.connect(database.DB_NAME)
+    other.execute("UPDATE expenses SET date = '2024-05-12' WHERE id = 11")
+    other.commit()
+    other.close()
+    assert reports.forecast_period("month", {"mid": "Going Out"}, today="2024-05-10")["rows"] == []
@@ -0,0 +1,103 @@
+import math
+import random
+import sqlite3
+from datetime import datetime
+
+import pytest
+from backend import crud, database, reports, stats
+from backend.query import ExpenseQuery
+from backend.storage import get_backend
+
+TODAY = datetime.today().date()
+
+
+def test_sketch_quantiles_are_within_accuracy():
+    rng = random.Random(1)
+    values = [rng.randint(1, 500_000) for _ in range(5000)]
+    sketch = stats.QuantileSketch(0.01)
+    for value in values:
+        sketch.add(value)
+    values.sort()
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = values[max(math.ceil(q * len(values)), 1) - 1]
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact + 1
+
+    half = stats.QuantileSketch(0.01)
+    for value in values[::2]:
+        half.add(value)
+        sketch.add(value, -1)
+    merged = half.merge(sketch)
+    assert merged.count == len(values) and merged.total == sum(values)
+    assert stats.QuantileSketch().quantile(0.5) is None
+
+
+def test_sketch_keeps_zero_and_negative_values():
+    sketch = stats.QuantileSketch(0.01)
+    for value in (-5000, -100, 0, 0, 100, 2500):
+        sketch.add(value)
+    assert (sketch.count, sketch.total) == (6, -2500)
+    assert abs(sketch.quantile(0) + 5000) <= 50
+    assert abs(sketch.quantile(0.3) + 100) <= 1
+    assert sketch.quantile(0.5) == 0.0
+    assert abs(sketch.quantile(1) - 2500) <= 25
+
+    sketch.add(-5000, -1)
+    sketch.add(0, -2)
+    assert (sketch.negative, sketch.zeros) == ({sketch._key(100): 1}, 0)
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_stats_follow_writes(sample_rows):
+    crud.add_expenses_bulk(sample_rows)
+    tracker = stats.Stats()
+    try:
+        this_month = TODAY.strftime("%Y-%m")
+        assert tracker.summary(main="Daily Expenses")["count"] == 3
+        assert tracker.summary(main="Daily Expenses", start_month=this_month)["mean"] == 21.75
+
+        crud.add_expenses_bulk([("Daily Expenses", "Groceries", "Food", TODAY.isoformat(), 5, "")])
+        crud.update_expense(3, "Daily Expenses", "Groceries", "Food", TODAY.isoformat(), 4)
+        crud.delete_expense(4)
+
+        food = tracker.summary("Daily Expenses", "Groceries", "Food", start_month=this_month)
+        assert food["count"] == 3
+        assert food["median"] == pytest.approx(4, rel=0.01)
+        assert food["p99"] == pytest.approx(5, rel=0.01)
+        assert [row[:2] for row in tracker.by_category("mid")] == [("Daily Expenses", "Groceries")]
+    finally:
+        tracker.close()
+
+
+@pytest.mark.usefixtures("storage_backend")
+def test_spending_distribution_report(sample_rows):
+    crud.add_expenses_bulk(sample_rows + [("Daily Expenses", "Groceries", "Food", TODAY.isoformat(), 3.5, "")])
+    assert list(get_backend().select(ExpenseQuery(group_by=("category", "value"), main="Daily Expenses"))) == [
+        (1, 350, 700, 2), (1, 1200, 1200, 1), (3, 4000, 4000, 1)
+    ]
+    reports.use_stats(None)
+    try:
+        rows = reports.get_spending_distribution("mid")
+        assert [row[:2] for row in rows] == [("Daily Expenses", "Going Out"), ("Daily Expenses", "Groceries"),
+                                             ("Month Expenses", "Rent")]
+        groceries = rows[1][-1]
+        assert groceries["count"] == 3
+        assert groceries["median"] == pytest.approx(3.5, rel=0.01)
+    finally:
+        reports._stats.close()
+        reports.use_stats(None)
+
+
+def test_stats_rebuild_after_outside_date_move(sample_rows):
+    crud.add_expenses_bulk(sample_rows)
+    tracker = stats.Stats()
+    try:
+        this_month = TODAY.strftime("%Y-%m")
+        assert tracker.summary(main="Daily Expenses", start_month=this_month)["count"] == 2
+        other = sqlite3.connect(database.DB_NAME)
+        other.execute("UPDATE expenses SET date = ? WHERE id = 1", (TODAY.isoformat(),))
+        other.commit()
+        other.close()
+        assert tracker.summary(main="Daily Expenses", start_month=this_month)["count"] == 3
+        assert tracker.rebuilds == 2
+    finally:
+        tracker.close()